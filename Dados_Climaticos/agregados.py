@@ -0,0 +1,262 @@
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connection
+from django.utils import timezone
+from .arquivamento import TABELA as ARQUIVO, limite_dados_brutos
+from .models import CAMPOS_NUMERICOS as CAMPOS
+
+# Agregados contínuos (migração 0003), do mais grosso para o mais fino
+AGREGADOS = [
+    ('dado_climatico_diario', timedelta(days=1)),
+    ('dado_climatico_horario', timedelta(hours=1)),
+]
+
+# Janela da política de atualização (start_offset da migração 0003): dados mais
+# antigos que isso só chegam aos agregados com um refresh explícito (atualizar)
+JANELA_ATUALIZACAO = timedelta(days=30)
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _piso(valor, passo):
+    """Arredonda para baixo até o limite de bucket (em UTC, como o time_bucket)"""
+    return valor - (valor - _EPOCA) % passo
+
+
+def _teto(valor, passo):
+    piso = _piso(valor, passo)
+    return piso if piso == valor else piso + passo
+
+
+def _datetime(valor):
+    """datetime com fuso a partir de datetime ou string ISO (datas sem fuso usam o fuso local)"""
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor
+
+
+def atualizar(instantes):
+    """
+    Recalcula os agregados contínuos no intervalo dos dados retroativos
+    (gravados, alterados ou removidos) anteriores à janela da política,
+    que de outra forma nunca seriam materializados. O TimescaleDB só
+    recalcula os buckets invalidados dentro do intervalo informado.
+    Não pode ser chamado dentro de uma transação.
+    """
+    corte = timezone.now() - JANELA_ATUALIZACAO
+    antigos = [instante for instante in map(_datetime, instantes) if instante < corte]
+    if not antigos:
+        return
+    inicio, fim = min(antigos), max(antigos)
+    with connection.cursor() as cursor:
+        for tabela, passo in AGREGADOS:
+            cursor.execute(
+                "CALL refresh_continuous_aggregate(%s, %s, %s)",
+                [tabela, _piso(inicio, passo), _piso(fim, passo) + passo]
+            )
+
+
+def segmentos(inicio, fim, limite=None):
+    """
+    Divide o intervalo fechado [inicio, fim] em trechos atendidos pela fonte
+    mais grossa possível. Retorna uma lista de (tabela, a, b, inclui_fim), onde
+    tabela=None indica dados brutos. Os buckets completos ficam nos agregados;
+    só as pontas não alinhadas são lidas do hypertable. O que for anterior a
+    `limite` (dados brutos já arquivados) é lido do arquivo horário.
+    """
+    pendentes = [(inicio, fim, True)]
+    resultado = []
+    if limite is not None and inicio < limite:
+        if fim < limite:
+            return [(ARQUIVO, inicio, fim, True)]
+        resultado.append((ARQUIVO, inicio, limite, False))
+        pendentes = [(limite, fim, True)]
+    for tabela, passo in AGREGADOS:
+        restantes = []
+        for a, b, inclui_fim in pendentes:
+            interno_inicio, interno_fim = _teto(a, passo), _piso(b, passo)
+            if interno_inicio >= interno_fim:
+                restantes.append((a, b, inclui_fim))
+                continue
+            resultado.append((tabela, interno_inicio, interno_fim, False))
+            if a < interno_inicio:
+                restantes.append((a, interno_inicio, False))
+            if interno_fim < b or (interno_fim == b and inclui_fim):
+                restantes.append((interno_fim, b, inclui_fim))
+        pendentes = restantes
+    resultado += [(None, a, b, inclui_fim) for a, b, inclui_fim in pendentes]
+    return resultado
+
+
+def _subconsulta(tabela, tipo, dispositivo_id, a, b, inclui_fim):
+    """SQL (soma, contagem) por linha para um trecho, agregado ou bruto"""
+    operador_fim = '<=' if inclui_fim else '<'
+    if tabela is None:
+        sql = (
+            f"SELECT time AS t, {tipo} AS soma, "
+            f"CASE WHEN {tipo} IS NULL THEN 0 ELSE 1 END AS contagem "
+            f"FROM dado_climatico "
+            f"WHERE dispositivo_id = %s AND time >= %s AND time {operador_fim} %s"
+        )
+    elif tabela == ARQUIVO:
+        # Arquivo horário: só entram as horas que começam dentro do trecho
+        sql = (
+            f"SELECT bucket AS t, {tipo}_media * {tipo}_contagem AS soma, {tipo}_contagem AS contagem "
+            f"FROM {ARQUIVO} "
+            f"WHERE dispositivo_id = %s AND bucket >= %s AND bucket {operador_fim} %s"
+        )
+    else:
+        sql = (
+            f"SELECT bucket AS t, {tipo}_soma AS soma, {tipo}_contagem AS contagem "
+            f"FROM {tabela} "
+            f"WHERE dispositivo_id = %s AND bucket >= %s AND bucket {operador_fim} %s"
+        )
+    return sql, [dispositivo_id, a, b]
+
+
+def media_por_intervalo(dispositivo_id, tipo, intervalo, inicio, fim):
+    """
+    Média de `tipo` em buckets de `intervalo` (com gapfill) entre inicio e fim,
+    combinando agregados contínuos e dados brutos. Mesmo formato da consulta
+    DadoClimatico.timescale...time_bucket_gapfill(...).annotate(Avg):
+    [{'bucket': datetime, '<tipo>_avg': float | None}, ...]
+    """
+    if tipo not in CAMPOS:
+        raise ValueError(f'Campo inválido: {tipo}')
+
+    partes = []
+    parametros = [intervalo, inicio, fim]
+    for tabela, a, b, inclui_fim in segmentos(inicio, fim, limite_dados_brutos()):
+        sql, params = _subconsulta(tabela, tipo, dispositivo_id, a, b, inclui_fim)
+        partes.append(sql)
+        parametros += params
+
+    campo_avg = f'{tipo}_avg'
+    sql = (
+        f"SELECT time_bucket_gapfill(%s::interval, t, %s, %s) AS bucket, "
+        f"sum(soma) / NULLIF(sum(contagem), 0) AS {campo_avg} "
+        f"FROM ({' UNION ALL '.join(partes)}) AS fontes "
+        f"GROUP BY 1 ORDER BY 1"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        return [{'bucket': bucket, campo_avg: media} for bucket, media in cursor.fetchall()]
+
+
+# Funções de agregação aceitas pela consulta de múltiplas métricas, sobre as
+# colunas de fontes(): as que usam só {campo} (valor bruto) ignoram o arquivo horário
+FUNCOES = {
+    'avg': 'sum({campo}_soma) / NULLIF(sum({campo}_contagem), 0)',
+    'min': 'min({campo}_min)',
+    'max': 'max({campo}_max)',
+    'sum': 'sum({campo}_soma)',
+    'count': 'sum({campo}_contagem)',
+    'stddev': 'stddev_samp({campo})',
+}
+_PERCENTIL = re.compile(r'^p(\d{1,2}(?:\.\d+)?)$')
+
+
+def expressao_funcao(funcao):
+    """
+    Retorna (sql, params) da função de agregação, com {campo} a preencher.
+    Percentis usam o formato pNN (ex: p50, p95, p99.9). None se inválida.
+    """
+    if funcao in FUNCOES:
+        return FUNCOES[funcao], []
+    if correspondencia := _PERCENTIL.match(funcao):
+        fracao = float(correspondencia.group(1)) / 100
+        if 0 < fracao < 1:
+            return 'percentile_cont(%s) WITHIN GROUP (ORDER BY {campo})', [fracao]
+    return None
+
+
+def fontes(tipos, dispositivos_ids, inicio, fim):
+    """
+    Subconsulta com as linhas de entrada da agregação de múltiplas métricas:
+    dados brutos e, antes do limite de arquivamento, os resumos horários.
+    Colunas por tipo: valor bruto (NULL no arquivo), soma, contagem, min e max.
+    """
+    brutos = []
+    arquivados = []
+    for tipo in tipos:
+        brutos += [
+            tipo,
+            f'{tipo} AS {tipo}_soma',
+            f'CASE WHEN {tipo} IS NULL THEN 0 ELSE 1 END AS {tipo}_contagem',
+            f'{tipo} AS {tipo}_min',
+            f'{tipo} AS {tipo}_max',
+        ]
+        arquivados += [
+            f'NULL::float8 AS {tipo}',
+            f'{tipo}_media * {tipo}_contagem',
+            f'{tipo}_contagem',
+            f'{tipo}_min',
+            f'{tipo}_max',
+        ]
+
+    limite = limite_dados_brutos()
+    inicio_brutos = max(inicio, limite) if limite is not None else inicio
+    sql = (
+        f"SELECT dispositivo_id, time AS t, {', '.join(brutos)} "
+        f"FROM dado_climatico "
+        f"WHERE dispositivo_id = ANY(%s) AND time >= %s AND time <= %s"
+    )
+    parametros = [list(dispositivos_ids), inicio_brutos, fim]
+
+    if limite is not None and inicio < limite:
+        sql += (
+            f" UNION ALL "
+            f"SELECT dispositivo_id, bucket, {', '.join(arquivados)} "
+            f"FROM {ARQUIVO} "
+            f"WHERE dispositivo_id = ANY(%s) AND bucket >= %s AND bucket < %s"
+        )
+        parametros += [list(dispositivos_ids), inicio, min(fim, limite)]
+    return sql, parametros
+
+
+def agregar_multiplos(dispositivos_ids, tipos, funcoes, intervalo, inicio, fim):
+    """
+    Calcula todas as combinações tipo x função, por dispositivo e bucket de
+    `intervalo`, em uma única consulta agrupada. Retorna (colunas, resultado),
+    com resultado no formato colunar:
+    {dispositivo_id: {'bucket': [...], '<tipo>_<funcao>': [...], ...}}
+    Em períodos já arquivados, stddev e percentis não estão disponíveis (None).
+    """
+    colunas = []
+    expressoes = []
+    parametros = [intervalo]
+    for tipo in tipos:
+        if tipo not in CAMPOS:
+            raise ValueError(f'Campo inválido: {tipo}')
+        for funcao in funcoes:
+            expressao = expressao_funcao(funcao)
+            if expressao is None:
+                raise ValueError(f'Função inválida: {funcao}')
+            sql, params = expressao
+            colunas.append(f'{tipo}_{funcao}')
+            expressoes.append(sql.format(campo=tipo))
+            parametros += params
+
+    sql_fontes, parametros_fontes = fontes(tipos, dispositivos_ids, inicio, fim)
+    parametros += parametros_fontes
+
+    sql = (
+        f"SELECT dispositivo_id, time_bucket(%s::interval, t) AS bucket, {', '.join(expressoes)} "
+        f"FROM ({sql_fontes}) AS fontes "
+        f"GROUP BY 1, 2 ORDER BY 1, 2"
+    )
+
+    resultado = {
+        dispositivo_id: {'bucket': [], **{coluna: [] for coluna in colunas}}
+        for dispositivo_id in dispositivos_ids
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        for dispositivo_id, bucket, *valores in cursor.fetchall():
+            serie = resultado[dispositivo_id]
+            serie['bucket'].append(bucket)
+            for coluna, valor in zip(colunas, valores):
+                serie[coluna].append(valor)
+    return colunas, resultado
@@ -0,0 +1,169 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import CAMPOS_NUMERICOS as CAMPOS
+
+TABELA = 'dado_climatico_arquivo'
+TABELA_LIMITE = 'dado_climatico_arquivo_limite'
+PROCEDIMENTO = 'arquivar_dado_climatico'
+
+
+def _colunas():
+    colunas = []
+    for campo in CAMPOS:
+        colunas += [f'{campo}_min', f'{campo}_max', f'{campo}_media', f'{campo}_contagem']
+    return colunas
+
+
+def _expressoes():
+    expressoes = []
+    for campo in CAMPOS:
+        expressoes += [f'min({campo})', f'max({campo})', f'avg({campo})', f'count({campo})']
+    return expressoes
+
+
+def _atualizacoes():
+    """Combina um resumo novo com o já arquivado (dados retroativos na mesma hora)"""
+    atualizacoes = []
+    for campo in CAMPOS:
+        atual = f'{TABELA}.{campo}'
+        novo = f'EXCLUDED.{campo}'
+        atualizacoes += [
+            f'{campo}_min = LEAST({atual}_min, {novo}_min)',
+            f'{campo}_max = GREATEST({atual}_max, {novo}_max)',
+            f'{campo}_media = (COALESCE({atual}_media * {atual}_contagem, 0) + COALESCE({novo}_media * {novo}_contagem, 0)) '
+            f'/ NULLIF({atual}_contagem + {novo}_contagem, 0)',
+            f'{campo}_contagem = {atual}_contagem + {novo}_contagem',
+        ]
+    return atualizacoes
+
+
+def sql_arquivar(limite):
+    """
+    INSERT que resume por hora todos os dados brutos anteriores a `limite`
+    (placeholder SQL: '%s' no Python ou o nome de uma variável no PL/pgSQL).
+    """
+    return (
+        f"INSERT INTO {TABELA} (dispositivo_id, bucket, {', '.join(_colunas())}) "
+        f"SELECT dispositivo_id, time_bucket(INTERVAL '1 hour', time), {', '.join(_expressoes())} "
+        f"FROM dado_climatico WHERE time < {limite} "
+        f"GROUP BY 1, 2 "
+        f"ON CONFLICT (dispositivo_id, bucket) DO UPDATE SET {', '.join(_atualizacoes())}"
+    )
+
+
+def sql_gravar_limite(limite):
+    """Grava o limite de arquivamento, que nunca recua (mesmo placeholder de sql_arquivar)"""
+    return (
+        f"INSERT INTO {TABELA_LIMITE} (id, limite) VALUES (1, {limite}) "
+        f"ON CONFLICT (id) DO UPDATE SET limite = GREATEST({TABELA_LIMITE}.limite, EXCLUDED.limite)"
+    )
+
+
+# Fim do último chunk inteiramente anterior ao limite de retenção
+SQL_LIMITE_CHUNKS = (
+    "SELECT max(range_end) {destino}FROM timescaledb_information.chunks "
+    "WHERE hypertable_name = 'dado_climatico' AND range_end <= {limite}"
+)
+
+
+def limite_chunks(cursor, dias):
+    """
+    Fim do último chunk bruto inteiramente anterior a agora - `dias`.
+    Só chunks inteiros são arquivados e removidos, para não perder dados
+    brutos que drop_chunks manteria. None se não houver chunk elegível.
+    """
+    cursor.execute(SQL_LIMITE_CHUNKS.format(destino='', limite='%s'), [timezone.now() - timedelta(days=dias)])
+    return cursor.fetchone()[0]
+
+
+def arquivar(dias=None):
+    """
+    Resume por hora os dados brutos dos chunks mais antigos que `dias` e
+    remove esses chunks do hypertable, na mesma transação (o resumo é somado
+    ao já arquivado, então os brutos não podem ficar). Retorna
+    (limite, linhas arquivadas).
+    """
+    if dias is None:
+        dias = getattr(settings, 'DADOS_RETENCAO_DIAS', 365)
+    with transaction.atomic(), connection.cursor() as cursor:
+        limite = limite_chunks(cursor, dias)
+        if limite is None:
+            return None, 0
+        cursor.execute(sql_arquivar('%s'), [limite])
+        linhas = cursor.rowcount
+        cursor.execute("SELECT drop_chunks('dado_climatico', older_than => %s)", [limite])
+        cursor.execute(sql_gravar_limite('%s'), [limite])
+    _limite_cache.clear()
+    return limite, linhas
+
+
+def sql_procedimento():
+    """Procedimento equivalente a arquivar(), executado pelo agendador do TimescaleDB"""
+    return f"""
+CREATE OR REPLACE PROCEDURE {PROCEDIMENTO}(job_id int, config jsonb)
+LANGUAGE plpgsql AS $$
+DECLARE
+    limite timestamptz;
+BEGIN
+    {SQL_LIMITE_CHUNKS.format(destino='INTO limite ', limite="now() - make_interval(days => (config->>'dias')::int)")};
+    IF limite IS NULL THEN
+        RETURN;
+    END IF;
+    {sql_arquivar('limite')};
+    PERFORM drop_chunks('dado_climatico', older_than => limite);
+    {sql_gravar_limite('limite')};
+END
+$$
+"""
+
+
+def agendar(dias=None, intervalo='1 day'):
+    """Registra (ou substitui) o job do TimescaleDB que arquiva periodicamente"""
+    if dias is None:
+        dias = getattr(settings, 'DADOS_RETENCAO_DIAS', 365)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql_procedimento())
+        cursor.execute(
+            "SELECT delete_job(job_id) FROM timescaledb_information.jobs WHERE proc_name = %s",
+            [PROCEDIMENTO]
+        )
+        cursor.execute(
+            "SELECT add_job(%s, %s::interval, config => jsonb_build_object('dias', %s::int))",
+            [PROCEDIMENTO, intervalo, dias]
+        )
+        return cursor.fetchone()[0]
+
+
+def desagendar():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT delete_job(job_id) FROM timescaledb_information.jobs WHERE proc_name = %s",
+            [PROCEDIMENTO]
+        )
+        return len(cursor.fetchall())
+
+
+# (limite, expira): consultado a cada DADOS_RETENCAO_VERIFICACAO segundos por processo
+_limite_cache = {}
+
+
+def limite_dados_brutos():
+    """
+    Instante até o qual os dados brutos foram arquivados (gravado por
+    arquivar() e pelo job agendado), ou None se nada foi arquivado. Antes
+    dele, as consultas leem o arquivo horário e a ingestão recusa dados.
+    """
+    agora = time.monotonic()
+    if _limite_cache and _limite_cache['expira'] > agora:
+        return _limite_cache['limite']
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT limite FROM {TABELA_LIMITE} WHERE id = 1")
+        linha = cursor.fetchone()
+
+    _limite_cache['limite'] = linha[0] if linha else None
+    _limite_cache['expira'] = agora + getattr(settings, 'DADOS_RETENCAO_VERIFICACAO', 60)
+    return _limite_cache['limite']
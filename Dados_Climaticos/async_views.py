@@ -0,0 +1,112 @@
+# Versões assíncronas (ASGI) das consultas de leitura mais frequentes.
+# Mesma lógica e mesmo formato de resposta das views DRF síncronas; enquanto
+# aguardam o PostgreSQL, o worker ASGI continua atendendo outras requisições.
+import asyncio
+import json
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from utils import get_dispositivo, resposta_json, somente_get
+from . import eventos, ultimo_dado
+from .models import UltimoDado
+from .queryviews import consultar_media
+from .serializer import UltimoDadoSerializer
+
+
+async def buscar_dispositivo(identificador):
+    """get_dispositivo em thread; retorna (dispositivo, resposta de erro)"""
+    dispositivo = await sync_to_async(get_dispositivo)(identificador)
+    if isinstance(dispositivo, Response):
+        return None, resposta_json(dispositivo.data, dispositivo.status_code)
+    return dispositivo, None
+
+
+@somente_get
+async def ultimo_dado_view(request, identificador):
+    """Mesmo que UltimoDadoView"""
+    dispositivo, erro = await buscar_dispositivo(identificador)
+    if erro:
+        return erro
+    if not dispositivo:
+        return resposta_json({"erro": "Dispositivo não encontrado"}, 404)
+
+    dado = await ultimo_dado.aobter(dispositivo.id)
+    if not dado:
+        return resposta_json({'erro': 'Nenhum dado encontrado.'}, 404)
+    return resposta_json(UltimoDadoSerializer(dado).data)
+
+
+@somente_get
+async def media_unica_view(request, identificador):
+    """Mesmo que QueryMediaUnicaView"""
+    dispositivo, erro = await buscar_dispositivo(identificador)
+    if erro:
+        return erro
+    if not dispositivo:
+        return resposta_json({
+            'status': 404,
+            'msg': 'Dispositivo não encontrado.'
+        }, 404)
+
+    # SQL bruto (agregados contínuos + gapfill): executado em thread
+    corpo, codigo = await sync_to_async(consultar_media)(dispositivo, request.GET)
+    return resposta_json(corpo, codigo)
+
+
+def evento_sse(tipo, dado):
+    """Formata um evento Server-Sent Events (o id permite retomar com Last-Event-ID)"""
+    return f"id: {dado['id']}\nevent: {tipo}\ndata: {json.dumps(dado, cls=JSONEncoder)}\n\n"
+
+
+@somente_get
+async def eventos_view(request):
+    """
+    Canal Server-Sent Events com os dados climáticos recebidos, filtrados por
+    ?dispositivos= (todos, se omitido). Ao conectar, envia o último dado de cada
+    dispositivo pedido (evento "ultimo"); depois, cada dado gravado (evento "dado"),
+    editado ("alteracao") ou excluído ("remocao").
+    """
+    try:
+        dispositivos_ids = [int(i) for i in request.GET.getlist('dispositivos')]
+    except ValueError:
+        return resposta_json({
+            'status': 400,
+            'msg': 'IDs de dispositivos devem ser inteiros.'
+        }, 400)
+    if eventos.backend() is None:
+        return resposta_json({
+            'status': 503,
+            'msg': 'Canal de eventos desabilitado (EVENTOS_BACKEND).'
+        }, 503)
+
+    heartbeat = getattr(settings, 'EVENTOS_HEARTBEAT', 15)
+    # Conexões são encerradas periodicamente; o EventSource reconecta sozinho
+    duracao_maxima = getattr(settings, 'EVENTOS_DURACAO_MAXIMA', 300)
+
+    async def fluxo():
+        assinatura = eventos.broker.assinar(dispositivos_ids)
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            if dispositivos_ids:
+                ultimos = UltimoDado.objects.select_related('direcao_vento').filter(dispositivo_id__in=dispositivos_ids)
+                async for ultimo in ultimos:
+                    yield evento_sse('ultimo', UltimoDadoSerializer(ultimo).data)
+
+            fim = time.monotonic() + duracao_maxima
+            while time.monotonic() < fim:
+                try:
+                    tipo, dado = await asyncio.wait_for(assinatura.fila.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield evento_sse(tipo, dado)
+        finally:
+            eventos.broker.cancelar(assinatura)
+
+    resposta = StreamingHttpResponse(fluxo(), content_type='text/event-stream')
+    resposta['Cache-Control'] = 'no-cache'
+    resposta['X-Accel-Buffering'] = 'no'
+    return resposta
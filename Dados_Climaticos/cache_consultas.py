@@ -0,0 +1,106 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+PREFIXO = 'consulta'
+
+
+def _cache():
+    return caches[getattr(settings, 'CONSULTAS_CACHE_BACKEND', 'default')]
+
+
+def _instante(valor):
+    """Converte datetime (ou string ISO) em timestamp; datas sem fuso usam o fuso local"""
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor.timestamp()
+
+
+def _chave_geracao(dispositivo_id, historico):
+    return f'{PREFIXO}:geracao:{"historico" if historico else "recente"}:{dispositivo_id}'
+
+
+def chave_consulta(nome, parametros):
+    """Chave determinística a partir do nome da consulta e dos parâmetros normalizados"""
+    normalizado = json.dumps(parametros, sort_keys=True, default=str)
+    return f'{PREFIXO}:{nome}:{hashlib.sha1(normalizado.encode()).hexdigest()}'
+
+
+def _limite_historico():
+    margem = timedelta(seconds=getattr(settings, 'CONSULTAS_CACHE_MARGEM_HISTORICO', 3600))
+    return timezone.now() - margem
+
+
+def _geracoes(dispositivos_ids, historico):
+    """
+    Gerações atuais dos dispositivos, criando as que ainda não existem. Uma
+    geração removida do cache (expulsa ou perdida) vira uma nova: os
+    resultados antigos deixam de ser encontrados, nunca ficam desatualizados.
+    """
+    cache = _cache()
+    chaves = [_chave_geracao(dispositivo_id, historico) for dispositivo_id in sorted(set(dispositivos_ids))]
+    geracoes = cache.get_many(chaves)
+    faltantes = [chave for chave in chaves if chave not in geracoes]
+    if faltantes:
+        for chave in faltantes:
+            cache.add(chave, uuid.uuid4().hex, None)
+        geracoes.update(cache.get_many(faltantes))
+    return [geracoes.get(chave) for chave in chaves]
+
+
+def obter_ou_calcular(nome, parametros, dispositivos_ids, inicio, fim, calcular, armazenar=None):
+    """
+    Retorna o resultado em cache da consulta ou o calcula com `calcular()`.
+    A chave inclui a geração de cada dispositivo, trocada pela ingestão:
+    resultados de dados já alterados deixam de ser encontrados em qualquer
+    worker, inclusive os calculados enquanto os dados eram gravados.
+    Períodos que terminam antes de agora - CONSULTAS_CACHE_MARGEM_HISTORICO
+    usam a geração histórica, que só muda com dados retroativos.
+    Se `armazenar(resultado)` for falso, o resultado não vai para o cache
+    (ex.: grande demais).
+    """
+    if not getattr(settings, 'CONSULTAS_CACHE_HABILITADO', True):
+        return calcular()
+
+    historico = fim < _limite_historico()
+    # As gerações são lidas antes do cálculo: dados gravados durante ele trocam a geração
+    geracoes = _geracoes(dispositivos_ids, historico)
+    cache = _cache()
+    chave = chave_consulta(nome, {'parametros': parametros, 'geracoes': geracoes})
+    resultado = cache.get(chave)
+    if resultado is not None:
+        return resultado
+
+    resultado = calcular()
+    if armazenar is not None and not armazenar(resultado):
+        return resultado
+    if historico:
+        ttl = getattr(settings, 'CONSULTAS_CACHE_TTL_HISTORICO', 86400)
+    else:
+        ttl = getattr(settings, 'CONSULTAS_CACHE_TTL_RECENTE', 30)
+    cache.set(chave, resultado, ttl)
+    return resultado
+
+
+def invalidar(dispositivo_id, instantes):
+    """
+    Troca a geração do dispositivo (e a histórica, se algum dos instantes é
+    anterior ao limite histórico), invalidando as consultas que o incluem.
+    """
+    if not getattr(settings, 'CONSULTAS_CACHE_HABILITADO', True):
+        return
+
+    instantes = [_instante(instante) for instante in instantes]
+    if not instantes:
+        return
+
+    novas = {_chave_geracao(dispositivo_id, False): uuid.uuid4().hex}
+    if min(instantes) < _limite_historico().timestamp():
+        novas[_chave_geracao(dispositivo_id, True)] = uuid.uuid4().hex
+    _cache().set_many(novas, None)
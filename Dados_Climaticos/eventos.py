@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from django.conf import settings
+from django.db import connection, connections, transaction
+from rest_framework.utils.encoders import JSONEncoder
+from .serializer import DadoClimaticoSerializer
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'dado_climatico'
+
+# Payload do NOTIFY é limitado a 8000 bytes: os dados são enviados em partes menores
+TAMANHO_MAXIMO_NOTIFY = 7000
+
+# Espera (segundos) entre tentativas de reconectar o LISTEN após uma falha
+ESPERA_RECONEXAO = 5
+
+
+def backend():
+    """'postgres' (LISTEN/NOTIFY entre workers), 'local' (só o próprio processo) ou None (desligado)"""
+    return getattr(settings, 'EVENTOS_BACKEND', 'postgres')
+
+
+class Assinatura:
+    """Fila de um cliente conectado, filtrada por dispositivos (None = todos)"""
+
+    def __init__(self, dispositivos, loop):
+        self.dispositivos = set(dispositivos) if dispositivos else None
+        self.loop = loop
+        self.fila = asyncio.Queue(maxsize=getattr(settings, 'EVENTOS_FILA_MAXIMA', 1000))
+        self.descartados = 0
+
+    def entregar(self, evento):
+        # Executado no loop do cliente; cliente lento perde os eventos mais antigos
+        if self.fila.full():
+            self.fila.get_nowait()
+            self.descartados += 1
+        self.fila.put_nowait(evento)
+
+
+class Broker:
+    """Distribui os dados recebidos para as assinaturas deste processo"""
+
+    def __init__(self):
+        self._assinaturas = set()
+        self._lock = threading.Lock()
+        self._ouvinte = None
+
+    def assinar(self, dispositivos=None):
+        assinatura = Assinatura(dispositivos, asyncio.get_running_loop())
+        with self._lock:
+            self._assinaturas.add(assinatura)
+            if backend() == 'postgres' and (self._ouvinte is None or not self._ouvinte.is_alive()):
+                self._ouvinte = threading.Thread(target=self._ouvir, name='eventos-listen', daemon=True)
+                self._ouvinte.start()
+        return assinatura
+
+    def cancelar(self, assinatura):
+        with self._lock:
+            self._assinaturas.discard(assinatura)
+
+    def tem_assinantes(self):
+        return bool(self._assinaturas)
+
+    def distribuir(self, dados, tipo='dado'):
+        """Entrega (tipo, dado) aos assinantes. Pode ser chamado de qualquer thread"""
+        with self._lock:
+            assinaturas = list(self._assinaturas)
+        for assinatura in assinaturas:
+            try:
+                for dado in dados:
+                    if assinatura.dispositivos is None or dado['dispositivo'] in assinatura.dispositivos:
+                        assinatura.loop.call_soon_threadsafe(assinatura.entregar, (tipo, dado))
+            except RuntimeError:
+                # Loop do cliente já encerrado (worker finalizando): a assinatura é descartada
+                self.cancelar(assinatura)
+
+    def _ouvir(self):
+        """
+        Thread com conexão própria em LISTEN, repassando as notificações aos
+        assinantes locais. Se a conexão cair, reconecta após ESPERA_RECONEXAO segundos.
+        """
+        while True:
+            conexao = connections.create_connection('default')
+            try:
+                conexao.ensure_connection()
+                bruta = conexao.connection
+                bruta.autocommit = True
+                with bruta.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CANAL}')
+                while True:
+                    if select.select([bruta], [], [], 5) == ([], [], []):
+                        continue
+                    bruta.poll()
+                    while bruta.notifies:
+                        notificacao = bruta.notifies.pop(0)
+                        try:
+                            mensagem = json.loads(notificacao.payload)
+                            self.distribuir(mensagem['dados'], mensagem['tipo'])
+                        except Exception:
+                            logger.exception('Falha ao distribuir evento de dados climáticos')
+            except Exception:
+                logger.exception('Falha no LISTEN de eventos de dados climáticos; reconectando')
+            finally:
+                try:
+                    conexao.close()
+                except Exception:
+                    pass
+            time.sleep(ESPERA_RECONEXAO)
+
+
+broker = Broker()
+
+
+def _partes(dados, tipo='dado'):
+    """
+    Agrupa os dados serializados em payloads JSON ({"tipo": ..., "dados": [...]})
+    abaixo do limite do NOTIFY
+    """
+    inicio = '{"tipo": ' + json.dumps(tipo) + ', "dados": ['
+    parte = []
+    tamanho = len(inicio) + 2
+    for dado in dados:
+        texto = json.dumps(dado)
+        if parte and tamanho + len(texto) + 1 > TAMANHO_MAXIMO_NOTIFY:
+            yield inicio + ','.join(parte) + ']}'
+            parte = []
+            tamanho = len(inicio) + 2
+        parte.append(texto)
+        tamanho += len(texto) + 1
+    if parte:
+        yield inicio + ','.join(parte) + ']}'
+
+
+def publicar(objetos, tipo='dado'):
+    """
+    Publica os dados no formato do DadoClimaticoSerializer, como eventos `tipo`:
+    'dado' (recém-gravado), 'alteracao' (editado) ou 'remocao' (excluído).
+    Só são entregues após o commit: no backend 'local' via on_commit; no
+    'postgres', o próprio NOTIFY é transacional.
+    """
+    modo = backend()
+    if not objetos or modo is None:
+        return
+    if modo == 'local' and not broker.tem_assinantes():
+        return
+
+    dados = json.loads(json.dumps(DadoClimaticoSerializer(objetos, many=True).data, cls=JSONEncoder))
+    if modo == 'postgres':
+        with connection.cursor() as cursor:
+            for payload in _partes(dados, tipo):
+                cursor.execute('SELECT pg_notify(%s, %s)', [CANAL, payload])
+    else:
+        transaction.on_commit(lambda: broker.distribuir(dados, tipo))
@@ -0,0 +1,189 @@
+import csv
+import io
+import itertools
+import json
+import tempfile
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from Direcao_Vento.cache import obter_direcoes
+from .models import CAMPOS_NUMERICOS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Dependência opcional: exportação Arrow/Parquet indisponível
+    pa = None
+    pq = None
+
+# Colunas exportadas (mesmos nomes do DadoClimaticoSerializer)
+COLUNAS = ['id', 'dispositivo', 'data', *CAMPOS_NUMERICOS, 'direcao_vento']
+
+# Campos lidos do banco, na mesma ordem das colunas (direção do vento como id, sem JOIN)
+CAMPOS_CONSULTA = ['id', 'dispositivo_id', 'time', *CAMPOS_NUMERICOS, 'direcao_vento_id']
+
+
+class _Eco:
+    """Pseudo-arquivo que devolve o que for escrito (usado com csv.writer)"""
+    def write(self, valor):
+        return valor
+
+
+def formatar_data(valor):
+    """Formata a data como o DateTimeField do DRF (fuso local, UTC como 'Z')"""
+    valor = timezone.localtime(valor).isoformat()
+    if valor.endswith('+00:00'):
+        valor = valor[:-6] + 'Z'
+    return valor
+
+
+def converter_linhas(linhas):
+    """
+    Converte tuplas de CAMPOS_CONSULTA para os valores das COLUNAS, com a data
+    formatada e o nome da direção do vento (cache de direções, sem JOIN).
+    """
+    nomes_direcoes = {direcao.id: direcao.nome for direcao in obter_direcoes().values()}
+    for id, dispositivo_id, time, temperatura, umidade, precipitacao, velocidade_vento, direcao_id in linhas:
+        yield (
+            id,
+            dispositivo_id,
+            formatar_data(time),
+            temperatura,
+            umidade,
+            precipitacao,
+            velocidade_vento,
+            nomes_direcoes.get(direcao_id),
+        )
+
+
+def ler_linhas(queryset):
+    """
+    Lê as linhas com values_list a partir de um cursor do lado do servidor,
+    sem instanciar modelos, já com a data formatada e o nome da direção do vento.
+    """
+    chunk_size = getattr(settings, 'DADOS_STREAMING_CHUNK', 2000)
+    linhas = queryset.order_by('time', 'id').values_list(*CAMPOS_CONSULTA).iterator(chunk_size=chunk_size)
+    return converter_linhas(linhas)
+
+
+def serializar_linhas(linhas):
+    """Dicionários no mesmo formato do DadoClimaticoSerializer a partir de tuplas de CAMPOS_CONSULTA"""
+    return [dict(zip(COLUNAS, linha)) for linha in converter_linhas(linhas)]
+
+
+def serializar_dados(queryset):
+    """
+    Caminho rápido de leitura: mesmo JSON do DadoClimaticoSerializer(many=True),
+    montado com values_list (mantém a ordenação/fatiamento do queryset).
+    """
+    return serializar_linhas(queryset.values_list(*CAMPOS_CONSULTA))
+
+
+def resposta_csv(queryset, nome_arquivo='dados_climaticos.csv'):
+    """Transmite os dados em CSV, linha a linha"""
+    escritor = csv.writer(_Eco())
+
+    def linhas():
+        yield escritor.writerow(COLUNAS)
+        for linha in ler_linhas(queryset):
+            yield escritor.writerow(linha)
+
+    resposta = StreamingHttpResponse(linhas(), content_type='text/csv; charset=utf-8')
+    resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return resposta
+
+
+def resposta_ndjson(queryset):
+    """Transmite os dados em NDJSON (um objeto JSON por linha)"""
+    def linhas():
+        for linha in ler_linhas(queryset):
+            yield json.dumps(dict(zip(COLUNAS, linha))) + '\n'
+
+    return StreamingHttpResponse(linhas(), content_type='application/x-ndjson')
+
+
+def arrow_disponivel():
+    return pa is not None
+
+
+def _esquema_arrow():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('dispositivo', pa.int64()),
+        ('data', pa.timestamp('us', tz='UTC')),
+        ('temperatura', pa.float32()),
+        ('umidade', pa.float32()),
+        ('precipitacao', pa.float32()),
+        ('velocidade_vento', pa.float32()),
+        ('direcao_vento', pa.dictionary(pa.int16(), pa.string())),
+    ])
+
+
+def _lotes_arrow(queryset, esquema):
+    """
+    Monta RecordBatches colunares a partir do cursor do servidor, lote a lote.
+    A direção do vento usa um dicionário fixo (todas as direções cadastradas),
+    igual em todos os lotes.
+    """
+    chunk_size = getattr(settings, 'DADOS_STREAMING_CHUNK', 2000)
+    tamanho_lote = getattr(settings, 'DADOS_ARROW_LOTE', 65536)
+
+    direcoes = sorted(obter_direcoes().values(), key=lambda direcao: direcao.id)
+    dicionario = pa.array([direcao.nome for direcao in direcoes], type=pa.string())
+    indice_direcao = {direcao.id: indice for indice, direcao in enumerate(direcoes)}
+
+    linhas = queryset.order_by('time', 'id').values_list(*CAMPOS_CONSULTA).iterator(chunk_size=chunk_size)
+    while True:
+        bloco = list(itertools.islice(linhas, tamanho_lote))
+        if not bloco:
+            break
+        colunas = list(zip(*bloco))
+        indices_direcao = pa.array([indice_direcao.get(id) for id in colunas[7]], type=pa.int16())
+        yield pa.RecordBatch.from_arrays([
+            pa.array(colunas[0], type=pa.int64()),
+            pa.array(colunas[1], type=pa.int64()),
+            pa.array(colunas[2], type=pa.timestamp('us', tz='UTC')),
+            pa.array(colunas[3], type=pa.float32()),
+            pa.array(colunas[4], type=pa.float32()),
+            pa.array(colunas[5], type=pa.float32()),
+            pa.array(colunas[6], type=pa.float32()),
+            pa.DictionaryArray.from_arrays(indices_direcao, dicionario),
+        ], schema=esquema)
+
+
+def resposta_arrow(queryset):
+    """Transmite os dados como Arrow IPC stream, enviando cada lote assim que é montado"""
+    esquema = _esquema_arrow()
+
+    def partes():
+        buffer = io.BytesIO()
+        with pa.ipc.new_stream(buffer, esquema) as escritor:
+            for lote in _lotes_arrow(queryset, esquema):
+                escritor.write_batch(lote)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    resposta = StreamingHttpResponse(partes(), content_type='application/vnd.apache.arrow.stream')
+    resposta['Content-Disposition'] = 'attachment; filename="dados_climaticos.arrow"'
+    return resposta
+
+
+def resposta_parquet(queryset):
+    """
+    Gera um arquivo Parquet (um row group por lote) em arquivo temporário e o
+    transmite. O rodapé do Parquet só existe no fim, por isso não é enviado antes.
+    """
+    esquema = _esquema_arrow()
+    arquivo = tempfile.TemporaryFile()
+    with pq.ParquetWriter(arquivo, esquema) as escritor:
+        for lote in _lotes_arrow(queryset, esquema):
+            escritor.write_batch(lote)
+    arquivo.seek(0)
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename='dados_climaticos.parquet',
+        content_type='application/vnd.apache.parquet'
+    )
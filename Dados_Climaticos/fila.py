@@ -0,0 +1,197 @@
+import json
+import sqlite3
+import time
+import uuid
+from collections import defaultdict
+from django.conf import settings
+from Dispositivo.cache import buscar_por_id
+from .ingestao import apos_gravar, gravar_dados, ingerir_dados, validar_dados
+
+PENDENTE = 'pendente'
+PROCESSANDO = 'processando'
+CONCLUIDO = 'concluido'
+
+SQL_TABELA = """
+CREATE TABLE IF NOT EXISTS lote (
+    id TEXT PRIMARY KEY,
+    dispositivo_id INTEGER NOT NULL,
+    dados TEXT NOT NULL,
+    quantidade INTEGER NOT NULL,
+    situacao TEXT NOT NULL,
+    recebido_em REAL NOT NULL,
+    processado_em REAL,
+    criados INTEGER,
+    erros TEXT
+)
+"""
+SQL_INDICE = "CREATE INDEX IF NOT EXISTS lote_situacao_idx ON lote (situacao, recebido_em)"
+
+
+def habilitada():
+    return getattr(settings, 'INGESTAO_ASSINCRONA', False)
+
+
+def _conectar():
+    """
+    Conexão com a fila local (SQLite em modo WAL: os workers HTTP gravam
+    enquanto o processador lê). Cada chamada abre sua própria conexão.
+    """
+    conexao = sqlite3.connect(
+        str(getattr(settings, 'INGESTAO_FILA_ARQUIVO', settings.BASE_DIR / 'fila_ingestao.sqlite3')),
+        timeout=30,
+        isolation_level=None,
+    )
+    conexao.execute("PRAGMA journal_mode=WAL")
+    conexao.execute("PRAGMA synchronous=NORMAL")
+    conexao.execute(SQL_TABELA)
+    conexao.execute(SQL_INDICE)
+    return conexao
+
+
+def enfileirar(dispositivo_id, dados):
+    """Grava o lote na fila local e retorna seu id"""
+    lote_id = uuid.uuid4().hex
+    conexao = _conectar()
+    try:
+        conexao.execute(
+            "INSERT INTO lote (id, dispositivo_id, dados, quantidade, situacao, recebido_em) VALUES (?, ?, ?, ?, ?, ?)",
+            [lote_id, dispositivo_id, json.dumps(dados), len(dados), PENDENTE, time.time()]
+        )
+    finally:
+        conexao.close()
+    return lote_id
+
+
+def obter_lote(lote_id):
+    """Situação de um lote, com os erros por índice quando já processado; None se não existir"""
+    conexao = _conectar()
+    try:
+        linha = conexao.execute(
+            "SELECT id, dispositivo_id, quantidade, situacao, recebido_em, processado_em, criados, erros "
+            "FROM lote WHERE id = ?",
+            [lote_id]
+        ).fetchone()
+    finally:
+        conexao.close()
+    if linha is None:
+        return None
+    id, dispositivo_id, quantidade, situacao, recebido_em, processado_em, criados, erros = linha
+    return {
+        'lote': id,
+        'dispositivo': dispositivo_id,
+        'situacao': situacao,
+        'quantidade': quantidade,
+        'recebido_em': recebido_em,
+        'processado_em': processado_em,
+        'criados': criados,
+        'erros': json.loads(erros) if erros else [],
+    }
+
+
+def _reservar(conexao, maximo_linhas):
+    """Marca como em processamento os lotes pendentes mais antigos, até ~maximo_linhas itens"""
+    conexao.execute("BEGIN IMMEDIATE")
+    try:
+        lotes = []
+        total = 0
+        for id, dispositivo_id, dados, quantidade in conexao.execute(
+            "SELECT id, dispositivo_id, dados, quantidade FROM lote WHERE situacao = ? ORDER BY recebido_em",
+            [PENDENTE]
+        ):
+            if lotes and total + quantidade > maximo_linhas:
+                break
+            lotes.append((id, dispositivo_id, json.loads(dados)))
+            total += quantidade
+        conexao.executemany(
+            "UPDATE lote SET situacao = ? WHERE id = ?",
+            [(PROCESSANDO, id) for id, _, _ in lotes]
+        )
+        conexao.execute("COMMIT")
+    except Exception:
+        conexao.execute("ROLLBACK")
+        raise
+    return lotes
+
+
+def _processar_lotes(lotes):
+    """
+    Valida cada lote e grava todos os itens válidos em um único bulk insert.
+    Se o insert combinado falhar, grava lote a lote para isolar o erro.
+    Retorna {lote_id: (criados, erros)}.
+    """
+    resultado = {}
+    validados = []
+    for lote_id, dispositivo_id, dados in lotes:
+        dispositivo = buscar_por_id(dispositivo_id)
+        if dispositivo is None:
+            resultado[lote_id] = (0, [{'index': idx, 'msg': 'Dispositivo não encontrado'} for idx in range(len(dados))])
+            continue
+        objetos, _, erros = validar_dados(dispositivo, dados)
+        validados.append((lote_id, dispositivo, dados, objetos, erros))
+
+    try:
+        gravar_dados([objeto for _, _, _, objetos, _ in validados for objeto in objetos])
+    except Exception:
+        for lote_id, dispositivo, dados, _, _ in validados:
+            criados, erros = ingerir_dados(dispositivo, dados)
+            resultado[lote_id] = (len(criados), erros)
+        return resultado
+
+    por_dispositivo = defaultdict(list)
+    dispositivos = {}
+    for lote_id, dispositivo, _, objetos, erros in validados:
+        por_dispositivo[dispositivo.id] += objetos
+        dispositivos[dispositivo.id] = dispositivo
+        resultado[lote_id] = (len(objetos), sorted(erros, key=lambda erro: erro['index']))
+    for dispositivo_id, objetos in por_dispositivo.items():
+        apos_gravar(dispositivos[dispositivo_id], objetos)
+    return resultado
+
+
+def processar(maximo_linhas=None):
+    """Processa uma rodada da fila; retorna a quantidade de lotes processados"""
+    maximo_linhas = maximo_linhas or getattr(settings, 'INGESTAO_FILA_LOTE', 20000)
+    conexao = _conectar()
+    try:
+        lotes = _reservar(conexao, maximo_linhas)
+        if not lotes:
+            return 0
+        resultado = _processar_lotes(lotes)
+        agora = time.time()
+        conexao.executemany(
+            "UPDATE lote SET situacao = ?, processado_em = ?, criados = ?, erros = ? WHERE id = ?",
+            [
+                (CONCLUIDO, agora, criados, json.dumps(erros), lote_id)
+                for lote_id, (criados, erros) in resultado.items()
+            ]
+        )
+        return len(lotes)
+    finally:
+        conexao.close()
+
+
+def recuperar():
+    """
+    Devolve à fila os lotes que ficaram em processamento (processador
+    interrompido). A entrega é "pelo menos uma vez": um lote gravado no banco
+    mas não marcado como concluído será gravado de novo.
+    """
+    conexao = _conectar()
+    try:
+        return conexao.execute(
+            "UPDATE lote SET situacao = ? WHERE situacao = ?", [PENDENTE, PROCESSANDO]
+        ).rowcount
+    finally:
+        conexao.close()
+
+
+def limpar():
+    """Remove lotes concluídos há mais de INGESTAO_FILA_RETENCAO segundos"""
+    limite = time.time() - getattr(settings, 'INGESTAO_FILA_RETENCAO', 7 * 86400)
+    conexao = _conectar()
+    try:
+        return conexao.execute(
+            "DELETE FROM lote WHERE situacao = ? AND processado_em < ?", [CONCLUIDO, limite]
+        ).rowcount
+    finally:
+        conexao.close()
@@ -0,0 +1,92 @@
+import io
+import numpy as np
+from django.db import connection
+from .models import CAMPOS_NUMERICOS as CAMPOS, DadoClimatico
+
+
+def _filtro_sql(campo):
+    return (
+        f"FROM dado_climatico "
+        f"WHERE dispositivo_id = ANY(%s) AND time >= %s AND time <= %s AND {campo} IS NOT NULL"
+    )
+
+
+def histograma_banco(dispositivos_ids, campo, inicio, fim, bins=10, bordas=None):
+    """
+    Calcula o histograma no PostgreSQL com width_bucket, trafegando apenas
+    as contagens. Sem bordas fixas, mínimo e máximo são calculados na mesma
+    consulta (mesmas bordas de np.histogram, inclusive quando todos os valores
+    são iguais). Retorna (contagens, bordas) como arrays NumPy, ou None se não
+    houver dados.
+    """
+    if campo not in CAMPOS:
+        raise ValueError(f'Campo inválido: {campo}')
+
+    with connection.cursor() as cursor:
+        if bordas is not None:
+            bins = len(bordas) - 1
+            cursor.execute(
+                f"SELECT LEAST(width_bucket({campo}, %s::float8[]), %s) AS faixa, count(*) "
+                f"{_filtro_sql(campo)} AND {campo} >= %s AND {campo} <= %s "
+                f"GROUP BY faixa ORDER BY faixa",
+                [list(bordas), bins, list(dispositivos_ids), inicio, fim, bordas[0], bordas[-1]]
+            )
+            linhas = cursor.fetchall()
+            bordas = np.asarray(bordas, dtype=np.float64)
+        else:
+            cursor.execute(
+                f"WITH valores AS (SELECT {campo} AS x {_filtro_sql(campo)}), "
+                f"limites AS ("
+                f"  SELECT CASE WHEN max(x) > min(x) THEN min(x) ELSE min(x) - 0.5 END AS minimo, "
+                f"         CASE WHEN max(x) > min(x) THEN max(x) ELSE max(x) + 0.5 END AS maximo "
+                f"  FROM valores"
+                f") "
+                f"SELECT minimo, maximo, LEAST(width_bucket(x, minimo, maximo, %s), %s) AS faixa, count(*) "
+                f"FROM valores, limites GROUP BY minimo, maximo, faixa ORDER BY faixa",
+                [list(dispositivos_ids), inicio, fim, bins, bins]
+            )
+            resultado = cursor.fetchall()
+            if not resultado:
+                return None
+            linhas = [(faixa, quantidade) for _, _, faixa, quantidade in resultado]
+            bordas = np.linspace(resultado[0][0], resultado[0][1], bins + 1)
+
+    if not linhas:
+        return None
+
+    contagens = np.zeros(bins, dtype=np.int64)
+    for faixa, quantidade in linhas:
+        contagens[faixa - 1] = quantidade
+    return contagens, bordas
+
+
+def carregar_valores(dispositivos_ids, campo, inicio, fim):
+    """
+    Carrega os valores do campo direto para um array NumPy. Com psycopg2 usa
+    COPY ... TO STDOUT e converte o texto em C (np.fromstring), sem criar um
+    objeto Python por linha; caso contrário, lê do cursor com np.fromiter.
+    """
+    valores_qs = DadoClimatico.objects.filter(
+        dispositivo_id__in=dispositivos_ids,
+        time__range=(inicio, fim),
+    ).exclude(**{f'{campo}__isnull': True}).values_list(campo, flat=True)
+
+    with connection.cursor() as cursor:
+        if hasattr(cursor.cursor, 'copy_expert'):
+            sql, params = valores_qs.query.sql_with_params()
+            consulta = cursor.cursor.mogrify(sql, params).decode()
+            buffer = io.BytesIO()
+            cursor.cursor.copy_expert(f'COPY ({consulta}) TO STDOUT', buffer)
+            return np.fromstring(buffer.getvalue().decode(), dtype=np.float64, sep='\n')
+
+    return np.fromiter(valores_qs.iterator(chunk_size=10000), dtype=np.float64)
+
+
+def histograma_python(dispositivos_ids, campo, inicio, fim, bins=10, bordas=None):
+    """Mesmo resultado de histograma_banco, calculado com np.histogram"""
+    valores = carregar_valores(dispositivos_ids, campo, inicio, fim)
+    if bordas is not None:
+        valores = valores[(valores >= bordas[0]) & (valores <= bordas[-1])]
+    if valores.size == 0:
+        return None
+    return np.histogram(valores, bins=bordas if bordas is not None else bins)
@@ -0,0 +1,126 @@
+from django.conf import settings
+from .models import CAMPOS_NUMERICOS as CAMPOS
+
+TABELA = 'dado_climatico'
+
+
+def intervalo_chunk():
+    return getattr(settings, 'DADOS_CHUNK_INTERVALO', '1 day')
+
+
+def campos_indices_parciais():
+    campos = getattr(settings, 'DADOS_INDICES_PARCIAIS', [])
+    invalidos = [campo for campo in campos if campo not in CAMPOS]
+    if invalidos:
+        raise ValueError(f'DADOS_INDICES_PARCIAIS contém campos inválidos: {", ".join(invalidos)}')
+    return list(campos)
+
+
+def nome_indice_parcial(campo):
+    return f'{TABELA}_{campo}_parcial_idx'
+
+
+def ajustar_intervalo_chunk(cursor, intervalo=None):
+    """Altera o intervalo dos próximos chunks (os chunks existentes não mudam)"""
+    intervalo = intervalo or intervalo_chunk()
+    cursor.execute(
+        "SELECT set_chunk_time_interval(%s, %s::interval)",
+        [TABELA, intervalo]
+    )
+    return intervalo
+
+
+def criar_indices_parciais(cursor, campos=None):
+    """
+    Índice parcial por medição: (dispositivo_id, time) só das linhas com o
+    campo preenchido, incluindo o próprio valor para permitir index-only scan
+    no histograma. Retorna os nomes dos índices garantidos.
+    """
+    campos = campos_indices_parciais() if campos is None else campos
+    nomes = []
+    for campo in campos:
+        nome = nome_indice_parcial(campo)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {nome} ON {TABELA} (dispositivo_id, time DESC) "
+            f"INCLUDE ({campo}) WHERE {campo} IS NOT NULL"
+        )
+        nomes.append(nome)
+    return nomes
+
+
+def remover_indices_parciais(cursor, campos=None):
+    """Remove os índices parciais dos campos informados (por padrão, de todos)"""
+    campos = CAMPOS if campos is None else campos
+    for campo in campos:
+        cursor.execute(f"DROP INDEX IF EXISTS {nome_indice_parcial(campo)}")
+
+
+def intervalo_compressao():
+    return getattr(settings, 'COMPRESSAO_APOS', '30 days')
+
+
+def habilitar_compressao(cursor):
+    """
+    Compressão nativa segmentada por dispositivo e ordenada por tempo: as
+    consultas por dispositivo + intervalo descomprimem apenas os segmentos do
+    dispositivo, já na ordem em que são lidos.
+    """
+    cursor.execute(
+        f"ALTER TABLE {TABELA} SET ("
+        f"timescaledb.compress, "
+        f"timescaledb.compress_segmentby = 'dispositivo_id', "
+        f"timescaledb.compress_orderby = 'time DESC')"
+    )
+
+
+def ajustar_politica_compressao(cursor, intervalo=None):
+    """(Re)cria a política que comprime chunks mais antigos que `intervalo`"""
+    intervalo = intervalo or intervalo_compressao()
+    cursor.execute("SELECT remove_compression_policy(%s, if_exists => true)", [TABELA])
+    cursor.execute(
+        "SELECT add_compression_policy(%s, compress_after => %s::interval)",
+        [TABELA, intervalo]
+    )
+    return intervalo
+
+
+def desabilitar_compressao(cursor):
+    """Remove a política, descomprime todos os chunks e desliga a compressão"""
+    cursor.execute("SELECT remove_compression_policy(%s, if_exists => true)", [TABELA])
+    cursor.execute(
+        "SELECT decompress_chunk(c, if_compressed => true) FROM show_chunks(%s) c",
+        [TABELA]
+    )
+    cursor.execute(f"ALTER TABLE {TABELA} SET (timescaledb.compress = false)")
+
+
+def comprimir_chunks(cursor, intervalo):
+    """Comprime já os chunks mais antigos que `intervalo` (ignora os já comprimidos); retorna quantos foram verificados"""
+    cursor.execute(
+        "SELECT compress_chunk(c, if_not_compressed => true) "
+        "FROM show_chunks(%s, older_than => %s::interval) c",
+        [TABELA, intervalo]
+    )
+    return len(cursor.fetchall())
+
+
+def estatisticas_compressao(cursor):
+    """(chunks, chunks comprimidos, bytes antes, bytes depois) do hypertable"""
+    cursor.execute(
+        "SELECT total_chunks, number_compressed_chunks, "
+        "before_compression_total_bytes, after_compression_total_bytes "
+        "FROM hypertable_compression_stats(%s)",
+        [TABELA]
+    )
+    return cursor.fetchone()
+
+
+def periodo_comprimido(cursor):
+    """(inicio, fim) coberto pelos chunks comprimidos, ou None se não houver"""
+    cursor.execute(
+        "SELECT min(range_start), max(range_end) FROM timescaledb_information.chunks "
+        "WHERE hypertable_name = %s AND is_compressed",
+        [TABELA]
+    )
+    inicio, fim = cursor.fetchone()
+    return None if inicio is None else (inicio, fim)
@@ -0,0 +1,295 @@
+import logging
+import math
+from datetime import datetime, timezone as dt_timezone
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import CAMPOS_NUMERICOS, DadoClimatico
+from .arquivamento import limite_dados_brutos
+from .cache_consultas import invalidar as invalidar_consultas
+from . import agregados, eventos, ultimo_dado
+from .parsers import LoteColunar
+from Direcao_Vento.cache import obter_direcoes
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_MEDICAO = CAMPOS_NUMERICOS + ['direcao_vento']
+
+
+def _numero(valor):
+    """Converte uma medição para float; ValueError se não for um número finito"""
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        raise ValueError('valor booleano')
+    numero = float(valor)
+    if not math.isfinite(numero):
+        raise ValueError('valor não finito')
+    return numero
+
+
+def anterior_ao_arquivo(data, limite):
+    """
+    Dados anteriores ao limite de arquivamento não são aceitos: o período já
+    foi resumido no arquivo horário e os chunks brutos foram removidos.
+    """
+    if timezone.is_naive(data):
+        data = timezone.make_aware(data)
+    return data < limite
+
+
+def validar_dados(dispositivo, dados):
+    """
+    Valida todos os itens em memória, sem acessar o banco por item.
+    Retorna (objetos, indices, erros), onde indices[i] é a posição
+    original na lista de entrada do objeto objetos[i].
+    """
+    direcoes = None
+    objetos = []
+    indices = []
+    erros = []
+    limite = limite_dados_brutos()
+
+    for idx, dado in enumerate(dados):
+        if not isinstance(dado, dict):
+            erros.append({'index': idx, 'msg': 'Formato inválido: item deve ser um objeto'})
+            continue
+
+        # Validação de campos obrigatórios
+        if not dado.get('data'):
+            erros.append({'index': idx, 'msg': 'Campo data obrigatório'})
+            continue
+
+        if not any(dado.get(campo) is not None for campo in CAMPOS_MEDICAO):
+            erros.append({'index': idx, 'msg': 'Pelo menos uma medição é obrigatória'})
+            continue
+
+        # Valida formato ISO da data
+        try:
+            data = datetime.fromisoformat(dado['data'])
+        except (TypeError, ValueError) as e:
+            erros.append({'index': idx, 'msg': f'Formato inválido: {str(e)}'})
+            continue
+
+        # Data com fuso (sem fuso: fuso local), no mesmo formato dos dados lidos do banco
+        if timezone.is_naive(data):
+            data = timezone.make_aware(data)
+
+        if limite is not None and anterior_ao_arquivo(data, limite):
+            erros.append({'index': idx, 'msg': f'Data anterior ao limite de arquivamento ({limite.isoformat()})'})
+            continue
+
+        # Medições numéricas: um valor inválido rejeita só este item, não o lote
+        try:
+            medicoes = {campo: _numero(dado.get(campo)) for campo in CAMPOS_NUMERICOS}
+        except (TypeError, ValueError) as e:
+            erros.append({'index': idx, 'msg': f'Medição inválida: {str(e)}'})
+            continue
+
+        # Resolve direção do vento a partir do cache em memória
+        direcao = None
+        if direcao_nome := dado.get('direcao_vento'):
+            if direcoes is None:
+                direcoes = obter_direcoes()
+            direcao = direcoes.get(str(direcao_nome).upper())
+            if direcao is None:
+                erros.append({'index': idx, 'msg': f'Direção do vento inválida: {direcao_nome}'})
+                continue
+
+        objetos.append(DadoClimatico(
+            dispositivo=dispositivo,
+            time=data,
+            direcao_vento_id=direcao,
+            **medicoes
+        ))
+        indices.append(idx)
+
+    return objetos, indices, erros
+
+
+# Datas representáveis em datetime (anos 1 a 9999), em ms desde a época
+TEMPO_MINIMO = -62135596800000
+TEMPO_MAXIMO = 253402300799999
+
+
+def _valores_float32(coluna):
+    """float32 -> float; NaN (ausente) -> None"""
+    return [None if valor != valor else valor for valor in coluna.astype(np.float64).tolist()]
+
+
+def _tempos_invalidos(lote):
+    return (lote.tempos < TEMPO_MINIMO) | (lote.tempos > TEMPO_MAXIMO)
+
+
+def erros_colunas(lote):
+    """
+    Erros por índice que dependem só dos arrays de um upload binário: data
+    fora do intervalo representável e medições infinitas (NaN = ausente).
+    Retorna {índice: mensagem}.
+    """
+    tempos_invalidos = _tempos_invalidos(lote)
+    infinitas = np.zeros(len(lote), dtype=bool)
+    for coluna in lote.medicoes.values():
+        infinitas |= ~(np.isfinite(coluna) | np.isnan(coluna))
+
+    erros = {idx: 'Data fora do intervalo permitido' for idx in np.flatnonzero(tempos_invalidos).tolist()}
+    for idx in np.flatnonzero(infinitas & ~tempos_invalidos).tolist():
+        erros[idx] = 'Medição inválida: valor não finito'
+    return erros
+
+
+def validar_colunas(dispositivo, lote):
+    """
+    Equivalente a validar_dados para um upload binário (parsers.LoteColunar):
+    as validações são feitas sobre os arrays e os objetos são montados direto
+    das colunas, sem dicionários intermediários.
+    """
+    invalidos = erros_colunas(lote)
+    medicoes = {campo: _valores_float32(coluna) for campo, coluna in lote.medicoes.items()}
+    ids_direcoes = lote.direcoes.tolist()
+
+    # Pelo menos uma medição por leitura
+    presentes = lote.direcoes != 0
+    for coluna in lote.medicoes.values():
+        presentes |= ~np.isnan(coluna)
+
+    direcoes = {direcao.id: direcao for direcao in obter_direcoes().values()} if presentes.any() else {}
+    # Tempos fora do intervalo viram 0 só para a conversão (esses itens já têm erro)
+    tempos = np.where(_tempos_invalidos(lote), 0, lote.tempos).astype('datetime64[ms]').tolist()
+
+    limite = limite_dados_brutos()
+    if limite is not None:
+        arquivados = (lote.tempos < int(limite.timestamp() * 1000)).tolist()
+    else:
+        arquivados = [False] * len(lote)
+
+    objetos = []
+    indices = []
+    erros = []
+    for idx, presente in enumerate(presentes.tolist()):
+        if not presente:
+            erros.append({'index': idx, 'msg': 'Pelo menos uma medição é obrigatória'})
+            continue
+
+        if idx in invalidos:
+            erros.append({'index': idx, 'msg': invalidos[idx]})
+            continue
+
+        if arquivados[idx]:
+            erros.append({'index': idx, 'msg': f'Data anterior ao limite de arquivamento ({limite.isoformat()})'})
+            continue
+
+        direcao = None
+        if ids_direcoes[idx]:
+            direcao = direcoes.get(ids_direcoes[idx])
+            if direcao is None:
+                erros.append({'index': idx, 'msg': f'Direção do vento inválida: {ids_direcoes[idx]}'})
+                continue
+
+        objetos.append(DadoClimatico(
+            dispositivo=dispositivo,
+            time=tempos[idx].replace(tzinfo=dt_timezone.utc),
+            temperatura=medicoes['temperatura'][idx],
+            umidade=medicoes['umidade'][idx],
+            precipitacao=medicoes['precipitacao'][idx],
+            velocidade_vento=medicoes['velocidade_vento'][idx],
+            direcao_vento_id=direcao
+        ))
+        indices.append(idx)
+
+    return objetos, indices, erros
+
+
+def colunas_para_dados(lote):
+    """
+    Converte um LoteColunar na lista de dicionários do formato JSON (usada pela
+    fila assíncrona). O lote não pode ter erros de erros_colunas().
+    """
+    nomes = {direcao.id: direcao.nome for direcao in obter_direcoes().values()}
+    medicoes = {campo: _valores_float32(coluna) for campo, coluna in lote.medicoes.items()}
+    dados = []
+    for idx, (tempo, direcao_id) in enumerate(zip(lote.tempos.astype('datetime64[ms]').tolist(), lote.direcoes.tolist())):
+        dado = {'data': tempo.replace(tzinfo=dt_timezone.utc).isoformat()}
+        for campo, valores in medicoes.items():
+            if valores[idx] is not None:
+                dado[campo] = valores[idx]
+        if direcao_id:
+            dado['direcao_vento'] = nomes.get(direcao_id, str(direcao_id))
+        dados.append(dado)
+    return dados
+
+
+def gravar_dados(objetos):
+    """Insere os objetos com INSERTs multi-linha em lotes de INGESTAO_BATCH_SIZE"""
+    if not objetos:
+        return []
+    batch_size = getattr(settings, 'INGESTAO_BATCH_SIZE', 1000)
+    with transaction.atomic():
+        return DadoClimatico.objects.bulk_create(objetos, batch_size=batch_size)
+
+
+def apos_gravar(dispositivo, objetos):
+    """
+    Atualiza as estruturas derivadas após gravar dados de um dispositivo.
+    Os dados já estão gravados: uma falha aqui é registrada no log e não vira
+    erro para o cliente (que reenviaria o lote, duplicando os dados).
+    """
+    if not objetos:
+        return
+    etapas = [
+        ('último dado', lambda: ultimo_dado.atualizar(objetos)),
+        ('eventos', lambda: eventos.publicar(objetos)),
+        ('agregados contínuos', lambda: agregados.atualizar([objeto.time for objeto in objetos])),
+        ('cache de consultas', lambda: invalidar_consultas(dispositivo.id, [objeto.time for objeto in objetos])),
+    ]
+    _executar_etapas(etapas, dispositivo.id)
+
+
+def apos_alterar(dado, instantes, evento):
+    """
+    Equivalente a apos_gravar para a edição ou exclusão de um dado: o último
+    dado do dispositivo é recalculado a partir do banco, o `evento`
+    ('alteracao' ou 'remocao') é publicado e os agregados e o cache são
+    atualizados nos `instantes` afetados (data original e nova).
+    """
+    etapas = [
+        ('último dado', lambda: ultimo_dado.recalcular(dado.dispositivo_id)),
+        ('eventos', lambda: eventos.publicar([dado], evento)),
+        ('agregados contínuos', lambda: agregados.atualizar(instantes)),
+        ('cache de consultas', lambda: invalidar_consultas(dado.dispositivo_id, instantes)),
+    ]
+    _executar_etapas(etapas, dado.dispositivo_id)
+
+
+def _executar_etapas(etapas, dispositivo_id):
+    for nome, etapa in etapas:
+        try:
+            etapa()
+        except Exception:
+            logger.exception('Falha ao atualizar %s do dispositivo %s após gravar dados', nome, dispositivo_id)
+
+
+def ingerir_dados(dispositivo, dados):
+    """
+    Valida e grava uma lista de dados de um dispositivo (lista de dicionários
+    do JSON ou parsers.LoteColunar do upload binário).
+    Retorna (criados, erros) com a mesma estrutura de erros por índice
+    usada pelo endpoint de criação.
+    """
+    if isinstance(dados, LoteColunar):
+        objetos, indices, erros = validar_colunas(dispositivo, dados)
+    else:
+        objetos, indices, erros = validar_dados(dispositivo, dados)
+
+    try:
+        criados = gravar_dados(objetos)
+    except Exception as e:
+        # Lote inteiro é revertido: reporta o erro em cada item que seria gravado
+        erros.extend({'index': idx, 'msg': f'Erro interno: {str(e)}'} for idx in indices)
+        criados = []
+    else:
+        apos_gravar(dispositivo, criados)
+
+    erros.sort(key=lambda erro: erro['index'])
+    return criados, erros
@@ -0,0 +1,354 @@
+import math
+from datetime import datetime, timedelta
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import Distance as D
+from django.db import connection
+from django.utils import timezone
+from Dispositivo.indice_espacial import RAIO_TERRA_KM, corda_para_km, vetores_unitarios
+from Dispositivo.models import Dispositivo
+from Dispositivo.tiles import versao as versao_localizacoes
+from .agregados import CAMPOS, fontes
+from .cache_consultas import obter_ou_calcular
+
+METODOS = ['idw', 'kriging']
+
+# Células por lado de um tile da grade global (unidade de cálculo e de cache)
+TAMANHO_TILE = 64
+
+# Pontos interpolados por vez: limita a matriz pontos x estações em memória
+BLOCO = 1024
+
+
+class Estacoes:
+    """Estações do círculo de busca: coordenadas, vetores na esfera unitária e valores (NaN sem valor)"""
+
+    def __init__(self, ids, latitudes, longitudes, valores):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.valores = np.asarray(valores, dtype=np.float64)
+        self.vetores = vetores_unitarios(self.latitudes, self.longitudes)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def proximas(self, latitude, longitude, raio_km):
+        """Subconjunto das estações a até raio_km do ponto"""
+        vetor = vetores_unitarios(latitude, longitude)[0]
+        dentro = corda_para_km(np.linalg.norm(self.vetores - vetor, axis=1)) <= raio_km
+        return self._subconjunto(dentro)
+
+    def com_valor(self):
+        """Subconjunto das estações que têm valor (as usadas na interpolação)"""
+        return self._subconjunto(~np.isnan(self.valores))
+
+    def _subconjunto(self, mascara):
+        return Estacoes(self.ids[mascara], self.latitudes[mascara], self.longitudes[mascara], self.valores[mascara])
+
+
+def distancia_km(latitude, longitude, latitudes, longitudes):
+    vetor = vetores_unitarios(latitude, longitude)[0]
+    return corda_para_km(np.linalg.norm(vetores_unitarios(latitudes, longitudes) - vetor, axis=1))
+
+
+def area_de_busca(lon_min, lat_min, lon_max, lat_max, margem_km):
+    """
+    Círculo (centro, raio em km) que cobre o retângulo mais a margem. Usado com
+    ST_DWithin, que é exato na esfera (um polígono geography teria arestas em
+    círculos máximos, não nas linhas de latitude do retângulo).
+    """
+    latitude = (lat_min + lat_max) / 2
+    longitude = (lon_min + lon_max) / 2
+    amostras = np.linspace(0, 1, 17)
+    bordas_lat = np.concatenate([
+        lat_min + (lat_max - lat_min) * amostras, lat_min + (lat_max - lat_min) * amostras,
+        np.full(17, lat_min), np.full(17, lat_max),
+    ])
+    bordas_lon = np.concatenate([
+        np.full(17, lon_min), np.full(17, lon_max),
+        lon_min + (lon_max - lon_min) * amostras, lon_min + (lon_max - lon_min) * amostras,
+    ])
+    raio = float(distancia_km(latitude, longitude, bordas_lat, bordas_lon).max()) * 1.01
+    return latitude, longitude, min(raio + margem_km, math.pi * RAIO_TERRA_KM)
+
+
+def estacoes_ultimo_dado(campo, latitude, longitude, raio_km, recentes=None):
+    """
+    Último valor do campo de cada estação no círculo (NaN sem valor ou, com
+    `recentes`, com valor antigo); retorna (Estacoes, data mais antiga usada).
+    """
+    centro = Point(longitude, latitude, srid=4326)
+    linhas = Dispositivo.objects.filter(localizacao__dwithin=(centro, D(km=raio_km))).values_list(
+        'id', 'localizacao', f'ultimo_dado__{campo}', 'ultimo_dado__time'
+    )
+    corte = timezone.now() - timedelta(minutes=recentes) if recentes else None
+    ids, latitudes, longitudes, valores, datas = [], [], [], [], []
+    for dispositivo_id, localizacao, valor, data in linhas:
+        if valor is not None and (corte is None or data >= corte):
+            datas.append(data)
+        else:
+            valor = np.nan
+        ids.append(dispositivo_id)
+        latitudes.append(localizacao.y)
+        longitudes.append(localizacao.x)
+        valores.append(valor)
+    return Estacoes(ids, latitudes, longitudes, valores), min(datas, default=None)
+
+
+def estacoes_periodo(campo, latitude, longitude, raio_km, inicio, fim):
+    """Média do campo no período para cada estação no círculo (dados brutos e arquivados; NaN sem dados)"""
+    centro = Point(longitude, latitude, srid=4326)
+    localizacoes = dict(
+        Dispositivo.objects.filter(localizacao__dwithin=(centro, D(km=raio_km))).values_list('id', 'localizacao')
+    )
+    medias = {}
+    if localizacoes:
+        sql_fontes, parametros = fontes([campo], list(localizacoes), inicio, fim)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT dispositivo_id, SUM({campo}_soma) / NULLIF(SUM({campo}_contagem), 0) "
+                f"FROM ({sql_fontes}) AS fontes GROUP BY 1",
+                parametros
+            )
+            medias = {dispositivo_id: media for dispositivo_id, media in cursor.fetchall() if media is not None}
+    # Estações sem dados também entram: dados que chegarem delas alteram o resultado
+    return Estacoes(
+        list(localizacoes),
+        [localizacao.y for localizacao in localizacoes.values()],
+        [localizacao.x for localizacao in localizacoes.values()],
+        [medias.get(dispositivo_id, np.nan) for dispositivo_id in localizacoes],
+    )
+
+
+def _idw(distancias, validos, valores, potencia):
+    # Distância mínima de 1 mm: um ponto sobre a estação recebe, na prática, o valor dela
+    pesos = np.where(validos, 1 / np.maximum(distancias, 1e-6) ** potencia, 0)
+    soma = pesos.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(soma > 0, (pesos * valores).sum(axis=1) / soma, np.nan)
+
+
+def _kriging(vetores, distancias, validos, valores, patamar, alcance_km):
+    """
+    Krigagem ordinária com variograma exponencial, um sistema (k+1)x(k+1) por
+    ponto, resolvidos em lote. Vizinhos fora do raio ficam desacoplados (peso 0).
+    Um efeito pepita mínimo na diagonal mantém o sistema inversível com
+    estações na mesma posição (que passam a dividir o peso).
+    """
+    def variograma(h):
+        return patamar * (1 - np.exp(-3 * h / alcance_km))
+
+    pontos, k = distancias.shape
+    entre = corda_para_km(np.linalg.norm(vetores[:, :, None, :] - vetores[:, None, :, :], axis=-1))
+    pares = validos[:, :, None] & validos[:, None, :]
+
+    sistema = np.zeros((pontos, k + 1, k + 1))
+    sistema[:, :k, :k] = np.where(pares, variograma(entre), 0)
+    diagonal = np.arange(k)
+    sistema[:, diagonal, diagonal] = np.where(validos, -1e-9 * patamar, 1)
+    sistema[:, :k, k] = validos
+    sistema[:, k, :k] = validos
+
+    lado_direito = np.zeros((pontos, k + 1))
+    lado_direito[:, :k] = np.where(validos, variograma(distancias), 0)
+    lado_direito[:, k] = 1
+
+    try:
+        pesos = np.linalg.solve(sistema, lado_direito[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        # Sistema singular mesmo assim: pseudo-inversa (bem mais lenta)
+        pesos = (np.linalg.pinv(sistema) @ lado_direito[..., None])[..., 0]
+    estimativa = (pesos[:, :k] * np.where(validos, valores, 0)).sum(axis=1)
+    return np.where(validos.any(axis=1), estimativa, np.nan)
+
+
+def interpolar(estacoes, latitudes, longitudes, opcoes):
+    """
+    Valor interpolado em cada ponto a partir das `vizinhos` estações mais próximas
+    dentro de `raio` km (NaN se não houver nenhuma). Distâncias na esfera.
+    """
+    alvos = vetores_unitarios(latitudes, longitudes)
+    resultado = np.full(len(alvos), np.nan)
+    estacoes = estacoes.com_valor()
+    if not len(estacoes):
+        return resultado
+
+    k = min(opcoes['vizinhos'], len(estacoes))
+    patamar = float(estacoes.valores.var()) or 1.0
+    for inicio in range(0, len(alvos), BLOCO):
+        bloco = alvos[inicio:inicio + BLOCO]
+        # |a - b|² = 2 - 2 a·b para vetores unitários
+        cordas = np.sqrt(np.maximum(2 - 2 * bloco @ estacoes.vetores.T, 0))
+        if k < len(estacoes):
+            vizinhos = np.argpartition(cordas, k - 1, axis=1)[:, :k]
+        else:
+            vizinhos = np.broadcast_to(np.arange(k), (len(bloco), k))
+        distancias = corda_para_km(np.take_along_axis(cordas, vizinhos, axis=1))
+        validos = distancias <= opcoes['raio']
+        valores = estacoes.valores[vizinhos]
+
+        if opcoes['metodo'] == 'kriging':
+            parcial = _kriging(estacoes.vetores[vizinhos], distancias, validos, valores, patamar, opcoes['alcance'])
+        else:
+            parcial = _idw(distancias, validos, valores, opcoes['potencia'])
+        resultado[inicio:inicio + len(bloco)] = parcial
+    return resultado
+
+
+def ler_opcoes(parametros):
+    """Valida os parâmetros comuns da interpolação; lança ValueError com a mensagem para o cliente"""
+    campo = parametros.get('campo', 'temperatura')
+    if campo not in CAMPOS:
+        raise ValueError(f'Parâmetro "campo" inválido. Use {", ".join(CAMPOS)}.')
+    metodo = parametros.get('metodo', 'idw')
+    if metodo not in METODOS:
+        raise ValueError('Parâmetro "metodo" inválido. Use "idw" ou "kriging".')
+
+    try:
+        vizinhos = int(parametros.get('vizinhos', getattr(settings, 'INTERPOLACAO_VIZINHOS', 12)))
+        potencia = float(parametros.get('potencia', 2))
+        raio = float(parametros.get('raio', getattr(settings, 'INTERPOLACAO_RAIO_KM', 100)))
+        alcance = float(parametros.get('alcance', getattr(settings, 'INTERPOLACAO_ALCANCE_KM', 100)))
+        recentes = parametros.get('recentes')
+        recentes = int(recentes) if recentes else None
+    except ValueError:
+        raise ValueError('Parâmetros "vizinhos", "potencia", "raio", "alcance" e "recentes" devem ser numéricos.')
+
+    # Krigagem resolve um sistema (vizinhos+1)² por célula: limite menor que o do IDW
+    if metodo == 'kriging':
+        vizinhos_maximo = getattr(settings, 'INTERPOLACAO_KRIGING_VIZINHOS_MAXIMO', 32)
+    else:
+        vizinhos_maximo = getattr(settings, 'INTERPOLACAO_VIZINHOS_MAXIMO', 64)
+    if not 1 <= vizinhos <= vizinhos_maximo:
+        raise ValueError(f'Parâmetro "vizinhos" deve estar entre 1 e {vizinhos_maximo}.')
+    raio_maximo = getattr(settings, 'INTERPOLACAO_RAIO_MAXIMO_KM', 1000)
+    if not 0 < raio <= raio_maximo:
+        raise ValueError(f'Parâmetro "raio" deve estar entre 0 e {raio_maximo} km.')
+    if not 0 < potencia <= 5 or alcance <= 0 or (recentes is not None and recentes <= 0):
+        raise ValueError('Parâmetros "potencia" (até 5), "alcance" e "recentes" devem ser positivos.')
+
+    inicio_str = parametros.get('inicio')
+    fim_str = parametros.get('fim')
+    inicio = fim = None
+    if inicio_str or fim_str:
+        if not inicio_str or not fim_str:
+            raise ValueError('Informe "inicio" e "fim" juntos.')
+        try:
+            inicio = timezone.make_aware(datetime.fromisoformat(inicio_str))
+            fim = timezone.make_aware(datetime.fromisoformat(fim_str))
+        except ValueError:
+            raise ValueError('Data "inicio" ou "fim" inválida')
+        if inicio >= fim:
+            raise ValueError('"inicio" deve ser anterior a "fim".')
+
+    return {
+        'campo': campo, 'metodo': metodo, 'vizinhos': vizinhos, 'potencia': potencia,
+        'raio': raio, 'alcance': alcance, 'recentes': recentes, 'inicio': inicio, 'fim': fim,
+    }
+
+
+def carregar_estacoes(opcoes, latitude, longitude, raio_km):
+    """Estações no círculo: média do período (inicio/fim) ou último dado; retorna (Estacoes, inicio, fim)"""
+    if opcoes['inicio'] is not None:
+        estacoes = estacoes_periodo(opcoes['campo'], latitude, longitude, raio_km, opcoes['inicio'], opcoes['fim'])
+        return estacoes, opcoes['inicio'], opcoes['fim']
+    estacoes, mais_antigo = estacoes_ultimo_dado(opcoes['campo'], latitude, longitude, raio_km, opcoes['recentes'])
+    # Qualquer dado novo dessas estações altera o resultado
+    agora = timezone.now()
+    return estacoes, mais_antigo or agora, agora + timedelta(days=1)
+
+
+def interpolar_ponto(opcoes, latitude, longitude):
+    estacoes, _, _ = carregar_estacoes(opcoes, latitude, longitude, opcoes['raio'])
+    valor = interpolar(estacoes, np.array([latitude]), np.array([longitude]), opcoes)[0]
+    return None if np.isnan(valor) else float(valor)
+
+
+def _extensao_tile(tx, ty, resolucao):
+    """Retângulo (lon_min, lat_min, lon_max, lat_max) coberto pelas células do tile"""
+    return (
+        -180 + tx * TAMANHO_TILE * resolucao,
+        max(-90 + ty * TAMANHO_TILE * resolucao, -90),
+        min(-180 + (tx + 1) * TAMANHO_TILE * resolucao, 180),
+        min(-90 + (ty + 1) * TAMANHO_TILE * resolucao, 90),
+    )
+
+
+def _calcular_tile(estacoes, tx, ty, resolucao, opcoes):
+    """Valores (float32, NaN sem estação) das TAMANHO_TILE x TAMANHO_TILE células do tile"""
+    colunas = tx * TAMANHO_TILE + np.arange(TAMANHO_TILE)
+    linhas = ty * TAMANHO_TILE + np.arange(TAMANHO_TILE)
+    longitudes = -180 + (colunas + 0.5) * resolucao
+    latitudes = np.minimum(-90 + (linhas + 0.5) * resolucao, 90)
+    grade_lat, grade_lon = np.meshgrid(latitudes, longitudes, indexing='ij')
+    valores = interpolar(estacoes, grade_lat.ravel(), grade_lon.ravel(), opcoes)
+    return valores.reshape(TAMANHO_TILE, TAMANHO_TILE).astype(np.float32)
+
+
+def interpolar_grade(opcoes, lon_min, lat_min, lon_max, lat_max, resolucao):
+    """
+    Grade de células de `resolucao` graus alinhada globalmente, cobrindo a área.
+    Calculada por tiles de TAMANHO_TILE células, cada um em cache (cache_consultas)
+    e invalidado quando chegam dados de qualquer estação do círculo de busca do
+    tile (com ou sem valor no período) ou quando um dispositivo é alterado.
+    Retorna (grade com a linha 0 ao sul, longitude e latitude do centro da primeira célula).
+    """
+    coluna_inicio = int(math.floor((lon_min + 180) / resolucao))
+    coluna_fim = int(math.ceil((lon_max + 180) / resolucao))
+    linha_inicio = int(math.floor((lat_min + 90) / resolucao))
+    linha_fim = int(math.ceil((lat_max + 90) / resolucao))
+    maximo = getattr(settings, 'INTERPOLACAO_GRADE_MAXIMA', 250000)
+    if (coluna_fim - coluna_inicio) * (linha_fim - linha_inicio) > maximo:
+        raise ValueError(f'Grade com mais de {maximo} células: aumente "resolucao" ou reduza "bbox".')
+
+    tiles_x = range(coluna_inicio // TAMANHO_TILE, (coluna_fim - 1) // TAMANHO_TILE + 1)
+    tiles_y = range(linha_inicio // TAMANHO_TILE, (linha_fim - 1) // TAMANHO_TILE + 1)
+
+    # Krigagem: o custo vem dos tiles inteiros calculados, não só das células pedidas
+    if opcoes['metodo'] == 'kriging':
+        maximo = getattr(settings, 'INTERPOLACAO_KRIGING_GRADE_MAXIMA', 36864)
+        if len(tiles_x) * len(tiles_y) * TAMANHO_TILE ** 2 > maximo:
+            raise ValueError(
+                f'Krigagem limitada a {maximo} células calculadas (tiles de {TAMANHO_TILE}x{TAMANHO_TILE}): '
+                f'aumente "resolucao", reduza "bbox" ou use metodo=idw.'
+            )
+
+    # Uma consulta de estações para a área de todos os tiles
+    primeiro = _extensao_tile(tiles_x[0], tiles_y[0], resolucao)
+    ultimo = _extensao_tile(tiles_x[-1], tiles_y[-1], resolucao)
+    latitude, longitude, raio_busca = area_de_busca(
+        primeiro[0], primeiro[1], ultimo[2], ultimo[3], opcoes['raio']
+    )
+    localizacoes = versao_localizacoes()
+    todas, inicio, fim = carregar_estacoes(opcoes, latitude, longitude, raio_busca)
+
+    grade = np.full((linha_fim - linha_inicio, coluna_fim - coluna_inicio), np.nan, dtype=np.float32)
+    for ty in tiles_y:
+        for tx in tiles_x:
+            # Estações que podem influenciar o tile: o resultado não depende da área pedida
+            tile_lat, tile_lon, tile_raio = area_de_busca(*_extensao_tile(tx, ty, resolucao), opcoes['raio'])
+            estacoes = todas.proximas(tile_lat, tile_lon, tile_raio)
+            parametros = {
+                **{nome: opcoes[nome] for nome in ('campo', 'metodo', 'vizinhos', 'potencia', 'raio', 'alcance', 'recentes')},
+                'inicio': opcoes['inicio'], 'fim': opcoes['fim'],
+                'resolucao': resolucao, 'tile': [tx, ty], 'localizacoes': localizacoes,
+            }
+            valores = obter_ou_calcular(
+                'interpolacao', parametros, estacoes.ids.tolist(), inicio, fim,
+                lambda: _calcular_tile(estacoes, tx, ty, resolucao, opcoes)
+            )
+
+            # Parte do tile dentro da grade pedida
+            c0 = max(coluna_inicio, tx * TAMANHO_TILE)
+            c1 = min(coluna_fim, (tx + 1) * TAMANHO_TILE)
+            l0 = max(linha_inicio, ty * TAMANHO_TILE)
+            l1 = min(linha_fim, (ty + 1) * TAMANHO_TILE)
+            grade[l0 - linha_inicio:l1 - linha_inicio, c0 - coluna_inicio:c1 - coluna_inicio] = valores[
+                l0 - ty * TAMANHO_TILE:l1 - ty * TAMANHO_TILE, c0 - tx * TAMANHO_TILE:c1 - tx * TAMANHO_TILE
+            ]
+
+    origem_lon = -180 + (coluna_inicio + 0.5) * resolucao
+    origem_lat = -90 + (linha_inicio + 0.5) * resolucao
+    return grade, origem_lon, origem_lat
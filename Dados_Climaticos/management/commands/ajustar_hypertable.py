@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from Dados_Climaticos.hypertable import (
+    CAMPOS,
+    ajustar_intervalo_chunk,
+    campos_indices_parciais,
+    criar_indices_parciais,
+    remover_indices_parciais,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica DADOS_CHUNK_INTERVALO e DADOS_INDICES_PARCIAIS ao hypertable dado_climatico '
+        '(use após alterar essas configurações).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            help='Intervalo dos próximos chunks (ex: "7 days"); padrão: DADOS_CHUNK_INTERVALO'
+        )
+        parser.add_argument(
+            '--remover-outros',
+            action='store_true',
+            help='Remove os índices parciais de campos que não estão em DADOS_INDICES_PARCIAIS'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            campos = campos_indices_parciais()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        with connection.cursor() as cursor:
+            intervalo = ajustar_intervalo_chunk(cursor, options['intervalo'])
+            self.stdout.write(f'Intervalo dos novos chunks: {intervalo}')
+
+            for nome in criar_indices_parciais(cursor, campos):
+                self.stdout.write(f'Índice parcial: {nome}')
+
+            if options['remover_outros']:
+                outros = [campo for campo in CAMPOS if campo not in campos]
+                remover_indices_parciais(cursor, outros)
+                for campo in outros:
+                    self.stdout.write(f'Índice parcial removido (se existia): {campo}')
+
+        self.stdout.write(self.style.SUCCESS('Hypertable ajustado.'))
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from Dados_Climaticos.arquivamento import agendar, arquivar, desagendar
+
+
+class Command(BaseCommand):
+    help = (
+        'Resume por hora (mín/máx/média/contagem) os dados brutos mais antigos que '
+        'DADOS_RETENCAO_DIAS no arquivo dado_climatico_arquivo e remove os chunks brutos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=getattr(settings, 'DADOS_RETENCAO_DIAS', 365),
+            help='Idade mínima (em dias) dos dados brutos arquivados'
+        )
+        parser.add_argument(
+            '--agendar',
+            metavar='INTERVALO',
+            help='Registra um job do TimescaleDB que arquiva periodicamente (ex: "1 day")'
+        )
+        parser.add_argument(
+            '--desagendar',
+            action='store_true',
+            help='Remove o job de arquivamento do TimescaleDB'
+        )
+
+    def handle(self, *args, **options):
+        if options['desagendar']:
+            quantidade = desagendar()
+            self.stdout.write(self.style.SUCCESS(f'Jobs de arquivamento removidos: {quantidade}'))
+            return
+
+        if options['agendar']:
+            job_id = agendar(options['dias'], options['agendar'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Job {job_id}: arquiva dados com mais de {options["dias"]} dias a cada {options["agendar"]}.'
+            ))
+            return
+
+        limite, linhas = arquivar(options['dias'])
+        if limite is None:
+            self.stdout.write('Nenhum chunk inteiramente mais antigo que o limite de retenção.')
+            return
+
+        self.stdout.write(f'Resumos horários gravados/atualizados: {linhas}')
+        self.stdout.write(self.style.SUCCESS(f'Dados anteriores a {limite} arquivados e chunks brutos removidos.'))
@@ -0,0 +1,119 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+# Rotas síncronas com versão assíncrona (mesmo caminho, prefixado por async/)
+ROTAS = {
+    'ultimo-dado': 'dados_climaticos/dispositivos/{dispositivo}/ultimo-dado/',
+    'media': 'dados_climaticos/dispositivo/{dispositivo}/media/?tipo=temperatura&periodo=semana',
+    'proximo': 'dispositivos/proximo/?latitude={latitude}&longitude={longitude}',
+    'raio': 'dispositivos/raio/?latitude={latitude}&longitude={longitude}&raio={raio}',
+    'proximos': 'dispositivos/proximos/?latitude={latitude}&longitude={longitude}&k=5',
+}
+
+
+def _requisitar(conexao, caminho):
+    conexao.request('GET', caminho, headers={'Accept': 'application/json'})
+    resposta = conexao.getresponse()
+    return resposta.status, resposta.read()
+
+
+def _carga(servidor, caminho, concorrencia, duracao):
+    """
+    Mantém `concorrencia` clientes (uma conexão keep-alive cada) fazendo GET
+    em `caminho` por `duracao` segundos. Retorna (latências em s, erros).
+    """
+    latencias = []
+    erros = [0]
+    lock = threading.Lock()
+    fim = time.monotonic() + duracao
+
+    def cliente():
+        conexao = http.client.HTTPConnection(servidor.hostname, servidor.port, timeout=30)
+        locais = []
+        falhas = 0
+        while time.monotonic() < fim:
+            inicio = time.perf_counter()
+            try:
+                status, _ = _requisitar(conexao, caminho)
+            except (OSError, http.client.HTTPException):
+                falhas += 1
+                conexao.close()
+                continue
+            if status != 200:
+                falhas += 1
+                continue
+            locais.append(time.perf_counter() - inicio)
+        conexao.close()
+        with lock:
+            latencias.extend(locais)
+            erros[0] += falhas
+
+    with ThreadPoolExecutor(concorrencia) as executor:
+        for _ in range(concorrencia):
+            executor.submit(cliente)
+    return latencias, erros[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara vazão e latência das rotas síncronas com as versões /async/ em um servidor '
+        'em execução (ex: uvicorn Estacao.asgi:application --workers 4), com a mesma carga '
+        'concorrente para as duas. Confere antes se as respostas são iguais.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000', help='Endereço do servidor')
+        parser.add_argument('--rotas', nargs='+', choices=list(ROTAS), default=list(ROTAS), help='Rotas comparadas')
+        parser.add_argument('--dispositivo', default='1', help='ID ou token do dispositivo consultado')
+        parser.add_argument('--latitude', type=float, default=-23.55)
+        parser.add_argument('--longitude', type=float, default=-46.63)
+        parser.add_argument('--raio', type=float, default=50, help='Raio da busca, em km')
+        parser.add_argument('--concorrencia', type=int, default=100, help='Clientes simultâneos')
+        parser.add_argument('--duracao', type=float, default=10, help='Segundos de carga por rota')
+
+    def handle(self, *args, **options):
+        servidor = urlsplit(options['url'])
+        if servidor.scheme != 'http' or not servidor.hostname:
+            raise CommandError('--url deve ser um endereço http://host[:porta]')
+        base = servidor.path.rstrip('/') + '/'
+
+        self.stdout.write(
+            f'{options["concorrencia"]} clientes, {options["duracao"]:g}s por rota em {options["url"]}'
+        )
+        for nome in options['rotas']:
+            caminho = ROTAS[nome].format(**options)
+            sincrona, assincrona = base + caminho, base + 'async/' + caminho
+
+            # As duas versões devem responder o mesmo conteúdo
+            conexao = http.client.HTTPConnection(servidor.hostname, servidor.port, timeout=30)
+            try:
+                respostas = [_requisitar(conexao, rota) for rota in (sincrona, assincrona)]
+            except (OSError, http.client.HTTPException) as e:
+                raise CommandError(f'Servidor indisponível: {e}')
+            finally:
+                conexao.close()
+            (status_sync, corpo_sync), (status_async, corpo_async) = respostas
+            if status_sync != 200:
+                self.stdout.write(self.style.WARNING(f'{nome}: status {status_sync}, rota ignorada'))
+                continue
+            if status_async != status_sync or json.loads(corpo_async) != json.loads(corpo_sync):
+                raise CommandError(f'{nome}: respostas síncrona e assíncrona diferentes')
+
+            self.stdout.write(f'{nome}:')
+            for rotulo, rota in (('sync', sincrona), ('async', assincrona)):
+                latencias, erros = _carga(servidor, rota, options['concorrencia'], options['duracao'])
+                if not latencias:
+                    self.stdout.write(f'  {rotulo:>5}: nenhuma resposta 200 ({erros} erros)')
+                    continue
+                percentis = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+                self.stdout.write(
+                    f'  {rotulo:>5}: {len(latencias) / options["duracao"]:8.1f} req/s  '
+                    f'p50 {percentis[49] * 1000:7.1f} ms  p95 {percentis[94] * 1000:7.1f} ms  '
+                    f'p99 {percentis[98] * 1000:7.1f} ms  erros {erros}'
+                )
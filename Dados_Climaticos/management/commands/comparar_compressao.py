@@ -0,0 +1,88 @@
+import gzip
+import http.client
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+try:
+    import zstandard
+except ImportError:  # Dependência opcional: sem zstd, só gzip
+    zstandard = None
+
+
+def _descomprimir(codificacao, corpo):
+    if codificacao == 'gzip':
+        return gzip.decompress(corpo)
+    if codificacao == 'zstd':
+        return zstandard.ZstdDecompressor().stream_reader(corpo, read_across_frames=True).read()
+    return corpo
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o tamanho e a latência de uma resposta sem compressão, com gzip e com zstd '
+        '(CompressaoMiddleware) em um servidor em execução, conferindo se o conteúdo '
+        'descomprimido é igual ao original. Com --banda, estima o tempo total em um link lento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url',
+            help='URL completa da consulta (ex: http://localhost:8000/dados_climaticos/dispositivos/'
+                 'por_periodo/?dispositivos=1&inicio=2025-01-01T00:00:00&fim=2025-02-01T00:00:00&formato=csv)'
+        )
+        parser.add_argument('--repeticoes', type=int, default=5, help='Requisições por codificação')
+        parser.add_argument('--banda', type=float, help='Banda do link simulado, em Mbit/s')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('A URL deve ser http://host[:porta]/caminho')
+        caminho = url.path + (f'?{url.query}' if url.query else '')
+
+        codificacoes = ['identity', 'gzip'] + (['zstd'] if zstandard is not None else [])
+        original = None
+        resultados = []
+        for codificacao in codificacoes:
+            latencias = []
+            descompressao = 0.0
+            for _ in range(options['repeticoes']):
+                conexao = http.client.HTTPConnection(url.hostname, url.port, timeout=300)
+                inicio = time.perf_counter()
+                try:
+                    conexao.request('GET', caminho, headers={'Accept-Encoding': codificacao})
+                    resposta = conexao.getresponse()
+                    corpo = resposta.read()
+                except (OSError, http.client.HTTPException) as e:
+                    raise CommandError(f'Servidor indisponível: {e}')
+                finally:
+                    conexao.close()
+                latencias.append(time.perf_counter() - inicio)
+                if resposta.status != 200:
+                    raise CommandError(f'Status {resposta.status} com Accept-Encoding: {codificacao}')
+
+                recebida = resposta.getheader('Content-Encoding', 'identity')
+                inicio = time.perf_counter()
+                conteudo = _descomprimir(recebida, corpo)
+                descompressao += time.perf_counter() - inicio
+
+            if original is None:
+                original = conteudo
+            elif conteudo != original:
+                raise CommandError(f'Conteúdo {codificacao} difere do original após descomprimir.')
+            resultados.append((codificacao, recebida, len(corpo), statistics.median(latencias),
+                               descompressao / options['repeticoes']))
+
+        self.stdout.write(f'{len(original) / 2**20:.2f} MiB sem compressão; mediana de {options["repeticoes"]} requisições')
+        for codificacao, recebida, tamanho, latencia, descompressao in resultados:
+            linha = (
+                f'  {codificacao:>8}: {tamanho / 2**20:8.2f} MiB ({len(original) / tamanho:4.1f}x)  '
+                f'latência {latencia * 1000:8.1f} ms  descompressão {descompressao * 1000:6.1f} ms'
+            )
+            if options['banda']:
+                transferencia = tamanho * 8 / (options['banda'] * 10**6)
+                linha += f'  total a {options["banda"]:g} Mbit/s: {(latencia + transferencia + descompressao):6.2f} s'
+            if recebida != codificacao:
+                linha += f'  (servidor respondeu {recebida})'
+            self.stdout.write(linha)
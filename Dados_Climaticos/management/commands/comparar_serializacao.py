@@ -0,0 +1,56 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from Dados_Climaticos.exportacao import serializar_dados
+from Dados_Climaticos.models import DadoClimatico
+from Dados_Climaticos.serializer import DadoClimaticoSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara o caminho rápido de serialização (values_list, usado nas listagens e na '
+        'consulta por período) com o DadoClimaticoSerializer: confere se o JSON é idêntico '
+        'e mede o tempo de cada um, incluindo a consulta e a renderização.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dispositivo', type=int, help='Só os dados deste dispositivo (padrão: todos)')
+        parser.add_argument('--linhas', type=int, default=10000, help='Quantidade de dados serializados')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Execuções de cada caminho (vale a melhor)')
+
+    def handle(self, *args, **options):
+        dados = DadoClimatico.objects.order_by('time', 'id')
+        if options['dispositivo'] is not None:
+            dados = dados.filter(dispositivo_id=options['dispositivo'])
+        linhas = options['linhas']
+        renderer = JSONRenderer()
+
+        caminhos = {
+            'DRF': lambda: renderer.render(
+                DadoClimaticoSerializer(dados.select_related('direcao_vento_id')[:linhas], many=True).data
+            ),
+            'values_list': lambda: renderer.render(serializar_dados(dados[:linhas])),
+        }
+
+        conteudos = {nome: gerar() for nome, gerar in caminhos.items()}
+        if conteudos['DRF'] != conteudos['values_list']:
+            raise CommandError('O caminho rápido gera um JSON diferente do DadoClimaticoSerializer.')
+        quantidade = dados[:linhas].count()
+        if not quantidade:
+            raise CommandError('Nenhum dado para serializar.')
+        self.stdout.write(f'{quantidade} dados, {len(conteudos["DRF"]) / 2**20:.2f} MiB de JSON idêntico nos dois caminhos')
+
+        tempos = {}
+        for nome, gerar in caminhos.items():
+            melhor = None
+            for _ in range(options['repeticoes']):
+                inicio = time.perf_counter()
+                gerar()
+                decorrido = time.perf_counter() - inicio
+                melhor = decorrido if melhor is None else min(melhor, decorrido)
+            tempos[nome] = melhor
+            self.stdout.write(f'  {nome:>11}: {melhor * 1000:8.1f} ms ({quantidade / melhor:,.0f} dados/s)')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Caminho rápido {tempos["DRF"] / tempos["values_list"]:.1f}x mais rápido que o DRF.'
+        ))
@@ -0,0 +1,103 @@
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Avg
+from Dados_Climaticos.agregados import media_por_intervalo
+from Dados_Climaticos.histograma import histograma_banco, histograma_python
+from Dados_Climaticos.hypertable import (
+    ajustar_politica_compressao,
+    comprimir_chunks,
+    estatisticas_compressao,
+    periodo_comprimido,
+)
+from Dados_Climaticos.models import DadoClimatico
+from Dados_Climaticos.serializer import DadoClimaticoSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compressão nativa do hypertable dado_climatico: comprime chunks antigos, '
+        'atualiza a política (COMPRESSAO_APOS) e verifica as consultas sobre chunks comprimidos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apos',
+            help='Comprime agora os chunks mais antigos que este intervalo (ex: "30 days")'
+        )
+        parser.add_argument(
+            '--politica',
+            action='store_true',
+            help='Recria a política de compressão com --apos ou COMPRESSAO_APOS'
+        )
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Executa as consultas de média, histograma e por período sobre o trecho comprimido'
+        )
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            if options['politica']:
+                intervalo = ajustar_politica_compressao(cursor, options['apos'])
+                self.stdout.write(f'Política de compressão: chunks mais antigos que {intervalo}')
+
+            if options['apos']:
+                quantidade = comprimir_chunks(cursor, options['apos'])
+                self.stdout.write(f'Chunks verificados/comprimidos: {quantidade}')
+
+            total, comprimidos, antes, depois = estatisticas_compressao(cursor) or (0, 0, None, None)
+            self.stdout.write(f'Chunks: {total} ({comprimidos or 0} comprimidos)')
+            if antes and depois:
+                self.stdout.write(
+                    f'Tamanho dos chunks comprimidos: {antes / 2**20:.1f} MiB -> {depois / 2**20:.1f} MiB '
+                    f'({antes / depois:.1f}x)'
+                )
+
+            periodo = periodo_comprimido(cursor)
+
+        if options['verificar']:
+            if periodo is None:
+                raise CommandError('Nenhum chunk comprimido para verificar.')
+            self.verificar(*periodo)
+
+    def verificar(self, inicio, fim):
+        """Roda as consultas das views de consulta no trecho comprimido"""
+        dispositivo_id = (
+            DadoClimatico.objects.filter(time__gte=inicio, time__lt=fim)
+            .values_list('dispositivo_id', flat=True).first()
+        )
+        if dispositivo_id is None:
+            raise CommandError('Chunks comprimidos sem dados.')
+        self.stdout.write(f'Verificando dispositivo {dispositivo_id} entre {inicio} e {fim}')
+
+        try:
+            # QueryMediaUnicaView (agregados contínuos e gapfill direto no hypertable)
+            media = media_por_intervalo(dispositivo_id, 'temperatura', '1 day', inicio, fim)
+            list(
+                DadoClimatico.timescale
+                .filter(dispositivo_id=dispositivo_id, time__range=(inicio, fim))
+                .time_bucket_gapfill('time', '1 day', inicio, fim)
+                .annotate(temperatura_avg=Avg('temperatura'))
+                .order_by('bucket')
+            )
+            self.stdout.write(f'  média: {len(media)} buckets')
+
+            # HistogramaPorDispositivosView (banco e NumPy devem coincidir)
+            banco = histograma_banco([dispositivo_id], 'temperatura', inicio, fim)
+            python = histograma_python([dispositivo_id], 'temperatura', inicio, fim)
+            if (banco is None) != (python is None) or (
+                banco is not None and not np.array_equal(banco[0], python[0])
+            ):
+                raise CommandError('Histograma no banco difere do calculado com NumPy.')
+            self.stdout.write(f'  histograma: {0 if banco is None else int(banco[0].sum())} valores')
+
+            # DadoClimaticoPorPeriodoView
+            dados = DadoClimatico.objects.filter(dispositivo_id=dispositivo_id, time__range=(inicio, fim))
+            quantidade = dados.count()
+            DadoClimaticoSerializer(dados.select_related('direcao_vento_id')[:1000], many=True).data
+            self.stdout.write(f'  por período: {quantidade} dados')
+        except DatabaseError as e:
+            raise CommandError(f'Consulta falhou sobre chunks comprimidos: {e}')
+
+        self.stdout.write(self.style.SUCCESS('Consultas funcionando sobre os chunks comprimidos.'))
@@ -0,0 +1,43 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from Dados_Climaticos import fila
+
+
+class Command(BaseCommand):
+    help = 'Grava no banco os lotes da fila local de ingestão (INGESTAO_ASSINCRONA), em bulk inserts grandes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--continuo',
+            action='store_true',
+            help='Continua processando a fila até ser interrompido'
+        )
+        parser.add_argument(
+            '--maximo-linhas',
+            type=int,
+            default=getattr(settings, 'INGESTAO_FILA_LOTE', 20000),
+            help='Quantidade aproximada de itens gravados por rodada'
+        )
+
+    def handle(self, *args, **options):
+        recuperados = fila.recuperar()
+        if recuperados:
+            self.stdout.write(f'Lotes interrompidos devolvidos à fila: {recuperados}')
+
+        intervalo = getattr(settings, 'INGESTAO_FILA_INTERVALO', 1)
+        while True:
+            close_old_connections()
+            processados = fila.processar(options['maximo_linhas'])
+            if processados:
+                self.stdout.write(f'Lotes processados: {processados}')
+                continue
+            if not options['continuo']:
+                break
+            fila.limpar()
+            time.sleep(intervalo)
+
+        removidos = fila.limpar()
+        if removidos:
+            self.stdout.write(f'Lotes antigos removidos: {removidos}')
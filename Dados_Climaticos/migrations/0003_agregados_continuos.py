@@ -0,0 +1,68 @@
+from django.db import migrations
+
+CAMPOS = ['temperatura', 'umidade', 'precipitacao', 'velocidade_vento']
+
+# Janela de recálculo da política: dados retroativos mais antigos que isso são
+# materializados por agregados.atualizar() (mesmo valor de JANELA_ATUALIZACAO)
+JANELA = '30 days'
+
+# (view, tamanho do bucket, intervalo de agendamento da política de atualização)
+AGREGADOS = [
+    ('dado_climatico_horario', '1 hour', '30 minutes'),
+    ('dado_climatico_diario', '1 day', '1 hour'),
+]
+
+
+def _colunas():
+    colunas = []
+    for campo in CAMPOS:
+        colunas += [
+            f'min({campo}) AS {campo}_min',
+            f'max({campo}) AS {campo}_max',
+            f'avg({campo}) AS {campo}_media',
+            f'sum({campo}) AS {campo}_soma',
+            f'count({campo}) AS {campo}_contagem',
+        ]
+    return ',\n    '.join(colunas)
+
+
+def criar_agregados(apps, schema_editor):
+    for view, bucket, agendamento in AGREGADOS:
+        schema_editor.execute(f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    dispositivo_id,
+    time_bucket(INTERVAL '{bucket}', time) AS bucket,
+    {_colunas()}
+FROM dado_climatico
+GROUP BY dispositivo_id, time_bucket(INTERVAL '{bucket}', time)
+WITH NO DATA
+""")
+        schema_editor.execute(
+            "SELECT add_continuous_aggregate_policy(%s, "
+            "start_offset => %s::interval, end_offset => %s::interval, "
+            "schedule_interval => %s::interval, if_not_exists => true)",
+            params=[view, JANELA, bucket, agendamento]
+        )
+        # Materializa o histórico existente; depois disso a política mantém só a janela recente
+        schema_editor.execute("CALL refresh_continuous_aggregate(%s, NULL, NULL)", params=[view])
+
+
+def remover_agregados(apps, schema_editor):
+    for view, _, _ in reversed(AGREGADOS):
+        schema_editor.execute(f"DROP MATERIALIZED VIEW IF EXISTS {view} CASCADE")
+
+
+class Migration(migrations.Migration):
+
+    # Agregados contínuos não podem ser criados dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ('Dados_Climaticos', '0002_alter_dadoclimatico_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_agregados, remover_agregados),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispositivo', '0004_alter_dispositivo_table'),
+        ('Direcao_Vento', '0002_alter_direcaovento_table'),
+        ('Dados_Climaticos', '0003_agregados_continuos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UltimoDado',
+            fields=[
+                ('dispositivo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ultimo_dado', serialize=False, to='Dispositivo.dispositivo')),
+                ('dado_id', models.BigIntegerField()),
+                ('time', models.DateTimeField()),
+                ('temperatura', models.FloatField(blank=True, null=True)),
+                ('umidade', models.FloatField(blank=True, null=True)),
+                ('precipitacao', models.FloatField(blank=True, null=True)),
+                ('velocidade_vento', models.FloatField(blank=True, null=True)),
+                ('direcao_vento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Direcao_Vento.direcaovento')),
+            ],
+            options={
+                'db_table': 'ultimo_dado',
+            },
+        ),
+        # Preenche com o último dado já existente de cada dispositivo
+        migrations.RunSQL(
+            sql="""
+INSERT INTO ultimo_dado (dispositivo_id, dado_id, time, temperatura, umidade, precipitacao, velocidade_vento, direcao_vento_id)
+SELECT DISTINCT ON (dispositivo_id)
+    dispositivo_id, id, time, temperatura, umidade, precipitacao, velocidade_vento, direcao_vento_id_id
+FROM dado_climatico
+ORDER BY dispositivo_id, time DESC
+""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+# SQL fixo (não depende do settings nem do código atual do app). Alterações posteriores
+# de DADOS_CHUNK_INTERVALO e DADOS_INDICES_PARCIAIS são aplicadas pelo comando ajustar_hypertable.
+CAMPOS_INDICES_PARCIAIS = ['temperatura', 'umidade']
+
+
+def _indice_parcial(campo):
+    return (
+        f"CREATE INDEX IF NOT EXISTS dado_climatico_{campo}_parcial_idx "
+        f"ON dado_climatico (dispositivo_id, time DESC) "
+        f"INCLUDE ({campo}) WHERE {campo} IS NOT NULL"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dados_Climaticos', '0004_ultimodado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dadoclimatico',
+            index=models.Index(fields=['dispositivo', '-time'], name='dado_climatico_disp_time_idx'),
+        ),
+        migrations.RunSQL(
+            sql=[
+                "SELECT set_chunk_time_interval('dado_climatico', INTERVAL '1 day')",
+                *[_indice_parcial(campo) for campo in CAMPOS_INDICES_PARCIAIS],
+            ],
+            reverse_sql=[
+                f"DROP INDEX IF EXISTS dado_climatico_{campo}_parcial_idx"
+                for campo in reversed(CAMPOS_INDICES_PARCIAIS)
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# SQL fixo (não depende do settings nem do código atual do app). Alterações posteriores
+# de COMPRESSAO_APOS são aplicadas com "python manage.py comprimir_dados --politica".
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dados_Climaticos', '0005_indices_chunks'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "ALTER TABLE dado_climatico SET ("
+                "timescaledb.compress, "
+                "timescaledb.compress_segmentby = 'dispositivo_id', "
+                "timescaledb.compress_orderby = 'time DESC')",
+                "SELECT remove_compression_policy('dado_climatico', if_exists => true)",
+                "SELECT add_compression_policy('dado_climatico', compress_after => INTERVAL '30 days')",
+            ],
+            reverse_sql=[
+                "SELECT remove_compression_policy('dado_climatico', if_exists => true)",
+                "SELECT decompress_chunk(c, if_compressed => true) FROM show_chunks('dado_climatico') c",
+                "ALTER TABLE dado_climatico SET (timescaledb.compress = false)",
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispositivo', '0004_alter_dispositivo_table'),
+        ('Dados_Climaticos', '0006_compressao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DadoClimaticoArquivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('temperatura_min', models.FloatField(blank=True, null=True)),
+                ('temperatura_max', models.FloatField(blank=True, null=True)),
+                ('temperatura_media', models.FloatField(blank=True, null=True)),
+                ('temperatura_contagem', models.IntegerField(default=0)),
+                ('umidade_min', models.FloatField(blank=True, null=True)),
+                ('umidade_max', models.FloatField(blank=True, null=True)),
+                ('umidade_media', models.FloatField(blank=True, null=True)),
+                ('umidade_contagem', models.IntegerField(default=0)),
+                ('precipitacao_min', models.FloatField(blank=True, null=True)),
+                ('precipitacao_max', models.FloatField(blank=True, null=True)),
+                ('precipitacao_media', models.FloatField(blank=True, null=True)),
+                ('precipitacao_contagem', models.IntegerField(default=0)),
+                ('velocidade_vento_min', models.FloatField(blank=True, null=True)),
+                ('velocidade_vento_max', models.FloatField(blank=True, null=True)),
+                ('velocidade_vento_media', models.FloatField(blank=True, null=True)),
+                ('velocidade_vento_contagem', models.IntegerField(default=0)),
+                ('dispositivo', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='Dispositivo.dispositivo')),
+            ],
+            options={
+                'db_table': 'dado_climatico_arquivo',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dadoclimaticoarquivo',
+            constraint=models.UniqueConstraint(fields=('dispositivo', 'bucket'), name='dado_climatico_arquivo_unico'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dados_Climaticos', '0007_dadoclimaticoarquivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LimiteArquivamento',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('limite', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'dado_climatico_arquivo_limite',
+            },
+        ),
+        # Bancos já arquivados: o limite era o início do primeiro chunk restante
+        migrations.RunSQL(
+            sql=(
+                "INSERT INTO dado_climatico_arquivo_limite (id, limite) "
+                "SELECT 1, COALESCE("
+                "  (SELECT min(range_start) FROM timescaledb_information.chunks WHERE hypertable_name = 'dado_climatico'),"
+                "  now()"
+                ") WHERE EXISTS (SELECT 1 FROM dado_climatico_arquivo)"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -8,10 +8,17 @@ from timescale.db.models.managers import TimescaleManager
 
 from timescale.db.models.models import TimescaleModel
 
+# Medições numéricas (colunas float) de DadoClimatico, UltimoDado e do arquivo horário
+CAMPOS_NUMERICOS = ['temperatura', 'umidade', 'precipitacao', 'velocidade_vento']
+
 class DadoClimatico(TimescaleModel):
     
     class Meta:
         db_table = "dado_climatico"
+        indexes = [
+            # Padrão de acesso das consultas: um dispositivo + intervalo de tempo
+            models.Index(fields=['dispositivo', '-time'], name='dado_climatico_disp_time_idx'),
+        ]
 
     dispositivo = models.ForeignKey(Dispositivo, on_delete=models.PROTECT)
     temperatura = models.FloatField(null=True, blank=True)
@@ -21,4 +28,78 @@ class DadoClimatico(TimescaleModel):
     direcao_vento_id = models.ForeignKey(DirecaoVento, on_delete=models.SET_NULL, null=True, blank=True)
 
     def __str__(self):
-        return f"{self.dispositivo} - {self.time}"
\ No newline at end of file
+        return f"{self.dispositivo} - {self.time}"
+
+class UltimoDado(models.Model):
+    """
+    Último dado recebido de cada dispositivo, mantido na ingestão
+    (Dados_Climaticos/ultimo_dado.py) para consultas sem varrer o hypertable.
+    """
+
+    class Meta:
+        db_table = "ultimo_dado"
+
+    dispositivo = models.OneToOneField(Dispositivo, on_delete=models.CASCADE, primary_key=True, related_name='ultimo_dado')
+    # Id do DadoClimatico de origem (hypertables não aceitam chave estrangeira apontando para elas)
+    dado_id = models.BigIntegerField()
+    time = models.DateTimeField()
+    temperatura = models.FloatField(null=True, blank=True)
+    umidade = models.FloatField(null=True, blank=True)
+    precipitacao = models.FloatField(null=True, blank=True)
+    velocidade_vento = models.FloatField(null=True, blank=True)
+    direcao_vento = models.ForeignKey(DirecaoVento, on_delete=models.SET_NULL, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.dispositivo} - {self.time}"
+
+
+class DadoClimaticoArquivo(models.Model):
+    """
+    Resumo horário (mínimo, máximo, média e contagem por medição) dos dados
+    brutos mais antigos que DADOS_RETENCAO_DIAS, gerado pelo comando
+    arquivar_dados antes de remover os chunks brutos do hypertable.
+    """
+
+    class Meta:
+        db_table = "dado_climatico_arquivo"
+        constraints = [
+            models.UniqueConstraint(fields=['dispositivo', 'bucket'], name='dado_climatico_arquivo_unico'),
+        ]
+
+    dispositivo = models.ForeignKey(Dispositivo, on_delete=models.PROTECT)
+    bucket = models.DateTimeField()
+    temperatura_min = models.FloatField(null=True, blank=True)
+    temperatura_max = models.FloatField(null=True, blank=True)
+    temperatura_media = models.FloatField(null=True, blank=True)
+    temperatura_contagem = models.IntegerField(default=0)
+    umidade_min = models.FloatField(null=True, blank=True)
+    umidade_max = models.FloatField(null=True, blank=True)
+    umidade_media = models.FloatField(null=True, blank=True)
+    umidade_contagem = models.IntegerField(default=0)
+    precipitacao_min = models.FloatField(null=True, blank=True)
+    precipitacao_max = models.FloatField(null=True, blank=True)
+    precipitacao_media = models.FloatField(null=True, blank=True)
+    precipitacao_contagem = models.IntegerField(default=0)
+    velocidade_vento_min = models.FloatField(null=True, blank=True)
+    velocidade_vento_max = models.FloatField(null=True, blank=True)
+    velocidade_vento_media = models.FloatField(null=True, blank=True)
+    velocidade_vento_contagem = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.dispositivo} - {self.bucket}"
+
+
+class LimiteArquivamento(models.Model):
+    """
+    Instante até o qual os dados brutos já foram resumidos em dado_climatico_arquivo
+    (linha única, id=1). Só avança: dados recebidos com data anterior são recusados.
+    """
+
+    class Meta:
+        db_table = "dado_climatico_arquivo_limite"
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    limite = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.limite}"
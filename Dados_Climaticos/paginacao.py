@@ -0,0 +1,103 @@
+import base64
+import json
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.response import Response
+from .exportacao import (
+    CAMPOS_CONSULTA,
+    arrow_disponivel,
+    resposta_arrow,
+    resposta_ndjson,
+    resposta_parquet,
+    serializar_linhas,
+)
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(time, id):
+    """Gera um cursor opaco a partir da chave (time, id) do último dado da página"""
+    bruto = json.dumps([time.isoformat(), id])
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Converte o cursor opaco de volta para (time, id)"""
+    try:
+        preenchido = cursor + '=' * (-len(cursor) % 4)
+        time_str, id = json.loads(base64.urlsafe_b64decode(preenchido))
+        time, id = datetime.fromisoformat(time_str), int(id)
+        # Fora do intervalo do bigint a consulta falharia no banco
+        if not -2**63 <= id < 2**63:
+            raise ValueError(id)
+        return time, id
+    except (TypeError, ValueError):
+        raise ParametroInvalido('Parâmetro "cursor" inválido.')
+
+
+def ler_limite(request):
+    """Lê o tamanho de página, limitado a DADOS_PAGINA_MAXIMO"""
+    padrao = getattr(settings, 'DADOS_PAGINA_PADRAO', 500)
+    maximo = getattr(settings, 'DADOS_PAGINA_MAXIMO', 5000)
+    try:
+        limite = int(request.query_params.get('limite', padrao))
+    except (TypeError, ValueError):
+        limite = 0
+    if limite < 1 or limite > maximo:
+        raise ParametroInvalido(f'Parâmetro "limite" deve ser entre 1 e {maximo}.')
+    return limite
+
+
+def filtrar_apos_cursor(queryset, cursor):
+    """Ordena por (time, id) e aplica o filtro de keyset a partir do cursor"""
+    queryset = queryset.order_by('time', 'id')
+    if cursor:
+        time, id = decodificar_cursor(cursor)
+        # time__gte redundante: vira condição do índice (dispositivo_id, time) e exclui chunks antigos
+        queryset = queryset.filter(Q(time__gt=time) | Q(time=time, id__gt=id), time__gte=time)
+    return queryset
+
+
+def paginar(queryset, cursor, limite):
+    """
+    Retorna (dados, proximo_cursor) de uma página com no máximo `limite` itens,
+    já serializados a partir de values_list (sem instanciar modelos).
+    """
+    linhas = list(filtrar_apos_cursor(queryset, cursor).values_list(*CAMPOS_CONSULTA)[:limite + 1])
+    proximo_cursor = None
+    if len(linhas) > limite:
+        ultima = linhas[limite - 1]
+        proximo_cursor = codificar_cursor(ultima[CAMPOS_CONSULTA.index('time')], ultima[0])
+    return serializar_linhas(linhas[:limite]), proximo_cursor
+
+
+def responder_listagem(request, queryset):
+    """
+    Resposta comum das listagens de dados climáticos:
+    - formato=ndjson: transmite todos os dados a partir do cursor
+    - formato=arrow|parquet: exportação colunar a partir do cursor
+    - padrão: página JSON com "proximo_cursor" e "dados"
+    """
+    cursor = request.query_params.get('cursor')
+    formato = request.query_params.get('formato')
+    if formato in ['arrow', 'parquet'] and not arrow_disponivel():
+        return Response({"erro": f'Formato "{formato}" requer a biblioteca pyarrow instalada no servidor.'}, status=501)
+    try:
+        if formato == 'ndjson':
+            return resposta_ndjson(filtrar_apos_cursor(queryset, cursor))
+        if formato == 'arrow':
+            return resposta_arrow(filtrar_apos_cursor(queryset, cursor))
+        if formato == 'parquet':
+            return resposta_parquet(filtrar_apos_cursor(queryset, cursor))
+        limite = ler_limite(request)
+        dados, proximo_cursor = paginar(queryset, cursor, limite)
+    except ParametroInvalido as e:
+        return Response({"erro": str(e)}, status=400)
+
+    return Response({
+        "proximo_cursor": proximo_cursor,
+        "dados": dados
+    })
@@ -0,0 +1,78 @@
+import uuid
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from .models import CAMPOS_NUMERICOS as CAMPOS_FLOAT
+
+# Cabeçalho: assinatura, token (UUID), quantidade, data base (ms desde a época, UTC)
+ASSINATURA = b'EDC1'
+CABECALHO = np.dtype([
+    ('assinatura', 'S4'),
+    ('token', 'V16'),
+    ('quantidade', '<u4'),
+    ('base', '<i8'),
+])
+# Por leitura: delta de tempo (uint32 ms), 4 medições float32 (NaN = ausente),
+# id da direção do vento uint16 (0 = ausente)
+BYTES_POR_LEITURA = 4 + 4 * len(CAMPOS_FLOAT) + 2
+
+
+class LoteColunar:
+    """Leituras de um upload binário, já separadas em arrays por coluna"""
+
+    def __init__(self, tempos, medicoes, direcoes):
+        self.tempos = tempos        # int64, ms desde a época (UTC)
+        self.medicoes = medicoes    # {campo: float32 com NaN nos ausentes}
+        self.direcoes = direcoes    # uint16, 0 = sem direção
+
+    def __len__(self):
+        return len(self.tempos)
+
+
+class DadosBinariosParser(BaseParser):
+    """
+    Formato binário compacto para upload das estações (little-endian):
+
+        4 bytes   assinatura b'EDC1'
+        16 bytes  token do dispositivo (bytes do UUID)
+        uint32    n = quantidade de leituras
+        int64     data base em ms desde 1970-01-01 UTC
+        n uint32  delta em ms de cada leitura para a anterior (a primeira, para a base)
+        n float32 temperatura, depois n umidade, n precipitacao e n velocidade_vento (NaN = ausente)
+        n uint16  id da direção do vento (0 = ausente)
+
+    Total: 32 + 22 * n bytes. Resulta em {'token': str, 'dados': LoteColunar}.
+    """
+    media_type = 'application/x-estacao-dados'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        conteudo = stream.read() if stream is not None else b''
+        if len(conteudo) < CABECALHO.itemsize:
+            raise ParseError('Upload binário menor que o cabeçalho.')
+
+        cabecalho = np.frombuffer(conteudo, dtype=CABECALHO, count=1)[0]
+        if cabecalho['assinatura'] != ASSINATURA:
+            raise ParseError('Assinatura do upload binário inválida.')
+
+        n = int(cabecalho['quantidade'])
+        maximo = getattr(settings, 'INGESTAO_BINARIO_MAXIMO', 100000)
+        if n > maximo:
+            raise ParseError(f'Upload binário com mais de {maximo} leituras.')
+        if len(conteudo) != CABECALHO.itemsize + BYTES_POR_LEITURA * n:
+            raise ParseError('Tamanho do upload binário não corresponde à quantidade de leituras.')
+
+        posicao = CABECALHO.itemsize
+        deltas = np.frombuffer(conteudo, dtype='<u4', count=n, offset=posicao)
+        posicao += 4 * n
+        medicoes = {}
+        for campo in CAMPOS_FLOAT:
+            medicoes[campo] = np.frombuffer(conteudo, dtype='<f4', count=n, offset=posicao)
+            posicao += 4 * n
+        direcoes = np.frombuffer(conteudo, dtype='<u2', count=n, offset=posicao)
+
+        tempos = int(cabecalho['base']) + np.cumsum(deltas, dtype=np.int64)
+        return {
+            'token': str(uuid.UUID(bytes=bytes(cabecalho['token']))),
+            'dados': LoteColunar(tempos, medicoes, direcoes),
+        }
@@ -1,11 +1,19 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import DadoClimatico
-from .serializer import DadoClimaticoSerializer
+from .models import CAMPOS_NUMERICOS, DadoClimatico, UltimoDado
+from .serializer import DadoClimaticoSerializer, UltimoDadoSerializer
+from . import interpolacao, ultimo_dado
+from .agregados import agregar_multiplos, media_por_intervalo
+from .histograma import histograma_banco, histograma_python
+from .cache_consultas import obter_ou_calcular
+from .exportacao import arrow_disponivel, resposta_arrow, resposta_csv, resposta_ndjson, resposta_parquet, serializar_dados
 from django.db.models import Count, Avg
 from Dispositivo.models import Dispositivo
 from Direcao_Vento.models import DirecaoVento
+from Direcao_Vento.cache import versao as versao_direcoes
+from django.conf import settings
+from django.contrib.gis.geos import Polygon
 from django.utils import timezone
 from datetime import datetime
 from utils import is_valid_uuid, get_dispositivo
@@ -61,36 +69,205 @@ from django.db.models import Count, Avg, Min, Max
 class UltimoDadoView(APIView):
     def get(self, request, identificador):
         dispositivo = get_dispositivo(identificador)
+        if isinstance(dispositivo, Response):
+            return dispositivo
         if not dispositivo:
             return Response(
                 {"erro": "Dispositivo não encontrado"},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        dado = DadoClimatico.objects.filter(dispositivo_id=identificador).order_by('-time').first()
+        # Consulta pela chave primária da tabela de últimos dados (mantida na ingestão)
+        dado = ultimo_dado.obter(dispositivo.id)
         if not dado:
             return Response({'erro': 'Nenhum dado encontrado.'}, status=404)
         
-        serializer = DadoClimaticoSerializer(dado)
-        return Response(serializer.data)
-    def get(self, request, identificador):
-        
-        dispositivo = get_dispositivo(identificador)
-        if not dispositivo:
-            return Response(
-                {"erro": "Dispositivo não encontrado"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        
-        dado = DadoClimatico.objects.filter(dispositivo_id=identificador).order_by('-time').first()
-        if not dado:
-            return Response({'erro': 'Nenhum dado encontrado.'}, status=404)
-        
-        serializer = DadoClimaticoSerializer(dado)
+        serializer = UltimoDadoSerializer(dado)
         return Response(serializer.data)
+
+
+#Ultimo dado de todos os dispositivos (ou dos que estão em uma área)
+@extend_schema(
+    description=(
+        "Retorna o último dado climático de todos os dispositivos em uma única consulta. "
+        "Opcionalmente filtra por lista de dispositivos e/ou por área retangular (bbox)."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='dispositivos',
+            type={'type': 'array', 'items': {'type': 'integer'}},
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='IDs dos dispositivos (ex: ?dispositivos=1&dispositivos=2)',
+            style='form',
+            explode=True
+        ),
+        OpenApiParameter(
+            name='bbox',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Área no formato lon_min,lat_min,lon_max,lat_max (ex: -38.6,-3.9,-38.4,-3.7)'
+        )
+    ],
+    responses={
+        200: OpenApiTypes.OBJECT,
+        400: OpenApiTypes.OBJECT
+    },
+    examples=[
+        OpenApiExample(
+            'Sucesso',
+            value={
+                "status": 200,
+                "dados": [
+                    {
+                        "id": 10,
+                        "dispositivo": 1,
+                        "data": "2025-03-31T07:54:57-03:00",
+                        "temperatura": 30.2,
+                        "umidade": 0.8,
+                        "precipitacao": 0.2,
+                        "velocidade_vento": 10.5,
+                        "direcao_vento": "NORTE"
+                    }
+                ]
+            },
+            status_codes=['200'],
+            response_only=True
+        ),
+        OpenApiExample(
+            'BBox inválida',
+            value={"status": 400, "msg": 'Parâmetro "bbox" deve ter o formato lon_min,lat_min,lon_max,lat_max.'},
+            status_codes=['400'],
+            response_only=True
+        )
+    ]
+)
+class UltimosDadosView(APIView):
+    def get(self, request):
+        dispositivos_ids = request.query_params.getlist('dispositivos')
+        bbox = request.query_params.get('bbox')
+
+        dados = UltimoDado.objects.select_related('direcao_vento').order_by('dispositivo_id')
+
+        if dispositivos_ids:
+            try:
+                dispositivos_ids = [int(i) for i in dispositivos_ids]
+            except ValueError:
+                return Response({
+                    'status': 400,
+                    'msg': 'IDs de dispositivos devem ser inteiros.'
+                }, status=400)
+            dados = dados.filter(dispositivo_id__in=dispositivos_ids)
+
+        if bbox:
+            try:
+                lon_min, lat_min, lon_max, lat_max = (float(valor) for valor in bbox.split(','))
+            except ValueError:
+                return Response({
+                    'status': 400,
+                    'msg': 'Parâmetro "bbox" deve ter o formato lon_min,lat_min,lon_max,lat_max.'
+                }, status=400)
+            if lon_min >= lon_max or lat_min >= lat_max:
+                return Response({
+                    'status': 400,
+                    'msg': 'Parâmetro "bbox" inválido: mínimos devem ser menores que os máximos.'
+                }, status=400)
+            area = Polygon.from_bbox((lon_min, lat_min, lon_max, lat_max))
+            area.srid = 4326
+            dados = dados.filter(dispositivo__localizacao__intersects=area)
+
+        return Response({
+            'status': 200,
+            'dados': UltimoDadoSerializer(dados, many=True).data
+        })
+    
+    
+def consultar_media(dispositivo, parametros_get):
+    """
+    Valida os parâmetros e calcula a média por intervalo de um dispositivo.
+    Retorna (corpo, status); usada pela view síncrona e pela assíncrona.
+    """
+    inicio_str = parametros_get.get('inicio')
+    fim_str = parametros_get.get('fim')
+    tipo = parametros_get.get('tipo', 'temperatura')
+
+    if not inicio_str or not fim_str:
+        return {
+            'status': 400,
+            'msg': 'Parâmetros "inicio" e "fim" são obrigatórios.'
+        }, 400
+
+    if tipo not in CAMPOS_NUMERICOS:
+        return {
+            'status': 400,
+            'msg': 'Parâmetro "tipo" inválido.'
+        }, 400
+
+    periodo = parametros_get.get('periodo', 'semana')  # dia, semana, mes
+    try:
+        quantidade = int(parametros_get.get('quantidade', 1))
+    except (TypeError, ValueError):
+        quantidade = 0
+
+    mapa_periodo = {
+        'dia': 'day',
+        'semana': 'week',
+        'mes': 'month'
+    }
+
+    if periodo not in mapa_periodo:
+        return {
+            'status': 400,
+            'msg': 'Parâmetro "periodo" inválido. Use "dia", "semana" ou "mes".'
+        }, 400
+
+    if quantidade < 1 or quantidade > 31:
+        return {
+            'status': 400,
+            'msg': 'Parâmetro "quantidade" deve ser entre 1 e 31.'
+        }, 400
+
+    # Intervalo formatado: '2 weeks', '1 day', etc.
+    intervalo = f"{quantidade} {mapa_periodo[periodo]}"
+
+    try:
+        inicio = timezone.make_aware(datetime.fromisoformat(inicio_str))
+        fim = timezone.make_aware(datetime.fromisoformat(fim_str))
+    except ValueError:
+        return {
+            'status': 400,
+            'msg': 'Data "inicio" ou "fim" inválida'
+        }, 400
+
     
+    campo_avg = f'{tipo}_avg'
     
+    def calcular():
+        # Buckets completos vêm dos agregados contínuos; só as pontas usam dados brutos
+        if getattr(settings, 'AGREGADOS_HABILITADOS', True):
+            dados = media_por_intervalo(dispositivo.id, tipo, intervalo, inicio, fim)
+        else:
+            dados = list(
+                DadoClimatico.timescale
+                .filter(dispositivo=dispositivo, time__range=(inicio, fim))
+                .time_bucket_gapfill('time', intervalo, inicio, fim)
+                .annotate(**{campo_avg: Avg(tipo)})
+                .order_by('bucket')
+            )
+
+        return {
+            'status': 200,
+            'tipo': tipo,
+            'intervalo': intervalo,
+            'dados': dados
+        }
+
+    # Resultado em cache, invalidado quando chegam dados do dispositivo no período
+    parametros = {'dispositivo': dispositivo.id, 'tipo': tipo, 'intervalo': intervalo, 'inicio': inicio, 'fim': fim}
+    return obter_ou_calcular('media', parametros, [dispositivo.id], inicio, fim, calcular), 200
+
+
 @extend_schema(
     description="Calcula a média de um campo climático em intervalos de tempo para um dispositivo.",
     parameters=[
@@ -215,154 +392,16 @@ class UltimoDadoView(APIView):
 class QueryMediaUnicaView(APIView):
     def get(self, request, identificador):
         dispositivo = get_dispositivo(identificador)
+        if isinstance(dispositivo, Response):
+            return dispositivo
         if not dispositivo:
             return Response({
                 'status': 404,
                 'msg': 'Dispositivo não encontrado.'
             }, status=404)
 
-        inicio_str = request.GET.get('inicio')
-        fim_str = request.GET.get('fim')
-        tipo = request.GET.get('tipo', 'temperatura')
-
-        if not inicio_str or not fim_str:
-            return Response({
-                'status': 400,
-                'msg': 'Parâmetros "inicio" e "fim" são obrigatórios.'
-            }, status=400)
-
-        if tipo not in ['temperatura', 'umidade', 'precipitacao', 'velocidade_vento']:
-            return Response({
-                'status': 400,
-                'msg': 'Parâmetro "tipo" inválido.'
-            }, status=400)
-
-        periodo = request.GET.get('periodo', 'semana')  # dia, semana, mes
-        quantidade = int(request.GET.get('quantidade', 1))
-
-        mapa_periodo = {
-            'dia': 'day',
-            'semana': 'week',
-            'mes': 'month'
-        }
-
-        if periodo not in mapa_periodo:
-            return Response({
-                'status': 400,
-                'msg': 'Parâmetro "periodo" inválido. Use "dia", "semana" ou "mes".'
-            }, status=400)
-
-        if quantidade < 1 or quantidade > 31:
-            return Response({
-                'status': 400,
-                'msg': 'Parâmetro "quantidade" deve ser entre 1 e 31.'
-            }, status=400)
-
-        # Intervalo formatado: '2 weeks', '1 day', etc.
-        intervalo = f"{quantidade} {mapa_periodo[periodo]}"
-
-        try:
-            inicio = timezone.make_aware(datetime.fromisoformat(inicio_str))
-            fim = timezone.make_aware(datetime.fromisoformat(fim_str))
-        except ValueError:
-            return Response({
-                'status': 400,
-                'msg': 'Data "inicio" ou "fim" inválida'
-            }, status=400)
-
-        
-        campo_avg = f'{tipo}_avg'
-        
-
-        query = (
-            DadoClimatico.timescale
-            .filter(dispositivo=dispositivo, time__range=(inicio, fim))
-            .time_bucket_gapfill('time', intervalo, inicio, fim)
-            .annotate(**{campo_avg: Avg(tipo)})
-            .order_by('bucket')
-        )
-
-        return Response({
-            'status': 200,
-            'tipo': tipo,
-            'intervalo': intervalo,
-            'dados': list(query)
-        })
-    def get(self, request, identificador):
-        dispositivo = get_dispositivo(identificador)
-        if not dispositivo:
-            return Response({
-                'status': 404,
-                'msg': 'Dispositivo não encontrado.'
-            }, status=404)
-
-        inicio_str = request.GET.get('inicio')
-        fim_str = request.GET.get('fim')
-        tipo = request.GET.get('tipo', 'temperatura')
-
-        if not inicio_str or not fim_str:
-            return Response({
-                'status': 400,
-                'msg': 'Parâmetros "inicio" e "fim" são obrigatórios.'
-            }, status=400)
-
-        if tipo not in ['temperatura', 'umidade', 'precipitacao', 'velocidade_vento']:
-            return Response({
-                'status': 400,
-                'msg': 'Parâmetro "tipo" inválido.'
-            }, status=400)
-
-        periodo = request.GET.get('periodo', 'semana')  # dia, semana, mes
-        quantidade = int(request.GET.get('quantidade', 1))
-
-        mapa_periodo = {
-            'dia': 'day',
-            'semana': 'week',
-            'mes': 'month'
-        }
-
-        if periodo not in mapa_periodo:
-            return Response({
-                'status': 400,
-                'msg': 'Parâmetro "periodo" inválido. Use "dia", "semana" ou "mes".'
-            }, status=400)
-
-        if quantidade < 1 or quantidade > 31:
-            return Response({
-                'status': 400,
-                'msg': 'Parâmetro "quantidade" deve ser entre 1 e 31.'
-            }, status=400)
-
-        # Intervalo formatado: '2 weeks', '1 day', etc.
-        intervalo = f"{quantidade} {mapa_periodo[periodo]}"
-
-        try:
-            inicio = timezone.make_aware(datetime.fromisoformat(inicio_str))
-            fim = timezone.make_aware(datetime.fromisoformat(fim_str))
-        except ValueError:
-            return Response({
-                'status': 400,
-                'msg': 'Data "inicio" ou "fim" inválida'
-            }, status=400)
-
-        
-        campo_avg = f'{tipo}_avg'
-        
-
-        query = (
-            DadoClimatico.timescale
-            .filter(dispositivo=dispositivo, time__range=(inicio, fim))
-            .time_bucket_gapfill('time', intervalo, inicio, fim)
-            .annotate(**{campo_avg: Avg(tipo)})
-            .order_by('bucket')
-        )
-
-        return Response({
-            'status': 200,
-            'tipo': tipo,
-            'intervalo': intervalo,
-            'dados': list(query)
-        })
+        corpo, codigo = consultar_media(dispositivo, request.GET)
+        return Response(corpo, status=codigo)
         
 
 @extend_schema(
@@ -389,12 +428,40 @@ class QueryMediaUnicaView(APIView):
             required=True,
             description='Data/hora de fim no formato ISO 8601 (ex: 2025-04-01T07:54:57)'
         ),
+        OpenApiParameter(
+            name='formato',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description=(
+                'Formato da resposta: "json" (padrão), "csv" ou "ndjson" (transmitidos linha a linha), '
+                '"arrow" (Arrow IPC stream) ou "parquet" (colunares, requerem pyarrow no servidor)'
+            )
+        ),
     ],
     responses={
         200: OpenApiTypes.OBJECT,
         400: OpenApiTypes.OBJECT,
     },
     examples=[
+        OpenApiExample(
+            'Formato inválido',
+            value={
+                "status": 400,
+                "msg": 'Parâmetro "formato" inválido. Use "json", "csv", "ndjson", "arrow" ou "parquet".'
+            },
+            response_only=True,
+            status_codes=['400']
+        ),
+        OpenApiExample(
+            'Formato colunar indisponível',
+            value={
+                "status": 501,
+                "msg": 'Formato "parquet" requer a biblioteca pyarrow instalada no servidor.'
+            },
+            response_only=True,
+            status_codes=['501']
+        ),
         OpenApiExample(
             'Parâmetros obrigatórios ausentes',
             value={
@@ -470,6 +537,7 @@ class DadoClimaticoPorPeriodoView(APIView):
         dispositivos_ids = request.query_params.getlist('dispositivos')
         inicio_str = request.query_params.get('inicio')
         fim_str = request.query_params.get('fim')
+        formato = request.query_params.get('formato', 'json')
 
         # Valida se todos os parâmetros foram fornecidos
         if not dispositivos_ids or not inicio_str or not fim_str:
@@ -478,6 +546,18 @@ class DadoClimaticoPorPeriodoView(APIView):
                 'msg': 'Parâmetros "dispositivos", "inicio" e "fim" são obrigatórios.'
             }, status=400)
 
+        if formato not in ['json', 'csv', 'ndjson', 'arrow', 'parquet']:
+            return Response({
+                'status': 400,
+                'msg': 'Parâmetro "formato" inválido. Use "json", "csv", "ndjson", "arrow" ou "parquet".'
+            }, status=400)
+
+        if formato in ['arrow', 'parquet'] and not arrow_disponivel():
+            return Response({
+                'status': 501,
+                'msg': f'Formato "{formato}" requer a biblioteca pyarrow instalada no servidor.'
+            }, status=501)
+
         # Tenta converter os IDs dos dispositivos para inteiros
         try:
             dispositivos_ids = [int(i) for i in dispositivos_ids]
@@ -503,27 +583,55 @@ class DadoClimaticoPorPeriodoView(APIView):
             time__range=(inicio, fim)
         )
 
-         # Retorno específico se não houver dados encontrados
-        if not dados.exists():
+        # Exportação transmitida linha a linha, sem montar a lista em memória
+        if formato == 'csv':
+            return resposta_csv(dados)
+        if formato == 'ndjson':
+            return resposta_ndjson(dados)
+        if formato == 'arrow':
+            return resposta_arrow(dados)
+        if formato == 'parquet':
+            return resposta_parquet(dados)
+
+        def calcular():
+            # Serializa os dados para retorno em JSON (values_list + cache de direções, sem instanciar modelos)
+            return serializar_dados(dados)
+
+        # Lista em cache, invalidada quando chegam dados dos dispositivos no período ou quando
+        # uma direção do vento é alterada (os dados trazem o nome da direção)
+        parametros = {
+            'dispositivos': sorted(set(dispositivos_ids)), 'inicio': inicio, 'fim': fim,
+            'direcoes': versao_direcoes()
+        }
+        # Períodos com muitos dados não vão para o cache (formato=ndjson/csv transmite sem limite)
+        linhas_maximo = getattr(settings, 'CONSULTAS_CACHE_LINHAS_MAXIMO', 50000)
+        dados_climaticos = obter_ou_calcular(
+            'por_periodo', parametros, dispositivos_ids, inicio, fim, calcular,
+            armazenar=lambda resultado: len(resultado) <= linhas_maximo
+        )
+
+        # Retorno específico se não houver dados encontrados
+        if not dados_climaticos:
             return Response({
                 'status': 200,
                 'msg': f'Nenhum dado climático encontrado para os dispositivos no período {inicio_str} a {fim_str}.',
                 'dados_climaticos': []
             })
-        
-        # Serializa os dados para retorno em JSON
-        serializer = DadoClimaticoSerializer(dados, many=True)
 
         # Retorna a resposta com status e dados encontrados
         return Response({
             'status': 200,
             'msg': f'Dados climáticos dos dispositivos no período {inicio_str} a {fim_str}.',
-            'dados_climaticos': serializer.data
+            'dados_climaticos': dados_climaticos
         })
 
   
 @extend_schema(
-    description="Gera um histograma dos valores de temperatura ou umidade para os dispositivos informados, dentro de um intervalo de tempo.",
+    description=(
+        "Gera um histograma dos valores de temperatura, umidade, precipitação ou velocidade do vento "
+        "para os dispositivos informados, dentro de um intervalo de tempo. Por padrão o histograma é "
+        "calculado no banco (width_bucket); bordas fixas permitem comparar e reaproveitar resultados."
+    ),
     parameters=[
         OpenApiParameter(
             name='dispositivos',
@@ -537,7 +645,7 @@ class DadoClimaticoPorPeriodoView(APIView):
             type=OpenApiTypes.STR,
             location=OpenApiParameter.QUERY,
             required=True,
-            description='Campo a ser analisado: "temperatura" ou "umidade"'
+            description='Campo a ser analisado: "temperatura", "umidade", "precipitacao" ou "velocidade_vento"'
         ),
         OpenApiParameter(
             name='inicio',
@@ -558,7 +666,35 @@ class DadoClimaticoPorPeriodoView(APIView):
             type=OpenApiTypes.INT,
             location=OpenApiParameter.QUERY,
             required=False,
-            description='Quantidade de divisões (bins) no histograma. Padrão: 10'
+            description='Quantidade de divisões (bins) no histograma. Padrão: 10, máximo: HISTOGRAMA_BINS_MAXIMO (1000)'
+        ),
+        OpenApiParameter(
+            name='minimo',
+            type=OpenApiTypes.FLOAT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Borda inicial fixa (usar junto com "maximo"; gera "bins" divisões iguais)'
+        ),
+        OpenApiParameter(
+            name='maximo',
+            type=OpenApiTypes.FLOAT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Borda final fixa (usar junto com "minimo")'
+        ),
+        OpenApiParameter(
+            name='bordas',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Bordas fixas crescentes separadas por vírgula (ex: 0,10,20,30). Ignora "bins"'
+        ),
+        OpenApiParameter(
+            name='modo',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='"banco" (padrão, calculado no PostgreSQL) ou "python" (NumPy)'
         ),
     ],
     responses={
@@ -613,7 +749,7 @@ class DadoClimaticoPorPeriodoView(APIView):
             'Campo inválido',
             value={
                 "status": 400,
-                "msg": 'Campo deve ser "temperatura" ou "umidade".'
+                "msg": 'Campo deve ser "temperatura", "umidade", "precipitacao" ou "velocidade_vento".'
             },
             response_only=True,
             status_codes=['400']
@@ -638,14 +774,18 @@ class HistogramaPorDispositivosView(APIView):
         inicio_str = request.query_params.get('inicio')
         fim_str = request.query_params.get('fim')
         bins = request.query_params.get('bins', 10)  # valor padrão é 10
+        minimo = request.query_params.get('minimo')
+        maximo = request.query_params.get('maximo')
+        bordas = request.query_params.get('bordas')
+        modo = request.query_params.get('modo', 'banco')
 
         # Validação dos dispositivos
         if not dispositivos_ids:
             return Response({'status': 400, 'msg': '"dispositivos" deve ser uma lista de IDs.'}, status=400)
 
         # Validação do campo analisado
-        if campo not in ['temperatura', 'umidade']:
-            return Response({'status': 400, 'msg': 'Campo deve ser "temperatura" ou "umidade".'}, status=400)
+        if campo not in CAMPOS_NUMERICOS:
+            return Response({'status': 400, 'msg': 'Campo deve ser "temperatura", "umidade", "precipitacao" ou "velocidade_vento".'}, status=400)
 
         # Validação das datas
         if not inicio_str or not fim_str:
@@ -660,37 +800,385 @@ class HistogramaPorDispositivosView(APIView):
         except Exception:
             return Response({'status': 400, 'msg': 'Parâmetros inválidos.'}, status=400)
 
-        # Consulta dos valores do campo específico, ignorando nulos
-        valores_qs = DadoClimatico.objects.filter(
-            dispositivo_id__in=dispositivos_ids,
-            time__range=(inicio, fim),
-        ).values_list(campo, flat=True).exclude(**{f'{campo}__isnull': True})
+        # Cada divisão vira um contador em memória (NumPy) e no width_bucket do banco
+        bins_maximo = getattr(settings, 'HISTOGRAMA_BINS_MAXIMO', 1000)
+        if not 1 <= bins <= bins_maximo:
+            return Response({'status': 400, 'msg': f'Parâmetro "bins" deve ser entre 1 e {bins_maximo}.'}, status=400)
 
-        valores = list(valores_qs)
+        try:
+            # Bordas fixas: lista explícita ou "bins" divisões iguais entre minimo e maximo
+            if bordas:
+                bordas = [float(borda) for borda in bordas.split(',')]
+            elif minimo is not None or maximo is not None:
+                bordas = np.linspace(float(minimo), float(maximo), bins + 1).tolist()
+            else:
+                bordas = None
+        except Exception:
+            return Response({'status': 400, 'msg': 'Parâmetros inválidos.'}, status=400)
 
-        # Retorno caso não haja dados
-        if not valores:
+        if modo not in ['banco', 'python']:
+            return Response({'status': 400, 'msg': 'Parâmetros inválidos.'}, status=400)
+
+        if bordas is not None and (len(bordas) < 2 or any(a >= b for a, b in zip(bordas, bordas[1:]))):
+            return Response({'status': 400, 'msg': 'Parâmetros inválidos.'}, status=400)
+
+        if bordas is not None and len(bordas) - 1 > bins_maximo:
+            return Response({'status': 400, 'msg': f'"bordas" deve definir no máximo {bins_maximo} divisões.'}, status=400)
+
+        def calcular():
+            # Histograma calculado no banco (só as contagens trafegam) ou com NumPy
+            if modo == 'banco':
+                resultado = histograma_banco(dispositivos_ids, campo, inicio, fim, bins=bins, bordas=bordas)
+            else:
+                resultado = histograma_python(dispositivos_ids, campo, inicio, fim, bins=bins, bordas=bordas)
+
+            # Retorno caso não haja dados
+            if resultado is None:
+                return {
+                    'status': 200,
+                    'msg': 'Nenhum dado encontrado no período para os dispositivos.',
+                    'histograma': []
+                }
+
+            counts, bin_edges = resultado
+
+            # Formata os dados para o retorno
+            histograma = []
+            for i in range(len(counts)):
+                histograma.append({
+                    'bin_inicio': float(bin_edges[i]),
+                    'bin_fim': float(bin_edges[i+1]),
+                    'quantidade': int(counts[i])
+                })
+
+            # Resposta final com status, mensagem e histograma
+            return {
+                'status': 200,
+                'msg': f'Histograma de {campo} para dispositivos {dispositivos_ids} entre {inicio_str} e {fim_str}.',
+                'histograma': histograma
+            }
+
+        # Resultado em cache, invalidado quando chegam dados dos dispositivos no período
+        parametros = {
+            'dispositivos': sorted(set(dispositivos_ids)), 'campo': campo, 'inicio': inicio_str, 'fim': fim_str,
+            'bins': bins, 'bordas': bordas, 'modo': modo
+        }
+        return Response(obter_ou_calcular('histograma', parametros, dispositivos_ids, inicio, fim, calcular))
+
+
+@extend_schema(
+    description=(
+        "Calcula várias métricas (avg, min, max, sum, count, stddev e percentis pNN) de vários campos "
+        "para vários dispositivos, agrupadas em intervalos de tempo, em uma única consulta. "
+        "A resposta é colunar e indexada pelo ID do dispositivo."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='dispositivos',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Lista de IDs dos dispositivos (ex: dispositivos=1&dispositivos=2)'
+        ),
+        OpenApiParameter(
+            name='tipos',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description='Campos analisados (temperatura, umidade, precipitacao, velocidade_vento) - padrão: temperatura'
+        ),
+        OpenApiParameter(
+            name='funcoes',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description='Funções de agregação (avg, min, max, sum, count, stddev, p50, p95...) - padrão: avg'
+        ),
+        OpenApiParameter(
+            name='inicio',
+            type=OpenApiTypes.DATETIME,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Data/hora de início (ex: 2025-03-31T07:54:57)'
+        ),
+        OpenApiParameter(
+            name='fim',
+            type=OpenApiTypes.DATETIME,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Data/hora de fim (ex: 2025-04-01T07:54:57)'
+        ),
+        OpenApiParameter(
+            name='periodo',
+            type=OpenApiTypes.STR,
+            location=OpenApiParameter.QUERY,
+            description='Unidade do intervalo (dia, semana, mes) - padrão: semana',
+            default='semana'
+        ),
+        OpenApiParameter(
+            name='quantidade',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='Quantidade de unidades do intervalo (ex: 2 semanas) - padrão: 1',
+            default=1
+        )
+    ],
+    responses={
+        200: OpenApiTypes.OBJECT,
+        400: OpenApiTypes.OBJECT
+    },
+    examples=[
+        OpenApiExample(
+            'Sucesso',
+            value={
+                'status': 200,
+                'intervalo': '1 day',
+                'colunas': ['temperatura_avg', 'temperatura_p95', 'umidade_max'],
+                'dispositivos': {
+                    '1': {
+                        'bucket': ['2025-03-31T00:00:00Z', '2025-04-01T00:00:00Z'],
+                        'temperatura_avg': [25.3, 26.1],
+                        'temperatura_p95': [29.8, 30.4],
+                        'umidade_max': [0.91, 0.87]
+                    },
+                    '2': {
+                        'bucket': ['2025-03-31T00:00:00Z'],
+                        'temperatura_avg': [22.0],
+                        'temperatura_p95': [24.5],
+                        'umidade_max': [0.95]
+                    }
+                }
+            },
+            response_only=True,
+            status_codes=['200']
+        ),
+        OpenApiExample(
+            'Função inválida',
+            value={
+                'status': 400,
+                'msg': 'Função inválida: mediana'
+            },
+            response_only=True,
+            status_codes=['400']
+        ),
+    ]
+)
+class AgregacaoView(APIView):
+    def get(self, request):
+        dispositivos_ids = request.query_params.getlist('dispositivos')
+        tipos = list(dict.fromkeys(request.query_params.getlist('tipos') or ['temperatura']))
+        funcoes = list(dict.fromkeys(request.query_params.getlist('funcoes') or ['avg']))
+        inicio_str = request.query_params.get('inicio')
+        fim_str = request.query_params.get('fim')
+        periodo = request.query_params.get('periodo', 'semana')  # dia, semana, mes
+
+        if not dispositivos_ids or not inicio_str or not fim_str:
+            return Response({
+                'status': 400,
+                'msg': 'Parâmetros "dispositivos", "inicio" e "fim" são obrigatórios.'
+            }, status=400)
+
+        try:
+            dispositivos_ids = list(dict.fromkeys(int(i) for i in dispositivos_ids))
+        except ValueError:
+            return Response({
+                'status': 400,
+                'msg': 'IDs inválidos em "dispositivos".'
+            }, status=400)
+
+        mapa_periodo = {
+            'dia': 'day',
+            'semana': 'week',
+            'mes': 'month'
+        }
+
+        if periodo not in mapa_periodo:
             return Response({
+                'status': 400,
+                'msg': 'Parâmetro "periodo" inválido. Use "dia", "semana" ou "mes".'
+            }, status=400)
+
+        try:
+            quantidade = int(request.query_params.get('quantidade', 1))
+        except ValueError:
+            quantidade = 0
+        if quantidade < 1 or quantidade > 31:
+            return Response({
+                'status': 400,
+                'msg': 'Parâmetro "quantidade" deve ser entre 1 e 31.'
+            }, status=400)
+
+        intervalo = f"{quantidade} {mapa_periodo[periodo]}"
+
+        try:
+            inicio = timezone.make_aware(datetime.fromisoformat(inicio_str))
+            fim = timezone.make_aware(datetime.fromisoformat(fim_str))
+        except ValueError:
+            return Response({
+                'status': 400,
+                'msg': 'Data "inicio" ou "fim" inválida'
+            }, status=400)
+
+        def calcular():
+            # Todas as métricas de todos os dispositivos em uma única consulta agrupada
+            colunas, resultado = agregar_multiplos(dispositivos_ids, tipos, funcoes, intervalo, inicio, fim)
+            return {
                 'status': 200,
-                'msg': 'Nenhum dado encontrado no período para os dispositivos.',
-                'histograma': []
-            })
+                'intervalo': intervalo,
+                'colunas': colunas,
+                'dispositivos': {str(dispositivo_id): serie for dispositivo_id, serie in resultado.items()}
+            }
 
-        # Geração do histograma com numpy
-        counts, bin_edges = np.histogram(valores, bins=bins)
+        # Resultado em cache, invalidado quando chegam dados dos dispositivos no período
+        parametros = {
+            'dispositivos': sorted(dispositivos_ids), 'tipos': tipos, 'funcoes': funcoes,
+            'intervalo': intervalo, 'inicio': inicio, 'fim': fim
+        }
+        try:
+            return Response(obter_ou_calcular('agregacao', parametros, dispositivos_ids, inicio, fim, calcular))
+        except ValueError as e:
+            return Response({
+                'status': 400,
+                'msg': str(e)
+            }, status=400)
+
+
+@extend_schema(
+    description=(
+        "Estima um campo climático por interpolação espacial (IDW ou krigagem ordinária) a partir das estações "
+        "próximas: em um ponto (latitude e longitude) ou numa grade (bbox e resolucao, em graus). Usa o último dado "
+        "de cada estação ou, com inicio e fim, a média no período. A grade é alinhada globalmente e calculada por "
+        "tiles em cache; \"valores\" tem uma linha por latitude, do sul para o norte, e null onde não há estação no raio."
+    ),
+    parameters=[
+        OpenApiParameter(name='campo', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+                         description='temperatura (padrão), umidade, precipitacao ou velocidade_vento'),
+        OpenApiParameter(name='latitude', type=OpenApiTypes.FLOAT, location=OpenApiParameter.QUERY, required=False,
+                         description='Latitude do ponto (ex: -3.7319)'),
+        OpenApiParameter(name='longitude', type=OpenApiTypes.FLOAT, location=OpenApiParameter.QUERY, required=False,
+                         description='Longitude do ponto (ex: -38.5267)'),
+        OpenApiParameter(name='bbox', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+                         description='Área da grade no formato lon_min,lat_min,lon_max,lat_max (ex: -38.6,-3.9,-38.4,-3.7)'),
+        OpenApiParameter(name='resolucao', type=OpenApiTypes.FLOAT, location=OpenApiParameter.QUERY, required=False,
+                         description='Tamanho da célula da grade em graus (ex: 0.01)'),
+        OpenApiParameter(name='metodo', type=OpenApiTypes.STR, location=OpenApiParameter.QUERY, required=False,
+                         description='idw (padrão) ou kriging'),
+        OpenApiParameter(name='vizinhos', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False,
+                         description='Estações mais próximas usadas em cada ponto (padrão INTERPOLACAO_VIZINHOS)'),
+        OpenApiParameter(name='raio', type=OpenApiTypes.FLOAT, location=OpenApiParameter.QUERY, required=False,
+                         description='Distância máxima (km) das estações usadas (padrão INTERPOLACAO_RAIO_KM)'),
+        OpenApiParameter(name='potencia', type=OpenApiTypes.FLOAT, location=OpenApiParameter.QUERY, required=False,
+                         description='Expoente do IDW (padrão 2)'),
+        OpenApiParameter(name='alcance', type=OpenApiTypes.FLOAT, location=OpenApiParameter.QUERY, required=False,
+                         description='Alcance (km) do variograma exponencial da krigagem (padrão INTERPOLACAO_ALCANCE_KM)'),
+        OpenApiParameter(name='recentes', type=OpenApiTypes.INT, location=OpenApiParameter.QUERY, required=False,
+                         description='Só estações com último dado nos últimos N minutos'),
+        OpenApiParameter(name='inicio', type=OpenApiTypes.DATETIME, location=OpenApiParameter.QUERY, required=False,
+                         description='Início do período da média (ex: 2025-05-01T00:00:00)'),
+        OpenApiParameter(name='fim', type=OpenApiTypes.DATETIME, location=OpenApiParameter.QUERY, required=False,
+                         description='Fim do período da média (ex: 2025-05-02T00:00:00)'),
+    ],
+    responses={
+        200: OpenApiTypes.OBJECT,
+        400: OpenApiTypes.OBJECT
+    },
+    examples=[
+        OpenApiExample(
+            'Ponto',
+            value={
+                "status": 200,
+                "campo": "temperatura",
+                "metodo": "idw",
+                "latitude": -3.7319,
+                "longitude": -38.5267,
+                "valor": 28.413
+            },
+            status_codes=['200'],
+            response_only=True
+        ),
+        OpenApiExample(
+            'Grade',
+            value={
+                "status": 200,
+                "campo": "temperatura",
+                "metodo": "idw",
+                "resolucao": 0.1,
+                "origem": {"longitude": -38.55, "latitude": -3.85},
+                "linhas": 2,
+                "colunas": 2,
+                "valores": [[28.1, 28.35], [None, 28.6]]
+            },
+            status_codes=['200'],
+            response_only=True
+        ),
+        OpenApiExample(
+            'Parâmetros inválidos',
+            value={"status": 400, "msg": 'Informe "latitude" e "longitude" ou "bbox" e "resolucao".'},
+            status_codes=['400'],
+            response_only=True
+        )
+    ]
+)
+class InterpolacaoView(APIView):
+    def get(self, request):
+        try:
+            opcoes = interpolacao.ler_opcoes(request.query_params)
+        except ValueError as e:
+            return Response({
+                'status': 400,
+                'msg': str(e)
+            }, status=400)
 
-        # Formata os dados para o retorno
-        histograma = []
-        for i in range(len(counts)):
-            histograma.append({
-                'bin_inicio': float(bin_edges[i]),
-                'bin_fim': float(bin_edges[i+1]),
-                'quantidade': int(counts[i])
+        cabecalho = {'status': 200, 'campo': opcoes['campo'], 'metodo': opcoes['metodo']}
+        bbox = request.query_params.get('bbox')
+
+        if not bbox:
+            try:
+                latitude = float(request.query_params['latitude'])
+                longitude = float(request.query_params['longitude'])
+            except (KeyError, ValueError):
+                return Response({
+                    'status': 400,
+                    'msg': 'Informe "latitude" e "longitude" ou "bbox" e "resolucao".'
+                }, status=400)
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+                return Response({
+                    'status': 400,
+                    'msg': 'Coordenadas fora dos limites.'
+                }, status=400)
+            return Response({
+                **cabecalho,
+                'latitude': latitude,
+                'longitude': longitude,
+                'valor': interpolacao.interpolar_ponto(opcoes, latitude, longitude)
             })
 
-        # Resposta final com status, mensagem e histograma
+        try:
+            lon_min, lat_min, lon_max, lat_max = (float(valor) for valor in bbox.split(','))
+            resolucao = float(request.query_params.get('resolucao', ''))
+        except ValueError:
+            return Response({
+                'status': 400,
+                'msg': 'Parâmetro "bbox" deve ter o formato lon_min,lat_min,lon_max,lat_max e "resolucao" deve ser numérico.'
+            }, status=400)
+        if not (-180 <= lon_min < lon_max <= 180 and -90 <= lat_min < lat_max <= 90) or not 0.0001 <= resolucao <= 10:
+            return Response({
+                'status': 400,
+                'msg': 'Parâmetro "bbox" fora dos limites ou "resolucao" fora do intervalo 0.0001 a 10 graus.'
+            }, status=400)
+
+        try:
+            grade, origem_lon, origem_lat = interpolacao.interpolar_grade(opcoes, lon_min, lat_min, lon_max, lat_max, resolucao)
+        except ValueError as e:
+            return Response({
+                'status': 400,
+                'msg': str(e)
+            }, status=400)
+
+        valores = np.round(grade.astype(np.float64), 3)
         return Response({
-            'status': 200,
-            'msg': f'Histograma de {campo} para dispositivos {dispositivos_ids} entre {inicio_str} e {fim_str}.',
-            'histograma': histograma
-        })
\ No newline at end of file
+            **cabecalho,
+            'resolucao': resolucao,
+            'origem': {'longitude': round(origem_lon, 6), 'latitude': round(origem_lat, 6)},
+            'linhas': grade.shape[0],
+            'colunas': grade.shape[1],
+            'valores': [[None if np.isnan(valor) else valor for valor in linha] for linha in valores.tolist()]
+        })
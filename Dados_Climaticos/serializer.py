@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import DadoClimatico
+from .models import DadoClimatico, UltimoDado
         
 class DadoClimaticoSerializer(serializers.ModelSerializer):
     direcao_vento = serializers.CharField(source='direcao_vento_id.nome', read_only=True)
@@ -17,4 +17,23 @@ class DadoClimaticoSerializer(serializers.ModelSerializer):
             "velocidade_vento",
             "direcao_vento",
         ]
-        
\ No newline at end of file
+        
+
+class UltimoDadoSerializer(serializers.ModelSerializer):
+    """Mesmo formato do DadoClimaticoSerializer, a partir da tabela de últimos dados"""
+    id = serializers.IntegerField(source='dado_id', read_only=True)
+    direcao_vento = serializers.CharField(source='direcao_vento.nome', read_only=True)
+    data = serializers.DateTimeField(source='time', read_only=True)
+
+    class Meta:
+        model = UltimoDado
+        fields = [
+            "id",
+            "dispositivo",
+            "data",
+            "temperatura",
+            "umidade",
+            "precipitacao",
+            "velocidade_vento",
+            "direcao_vento",
+        ]
@@ -1,3 +1,634 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import math
+import re
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+import numpy as np
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APITestCase
+from Direcao_Vento.models import DirecaoVento
+from Dispositivo.indice_espacial import RAIO_TERRA_KM
+from Dispositivo.models import Dispositivo
+from . import agregados, fila
+from .exportacao import serializar_dados
+from .histograma import histograma_banco
+from .hypertable import comprimir_chunks, periodo_comprimido
+from .ingestao import TEMPO_MAXIMO, TEMPO_MINIMO, _numero, erros_colunas
+from .interpolacao import Estacoes, interpolar
+from .models import DadoClimatico
+from .parsers import ASSINATURA, BYTES_POR_LEITURA, CABECALHO, DadosBinariosParser
+from .paginacao import ParametroInvalido, codificar_cursor, decodificar_cursor
+from .serializer import DadoClimaticoSerializer
 
-# Create your tests here.
+
+class IndiceDispositivoTempoTest(TestCase):
+    """As consultas por dispositivo + intervalo de tempo usam o índice (dispositivo_id, time DESC) da migração 0005"""
+
+    DISPOSITIVOS = 50
+    LEITURAS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        dispositivos = Dispositivo.objects.bulk_create(
+            Dispositivo(descricao=f'Estação {i}') for i in range(cls.DISPOSITIVOS)
+        )
+        cls.fim = timezone.now().replace(minute=0, second=0, microsecond=0)
+        cls.inicio = cls.fim - timedelta(hours=cls.LEITURAS - 1)
+        DadoClimatico.objects.bulk_create(
+            (
+                DadoClimatico(dispositivo=dispositivo, time=cls.inicio + timedelta(hours=hora), temperatura=20.0 + hora % 10)
+                for dispositivo in dispositivos
+                for hora in range(cls.LEITURAS)
+            ),
+            batch_size=1000
+        )
+        cls.dispositivo = dispositivos[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE dado_climatico')
+
+    def planos(self, executar):
+        """Executa `executar` e retorna o EXPLAIN de cada consulta feita no hypertable dado_climatico"""
+        planos = []
+
+        def explicar(execute, sql, params, many, context):
+            if not many and re.search(r'\bdado_climatico\b', sql) and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                execute('EXPLAIN ' + sql, params, many, context)
+                planos.append('\n'.join(linha[0] for linha in context['cursor'].fetchall()))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(explicar):
+            executar()
+        self.assertTrue(planos)
+        return planos
+
+    def assertUsaIndice(self, planos):
+        for plano in planos:
+            # Nos chunks o índice é criado com o nome prefixado (_hyper_N_M_chunk_<nome>)
+            self.assertRegex(plano, r'Index (Only )?Scan (Backward )?using \S*dado_climatico_disp_time_idx')
+            self.assertNotIn('Seq Scan', plano)
+
+    def test_media_por_intervalo(self):
+        # Janela dentro de uma hora: lida só dos dados brutos (sem agregados contínuos)
+        instante = self.fim - timedelta(hours=2)
+        planos = self.planos(lambda: agregados.media_por_intervalo(
+            self.dispositivo.id, 'temperatura', '5 minutes',
+            instante - timedelta(minutes=10), instante + timedelta(minutes=10)
+        ))
+        self.assertUsaIndice(planos)
+
+    def test_histograma_banco(self):
+        self.assertUsaIndice(self.planos(
+            lambda: histograma_banco([self.dispositivo.id], 'temperatura', self.inicio, self.fim)
+        ))
+        self.assertUsaIndice(self.planos(
+            lambda: histograma_banco([self.dispositivo.id], 'temperatura', self.inicio, self.fim, bordas=[20, 25, 30])
+        ))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_por_periodo(self):
+        def consultar():
+            resposta = self.client.get('/dados_climaticos/dispositivos/por_periodo/', {
+                'dispositivos': self.dispositivo.id,
+                'inicio': timezone.localtime(self.fim - timedelta(hours=24)).replace(tzinfo=None).isoformat(),
+                'fim': timezone.localtime(self.fim).replace(tzinfo=None).isoformat(),
+            })
+            self.assertEqual(len(resposta.data['dados_climaticos']), 25)
+        self.assertUsaIndice(self.planos(consultar))
+
+    def test_listagem_por_dispositivo_com_cursor(self):
+        url = f'/dados_climaticos/dispositivo/{self.dispositivo.id}/'
+        primeira = self.client.get(url, {'limite': 50})
+        self.assertIsNotNone(primeira.data['proximo_cursor'])
+
+        def consultar():
+            resposta = self.client.get(url, {'limite': 50, 'cursor': primeira.data['proximo_cursor']})
+            self.assertEqual(len(resposta.data['dados']), 50)
+        self.assertUsaIndice(self.planos(consultar))
+
+
+class SerializacaoRapidaTest(TestCase):
+    """O caminho rápido (values_list) gera exatamente o JSON do DadoClimaticoSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        dispositivo = Dispositivo.objects.create(descricao='Estação')
+        # O cache de direções é invalidado no commit, que o TestCase não faz
+        with cls.captureOnCommitCallbacks(execute=True):
+            norte = DirecaoVento.objects.create(nome='NORTE_TESTE')
+        inicio = timezone.now().replace(microsecond=123456)
+        DadoClimatico.objects.bulk_create([
+            DadoClimatico(dispositivo=dispositivo, time=inicio, temperatura=21.5, umidade=65.3, direcao_vento_id=norte),
+            DadoClimatico(dispositivo=dispositivo, time=inicio + timedelta(minutes=1), precipitacao=0.0),
+            DadoClimatico(dispositivo=dispositivo, time=inicio + timedelta(minutes=2), velocidade_vento=3.25),
+        ])
+
+    def test_mesmo_resultado_do_serializer(self):
+        dados = DadoClimatico.objects.order_by('time', 'id')
+        esperado = DadoClimaticoSerializer(dados.select_related('direcao_vento_id'), many=True).data
+        self.assertEqual(serializar_dados(dados), [dict(item) for item in esperado])
+
+
+class IngestaoLoteTest(APITestCase):
+    """Contrato do POST /dados_climaticos/: 201, 207 com erros por índice e 400"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dispositivo = Dispositivo.objects.create(descricao='Estação')
+        cls.data = (timezone.now() - timedelta(hours=1)).replace(microsecond=0)
+
+    def enviar(self, dados):
+        return self.client.post(
+            '/dados_climaticos/', {'token': str(self.dispositivo.token), 'dados': dados}, format='json'
+        )
+
+    def item(self, minutos, **medicoes):
+        return {'data': (self.data + timedelta(minutes=minutos)).isoformat(), **medicoes}
+
+    def test_todos_validos(self):
+        resposta = self.enviar([self.item(0, temperatura=20.5), self.item(1, umidade=60)])
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual([dado['temperatura'] for dado in resposta.data], [20.5, None])
+        self.assertEqual(DadoClimatico.objects.filter(dispositivo=self.dispositivo).count(), 2)
+
+    def test_lote_misto(self):
+        resposta = self.enviar([
+            self.item(0, temperatura=20.5),
+            self.item(1),
+            self.item(2, umidade=61),
+            {'temperatura': 1.0},
+            self.item(4, direcao_vento='INEXISTENTE'),
+        ])
+        self.assertEqual(resposta.status_code, 207)
+        self.assertEqual(len(resposta.data['dados_criados']), 2)
+        self.assertEqual([erro['index'] for erro in resposta.data['erros']], [1, 3, 4])
+        self.assertEqual(DadoClimatico.objects.filter(dispositivo=self.dispositivo).count(), 2)
+
+    def test_todos_invalidos(self):
+        resposta = self.enviar([self.item(0), 'texto', {'data': 'ontem', 'temperatura': 1.0}])
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual([erro['index'] for erro in resposta.data], [0, 1, 2])
+        self.assertFalse(DadoClimatico.objects.filter(dispositivo=self.dispositivo).exists())
+
+    def test_medicao_invalida_rejeita_so_o_item(self):
+        resposta = self.enviar([
+            self.item(0, temperatura=True),
+            self.item(1, temperatura='abc'),
+            self.item(2, umidade='NaN'),
+            self.item(3, precipitacao='inf'),
+            self.item(4, velocidade_vento='3.5'),
+        ])
+        self.assertEqual(resposta.status_code, 207)
+        self.assertEqual([erro['index'] for erro in resposta.data['erros']], [0, 1, 2, 3])
+        self.assertTrue(all(erro['msg'].startswith('Medição inválida') for erro in resposta.data['erros']))
+        self.assertEqual(resposta.data['dados_criados'][0]['velocidade_vento'], 3.5)
+
+    def test_numero(self):
+        self.assertIsNone(_numero(None))
+        self.assertEqual(_numero(0), 0.0)
+        self.assertEqual(_numero('21.5'), 21.5)
+        for valor in (True, False, float('nan'), float('inf'), float('-inf'), 'nan', 'abc'):
+            with self.subTest(valor=valor), self.assertRaises(ValueError):
+                _numero(valor)
+        with self.assertRaises(TypeError):
+            _numero([1])
+
+
+class EdicaoDadoTest(APITestCase):
+    """PUT/DELETE de um dado: mesma data do POST e falhas após gravar não viram erro 500"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dispositivo = Dispositivo.objects.create(descricao='Estação')
+        cls.dado = DadoClimatico.objects.create(
+            dispositivo=cls.dispositivo, time=timezone.now() - timedelta(hours=2), temperatura=20.0
+        )
+
+    def test_data_sem_fuso_usa_fuso_local(self):
+        data = (timezone.localtime() - timedelta(hours=1)).replace(tzinfo=None, microsecond=0)
+        resposta = self.client.put(f'/dados_climaticos/{self.dado.id}/', {'data': data.isoformat()}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.dado.refresh_from_db()
+        self.assertEqual(self.dado.time, timezone.make_aware(data))
+
+    def test_falha_apos_gravar_nao_retorna_erro(self):
+        with mock.patch('Dados_Climaticos.ingestao.ultimo_dado.recalcular', side_effect=RuntimeError('falha')), \
+                self.assertLogs('Dados_Climaticos.ingestao', 'ERROR'):
+            resposta = self.client.put(f'/dados_climaticos/{self.dado.id}/', {'temperatura': 22.5}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.dado.refresh_from_db()
+        self.assertEqual(self.dado.temperatura, 22.5)
+
+        with mock.patch('Dados_Climaticos.ingestao.invalidar_consultas', side_effect=RuntimeError('falha')), \
+                self.assertLogs('Dados_Climaticos.ingestao', 'ERROR'):
+            resposta = self.client.delete(f'/dados_climaticos/{self.dado.id}/')
+        self.assertEqual(resposta.status_code, 204)
+        self.assertFalse(DadoClimatico.objects.filter(id=self.dado.id).exists())
+
+    def test_eventos_de_alteracao_e_remocao(self):
+        with mock.patch('Dados_Climaticos.ingestao.eventos.publicar') as publicar:
+            self.client.put(f'/dados_climaticos/{self.dado.id}/', {'temperatura': 23.0}, format='json')
+            self.client.delete(f'/dados_climaticos/{self.dado.id}/')
+        (alterados, tipo_alteracao), (removidos, tipo_remocao) = [chamada.args for chamada in publicar.call_args_list]
+        self.assertEqual((tipo_alteracao, tipo_remocao), ('alteracao', 'remocao'))
+        self.assertEqual(alterados[0].temperatura, 23.0)
+        # O evento de remoção identifica o dado excluído
+        self.assertEqual(removidos[0].id, self.dado.id)
+
+
+class PaginacaoCursorTest(APITestCase):
+    """Paginação por keyset (time, id) em /dados_climaticos/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        dispositivo = Dispositivo.objects.create(descricao='Estação')
+        data = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        # Vários dados com o mesmo instante: a ordem entre eles é decidida pelo id
+        DadoClimatico.objects.bulk_create(
+            [DadoClimatico(dispositivo=dispositivo, time=data, temperatura=i) for i in range(5)]
+            + [DadoClimatico(dispositivo=dispositivo, time=data + timedelta(minutes=i), temperatura=i) for i in (1, 2)]
+        )
+        cls.esperado = list(DadoClimatico.objects.order_by('time', 'id').values_list('id', flat=True))
+
+    def test_cursor_ida_e_volta(self):
+        data = timezone.now().replace(microsecond=123456)
+        self.assertEqual(decodificar_cursor(codificar_cursor(data, 42)), (data, 42))
+
+    def test_paginas_com_instantes_iguais(self):
+        ids = []
+        cursor = None
+        for _ in range(len(self.esperado)):
+            parametros = {'limite': 2, **({'cursor': cursor} if cursor else {})}
+            resposta = self.client.get('/dados_climaticos/', parametros)
+            self.assertEqual(resposta.status_code, 200)
+            ids += [dado['id'] for dado in resposta.data['dados']]
+            cursor = resposta.data['proximo_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(ids, self.esperado)
+
+    def test_cursor_invalido(self):
+        valido = codificar_cursor(timezone.now(), 1)
+        adulterados = [
+            'nao-e-base64!',
+            valido[:-3],
+            valido.replace(valido[:4], 'AAAA'),
+            base64.urlsafe_b64encode(b'{"time": 1}').decode(),
+            base64.urlsafe_b64encode(b'["ontem", 1]').decode(),
+            base64.urlsafe_b64encode(json.dumps([timezone.now().isoformat(), 2**70]).encode()).decode(),
+        ]
+        for cursor in adulterados:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ParametroInvalido):
+                    decodificar_cursor(cursor)
+                resposta = self.client.get('/dados_climaticos/', {'cursor': cursor})
+                self.assertEqual(resposta.status_code, 400)
+
+    @override_settings(DADOS_PAGINA_MAXIMO=3)
+    def test_limites(self):
+        for limite, codigo in (('1', 200), ('3', 200), ('0', 400), ('4', 400), ('-1', 400), ('abc', 400)):
+            with self.subTest(limite=limite):
+                resposta = self.client.get('/dados_climaticos/', {'limite': limite})
+                self.assertEqual(resposta.status_code, codigo)
+                if codigo == 200:
+                    self.assertEqual(len(resposta.data['dados']), int(limite))
+
+    def test_listagem_por_dispositivo_com_identificador_invalido(self):
+        resposta = self.client.get('/dados_climaticos/dispositivo/nao-e-uuid/')
+        self.assertEqual(resposta.status_code, 400)
+        resposta = self.client.get('/dados_climaticos/dispositivo/999999/')
+        self.assertEqual(resposta.status_code, 404)
+
+
+@override_settings(HISTOGRAMA_BINS_MAXIMO=5)
+class HistogramaBinsTest(APITestCase):
+    """Quantidade de divisões do histograma limitada por HISTOGRAMA_BINS_MAXIMO"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dispositivo = Dispositivo.objects.create(descricao='Estação')
+
+    def consultar(self, **parametros):
+        return self.client.get('/dados_climaticos/dispositivos/histograma/', {
+            'dispositivos': self.dispositivo.id, 'campo': 'temperatura',
+            'inicio': '2025-01-01T00:00:00', 'fim': '2025-01-02T00:00:00', **parametros
+        })
+
+    def test_limite(self):
+        self.assertEqual(self.consultar(bins=5).status_code, 200)
+        for parametros in ({'bins': 6}, {'bins': 10**10}, {'bins': 0}, {'bins': 10**10, 'minimo': 0, 'maximo': 1},
+                           {'bordas': '0,1,2,3,4,5,6'}):
+            with self.subTest(**parametros):
+                self.assertEqual(self.consultar(**parametros).status_code, 400)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'testes-default'},
+    'consultas': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'testes-consultas'},
+})
+class CacheConsultaPeriodoTest(APITestCase):
+    """Cache da consulta por período (JSON): chave normalizada, limite de linhas e direções renomeadas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dispositivo = Dispositivo.objects.create(descricao='Estação')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.direcao = DirecaoVento.objects.create(nome='LESTE_TESTE')
+        DadoClimatico.objects.create(
+            dispositivo=cls.dispositivo, time=timezone.make_aware(datetime(2025, 1, 1, 12)),
+            temperatura=20.0, direcao_vento_id=cls.direcao
+        )
+
+    def consultar(self, inicio='2025-01-01T00:00:00', fim='2025-01-02T00:00:00'):
+        resposta = self.client.get('/dados_climaticos/dispositivos/por_periodo/', {
+            'dispositivos': self.dispositivo.id, 'inicio': inicio, 'fim': fim
+        })
+        self.assertEqual(resposta.status_code, 200)
+        return resposta.data
+
+    def test_intervalos_iguais_escritos_de_outra_forma(self):
+        with mock.patch('Dados_Climaticos.queryviews.serializar_dados', wraps=serializar_dados) as serializar:
+            primeira = self.consultar('2025-01-01T00:00:00', '2025-01-02T00:00:00')
+            segunda = self.consultar('2025-01-01T00:00', '2025-01-02T00:00:00.000000')
+        self.assertEqual(serializar.call_count, 1)
+        self.assertEqual(primeira['dados_climaticos'], segunda['dados_climaticos'])
+        self.assertIn('2025-01-01T00:00 a', segunda['msg'])
+
+    @override_settings(CONSULTAS_CACHE_LINHAS_MAXIMO=0)
+    def test_resultado_grande_nao_vai_para_o_cache(self):
+        with mock.patch('Dados_Climaticos.queryviews.serializar_dados', wraps=serializar_dados) as serializar:
+            self.consultar()
+            self.consultar()
+        self.assertEqual(serializar.call_count, 2)
+
+    def test_direcao_renomeada(self):
+        self.assertEqual(self.consultar()['dados_climaticos'][0]['direcao_vento'], 'LESTE_TESTE')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.direcao.nome = 'LESTE_RENOMEADA'
+            self.direcao.save()
+        self.assertEqual(self.consultar()['dados_climaticos'][0]['direcao_vento'], 'LESTE_RENOMEADA')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class CompressaoTest(APITestCase):
+    """As consultas de média e por período retornam o mesmo resultado com os chunks comprimidos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        dispositivos = Dispositivo.objects.bulk_create(Dispositivo(descricao=f'Estação {i}') for i in range(3))
+        cls.dispositivo = dispositivos[0]
+        cls.inicio = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=40)
+        cls.fim = cls.inicio + timedelta(days=5)
+        DadoClimatico.objects.bulk_create(
+            DadoClimatico(
+                dispositivo=dispositivo, time=cls.inicio + timedelta(minutes=30 * i),
+                temperatura=15.0 + (i * 7 + j) % 13, umidade=None if i % 5 == 0 else 50.0 + i % 30
+            )
+            for j, dispositivo in enumerate(dispositivos)
+            for i in range(5 * 48)
+        )
+
+    def consultar(self):
+        # Só dados brutos (sem agregados contínuos), para ler os chunks do hypertable
+        with mock.patch.object(agregados, 'AGREGADOS', []):
+            media = agregados.media_por_intervalo(
+                self.dispositivo.id, 'temperatura', '6 hours', self.inicio + timedelta(minutes=15), self.fim
+            )
+        resposta = self.client.get('/dados_climaticos/dispositivos/por_periodo/', {
+            'dispositivos': [self.dispositivo.id],
+            'inicio': timezone.localtime(self.inicio).replace(tzinfo=None).isoformat(),
+            'fim': timezone.localtime(self.fim).replace(tzinfo=None).isoformat(),
+        })
+        self.assertEqual(resposta.status_code, 200)
+        # A consulta por período não tem ordenação garantida
+        por_periodo = sorted(resposta.data['dados_climaticos'], key=lambda dado: dado['id'])
+        return media, por_periodo
+
+    def test_mesmo_resultado_comprimido(self):
+        media, por_periodo = self.consultar()
+        self.assertTrue(any(bucket['temperatura_avg'] is not None for bucket in media))
+        self.assertEqual(len(por_periodo), 5 * 48)
+
+        with connection.cursor() as cursor:
+            self.assertGreater(comprimir_chunks(cursor, '20 days'), 0)
+            self.assertIsNotNone(periodo_comprimido(cursor))
+
+        self.assertEqual(self.consultar(), (media, por_periodo))
+
+
+class FilaIngestaoTest(TestCase):
+    """Fila local de ingestão (INGESTAO_ASSINCRONA): processamento, fallback lote a lote e recuperação"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dispositivo = Dispositivo.objects.create(descricao='Estação')
+        cls.data = (timezone.now() - timedelta(hours=1)).replace(microsecond=0)
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(INGESTAO_FILA_ARQUIVO=Path(diretorio.name) / 'fila.sqlite3')
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def item(self, minutos, **medicoes):
+        return {'data': (self.data + timedelta(minutes=minutos)).isoformat(), **medicoes}
+
+    def test_enfileirar_e_processar(self):
+        lote_id = fila.enfileirar(self.dispositivo.id, [self.item(0, temperatura=20.0), self.item(1)])
+        self.assertEqual(fila.obter_lote(lote_id)['situacao'], fila.PENDENTE)
+
+        self.assertEqual(fila.processar(), 1)
+        lote = fila.obter_lote(lote_id)
+        self.assertEqual(lote['situacao'], fila.CONCLUIDO)
+        self.assertEqual(lote['criados'], 1)
+        self.assertEqual([erro['index'] for erro in lote['erros']], [1])
+        self.assertEqual(DadoClimatico.objects.filter(dispositivo=self.dispositivo).count(), 1)
+        self.assertEqual(fila.processar(), 0)
+
+    def test_falha_no_insert_combinado_grava_lote_a_lote(self):
+        lotes = [
+            fila.enfileirar(self.dispositivo.id, [self.item(0, temperatura=20.0)]),
+            fila.enfileirar(self.dispositivo.id, [self.item(1, umidade=60.0), self.item(2, umidade=61.0)]),
+        ]
+        with mock.patch('Dados_Climaticos.fila.gravar_dados', side_effect=RuntimeError('falha')), \
+                mock.patch('Dados_Climaticos.fila.ingerir_dados', wraps=fila.ingerir_dados) as ingerir:
+            self.assertEqual(fila.processar(), 2)
+        self.assertEqual(ingerir.call_count, 2)
+        self.assertEqual([fila.obter_lote(lote_id)['criados'] for lote_id in lotes], [1, 2])
+        self.assertEqual(DadoClimatico.objects.filter(dispositivo=self.dispositivo).count(), 3)
+
+    def test_recuperar_lotes_reservados(self):
+        lote_id = fila.enfileirar(self.dispositivo.id, [self.item(0, temperatura=20.0)])
+        # Processador interrompido depois de reservar o lote
+        conexao = fila._conectar()
+        try:
+            self.assertEqual(len(fila._reservar(conexao, 100)), 1)
+        finally:
+            conexao.close()
+        self.assertEqual(fila.obter_lote(lote_id)['situacao'], fila.PROCESSANDO)
+        self.assertEqual(fila.processar(), 0)
+
+        self.assertEqual(fila.recuperar(), 1)
+        self.assertEqual(fila.processar(), 1)
+        self.assertEqual(fila.obter_lote(lote_id)['situacao'], fila.CONCLUIDO)
+        self.assertEqual(DadoClimatico.objects.filter(dispositivo=self.dispositivo).count(), 1)
+
+
+class UploadBinarioTest(APITestCase):
+    """Formato binário EDC1 (application/x-estacao-dados): cabeçalho, tamanho e validação das colunas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dispositivo = Dispositivo.objects.create(descricao='Estação')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.direcao = DirecaoVento.objects.create(nome='OESTE_TESTE')
+        cls.base = int((timezone.now() - timedelta(hours=1)).timestamp() * 1000)
+
+    def montar(self, deltas, temperaturas, direcoes=None, base=None, assinatura=ASSINATURA, quantidade=None):
+        n = len(deltas)
+        cabecalho = np.zeros(1, dtype=CABECALHO)
+        cabecalho['assinatura'] = assinatura
+        cabecalho['token'] = np.frombuffer(self.dispositivo.token.bytes, dtype='V16')
+        cabecalho['quantidade'] = n if quantidade is None else quantidade
+        cabecalho['base'] = self.base if base is None else base
+        ausentes = np.full(n, np.nan, dtype='<f4')
+        return b''.join([
+            cabecalho.tobytes(),
+            np.asarray(deltas, dtype='<u4').tobytes(),
+            np.asarray(temperaturas, dtype='<f4').tobytes(),
+            ausentes.tobytes() * 3,
+            np.asarray(direcoes or [0] * n, dtype='<u2').tobytes(),
+        ])
+
+    def ler(self, conteudo):
+        return DadosBinariosParser().parse(io.BytesIO(conteudo))
+
+    def enviar(self, conteudo):
+        return self.client.post('/dados_climaticos/', conteudo, content_type=DadosBinariosParser.media_type)
+
+    def test_leitura(self):
+        resultado = self.ler(self.montar([0, 1000], [20.5, np.nan], [self.direcao.id, 0]))
+        self.assertEqual(resultado['token'], str(self.dispositivo.token))
+        lote = resultado['dados']
+        self.assertEqual(lote.tempos.tolist(), [self.base, self.base + 1000])
+        self.assertEqual(lote.medicoes['temperatura'][0], np.float32(20.5))
+        self.assertTrue(np.isnan(lote.medicoes['temperatura'][1]))
+        self.assertEqual(lote.direcoes.tolist(), [self.direcao.id, 0])
+
+        resposta = self.enviar(self.montar([0, 1000], [20.5, np.nan], [self.direcao.id, 0]))
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.data, {'criados': 2, 'erros': []})
+
+    def test_cabecalho_invalido(self):
+        valido = self.montar([0], [20.0])
+        for conteudo in (b'', valido[:CABECALHO.itemsize - 1], b'EDC0' + valido[4:], b'EDC2' + valido[4:], b'XXXX' + valido[4:]):
+            with self.subTest(conteudo=conteudo[:4]):
+                with self.assertRaises(ParseError):
+                    self.ler(conteudo)
+                if conteudo:
+                    self.assertEqual(self.enviar(conteudo).status_code, 400)
+
+    def test_colunas_truncadas(self):
+        conteudo = self.montar([0, 1000, 1000], [20.0, 21.0, 22.0])
+        for tamanho in (len(conteudo) - 1, len(conteudo) - BYTES_POR_LEITURA, CABECALHO.itemsize):
+            with self.subTest(tamanho=tamanho):
+                with self.assertRaises(ParseError):
+                    self.ler(conteudo[:tamanho])
+        with self.assertRaises(ParseError):
+            self.ler(conteudo + b'\0')
+        # Quantidade declarada maior que a enviada
+        with self.assertRaises(ParseError):
+            self.ler(self.montar([0], [20.0], quantidade=2))
+
+    @override_settings(INGESTAO_BINARIO_MAXIMO=2)
+    def test_quantidade_acima_do_maximo(self):
+        self.assertEqual(len(self.ler(self.montar([0, 1000], [20.0, 21.0]))['dados']), 2)
+        with self.assertRaises(ParseError):
+            self.ler(self.montar([0, 1000, 1000], [20.0, 21.0, 22.0]))
+        # A quantidade é verificada antes do tamanho: não precisa enviar as leituras
+        with self.assertRaises(ParseError):
+            self.ler(self.montar([], [], quantidade=2**32 - 1))
+        self.assertEqual(self.enviar(self.montar([0, 1000, 1000], [20.0, 21.0, 22.0])).status_code, 400)
+
+    def test_erros_por_leitura(self):
+        conteudo = self.montar([0, 1000, 1000], [20.0, np.inf, 22.0], [0, 0, 65535])
+        resposta = self.enviar(conteudo)
+        self.assertEqual(resposta.status_code, 207)
+        self.assertEqual(resposta.data['criados'], 1)
+        self.assertEqual(resposta.data['erros'], [
+            {'index': 1, 'msg': 'Medição inválida: valor não finito'},
+            {'index': 2, 'msg': 'Direção do vento inválida: 65535'},
+        ])
+
+    def test_tempos_fora_do_intervalo(self):
+        # Base válida, mas os deltas acumulados passam do ano 9999
+        lote = self.ler(self.montar([0, 5000], [20.0, -np.inf], base=TEMPO_MAXIMO - 1000))['dados']
+        self.assertEqual(erros_colunas(lote), {1: 'Data fora do intervalo permitido'})
+        lote = self.ler(self.montar([0], [20.0], base=TEMPO_MINIMO - 1))['dados']
+        self.assertEqual(erros_colunas(lote), {0: 'Data fora do intervalo permitido'})
+
+        resposta = self.enviar(self.montar([0, 2**32 - 1], [20.0, 21.0], base=TEMPO_MAXIMO + 1))
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual([erro['msg'] for erro in resposta.data['erros']], ['Data fora do intervalo permitido'] * 2)
+        self.assertFalse(DadoClimatico.objects.filter(dispositivo=self.dispositivo).exists())
+
+
+class InterpolacaoTest(SimpleTestCase):
+    """IDW e krigagem em 3 estações, comparados com os valores calculados à mão"""
+
+    # Duas estações no equador, a 1° a oeste e a leste do ponto (0, 0), e uma a 1° ao norte dele
+    ESTACOES = Estacoes([1, 2, 3], [0.0, 0.0, 1.0], [-1.0, 1.0, 0.0], [10.0, 20.0, 40.0])
+
+    def opcoes(self, metodo, **outras):
+        return {'metodo': metodo, 'vizinhos': 3, 'potencia': 2, 'raio': 1000, 'alcance': 300, **outras}
+
+    def interpolar(self, metodo, latitude, longitude):
+        return interpolar(self.ESTACOES, np.array([latitude]), np.array([longitude]), self.opcoes(metodo))[0]
+
+    @staticmethod
+    def arco_km(graus):
+        return RAIO_TERRA_KM * math.radians(graus)
+
+    def test_idw(self):
+        # (0, 0): as três estações à mesma distância (1°) -> média simples
+        self.assertAlmostEqual(self.interpolar('idw', 0.0, 0.0), (10 + 20 + 40) / 3, places=6)
+
+        # (0, 0.5): distâncias de 1,5°, 0,5° e arccos(cos 1° · cos 0,5°) (triângulo esférico retângulo)
+        distancias = [1.5, 0.5, math.degrees(math.acos(math.cos(math.radians(1)) * math.cos(math.radians(0.5))))]
+        pesos = [1 / d ** 2 for d in distancias]
+        esperado = (10 * pesos[0] + 20 * pesos[1] + 40 * pesos[2]) / sum(pesos)
+        self.assertAlmostEqual(self.interpolar('idw', 0.0, 0.5), esperado, places=6)
+
+        # Sobre a estação: o valor dela
+        self.assertAlmostEqual(self.interpolar('idw', 0.0, 1.0), 20.0, places=6)
+
+    def test_kriging(self):
+        # (0, 0): h = 1° para as três estações; por simetria λ1 = λ2 = λ e λ3 = 1 - 2λ.
+        # Subtraindo as equações das estações 1 e 3 do sistema: λ = γ13 / (4·γ13 - γ12)
+        def variograma(km):
+            return 1 - math.exp(-3 * km / 300)
+        gama12 = variograma(self.arco_km(2))
+        gama13 = variograma(self.arco_km(math.degrees(math.acos(math.cos(math.radians(1)) ** 2))))
+        peso = gama13 / (4 * gama13 - gama12)
+        esperado = peso * (10 + 20) + (1 - 2 * peso) * 40
+        self.assertAlmostEqual(self.interpolar('kriging', 0.0, 0.0), esperado, places=5)
+        # A estação 3 fica mais perto das outras (1,41°) do que elas entre si (2°): pesa menos que 1/3
+        self.assertGreater(peso, 1 / 3)
+        self.assertLess(esperado, (10 + 20 + 40) / 3)
+
+        # Interpolador exato: sobre a estação, o valor dela
+        self.assertAlmostEqual(self.interpolar('kriging', 1.0, 0.0), 40.0, places=5)
+
+    def test_fora_do_raio(self):
+        opcoes = self.opcoes('idw', raio=50)
+        resultado = interpolar(self.ESTACOES, np.array([0.0, 0.0]), np.array([0.0, 1.1]), opcoes)
+        # (0, 0) fica a 111 km de todas as estações; (0, 1,1) só tem a estação 2 no raio
+        self.assertTrue(np.isnan(resultado[0]))
+        self.assertAlmostEqual(resultado[1], 20.0, places=6)
@@ -0,0 +1,101 @@
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.utils import timezone
+from .models import CAMPOS_NUMERICOS, DadoClimatico, UltimoDado
+
+CAMPOS = ['dado_id', 'time', *CAMPOS_NUMERICOS, 'direcao_vento_id']
+
+# Só sobrescreve se o dado recebido não for mais antigo que o armazenado
+# (lotes retroativos ou requisições concorrentes fora de ordem)
+SQL_UPSERT = (
+    f"INSERT INTO ultimo_dado (dispositivo_id, {', '.join(CAMPOS)}) "
+    f"VALUES (%s, {', '.join(['%s'] * len(CAMPOS))}) "
+    f"ON CONFLICT (dispositivo_id) DO UPDATE SET "
+    f"{', '.join(f'{campo} = EXCLUDED.{campo}' for campo in CAMPOS)} "
+    f"WHERE ultimo_dado.time <= EXCLUDED.time"
+)
+
+
+def _como_datetime(valor):
+    """Datas vindas da ingestão podem ser strings ISO; datas sem fuso usam o fuso local"""
+    if isinstance(valor, str):
+        valor = datetime.fromisoformat(valor)
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor
+
+
+def _valores(dado, time):
+    return [
+        dado.dispositivo_id,
+        dado.id,
+        time,
+        dado.temperatura,
+        dado.umidade,
+        dado.precipitacao,
+        dado.velocidade_vento,
+        dado.direcao_vento_id_id,
+    ]
+
+
+def atualizar(objetos):
+    """
+    Atualiza o último dado do dispositivo a partir de um lote recém-gravado.
+    Apenas o dado mais recente do lote é enviado ao banco (um único upsert).
+    """
+    if not objetos:
+        return
+    time, _, mais_recente = max(
+        (_como_datetime(objeto.time), posicao, objeto) for posicao, objeto in enumerate(objetos)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_UPSERT, _valores(mais_recente, time))
+
+
+def recalcular(dispositivo_id):
+    """
+    Recalcula o último dado do dispositivo a partir do hypertable
+    (após edição ou exclusão de um dado). Retorna o UltimoDado ou None.
+    """
+    dado = (
+        DadoClimatico.objects.select_related('direcao_vento_id')
+        .filter(dispositivo_id=dispositivo_id).order_by('-time').first()
+    )
+    if dado is None:
+        UltimoDado.objects.filter(dispositivo_id=dispositivo_id).delete()
+        return None
+    ultimo, _ = UltimoDado.objects.update_or_create(
+        dispositivo_id=dispositivo_id,
+        defaults={
+            'dado_id': dado.id,
+            'time': dado.time,
+            'temperatura': dado.temperatura,
+            'umidade': dado.umidade,
+            'precipitacao': dado.precipitacao,
+            'velocidade_vento': dado.velocidade_vento,
+            'direcao_vento_id': dado.direcao_vento_id_id,
+        }
+    )
+    # Direção já carregada: a serialização não faz outra consulta
+    ultimo.direcao_vento = dado.direcao_vento_id
+    return ultimo
+
+
+def obter(dispositivo_id):
+    """
+    Último dado do dispositivo pela chave primária da tabela ultimo_dado.
+    Se ainda não houver registro (dados gravados por outro caminho), recalcula.
+    """
+    ultimo = UltimoDado.objects.select_related('direcao_vento').filter(dispositivo_id=dispositivo_id).first()
+    if ultimo is None:
+        ultimo = recalcular(dispositivo_id)
+    return ultimo
+
+
+async def aobter(dispositivo_id):
+    """Versão assíncrona de obter() (ORM assíncrono do Django)"""
+    ultimo = await UltimoDado.objects.select_related('direcao_vento').filter(dispositivo_id=dispositivo_id).afirst()
+    if ultimo is None:
+        ultimo = await sync_to_async(recalcular)(dispositivo_id)
+    return ultimo
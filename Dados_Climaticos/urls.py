@@ -1,13 +1,23 @@
 from django.urls import path
-from .views import DadoClimaticoListView, DadoClimaticoDetailView, DadoClimaticoDispositivoView
-from .queryviews import UltimoDadoView, QueryMediaUnicaView, DadoClimaticoPorPeriodoView, HistogramaPorDispositivosView
+from .views import DadoClimaticoListView, DadoClimaticoDetailView, DadoClimaticoDispositivoView, DadoClimaticoLoteView
+from . import async_views
+from .queryviews import UltimoDadoView, UltimosDadosView, QueryMediaUnicaView, DadoClimaticoPorPeriodoView, HistogramaPorDispositivosView, AgregacaoView, InterpolacaoView
 
 urlpatterns = [
     path('dados_climaticos/', DadoClimaticoListView.as_view()),
     path('dados_climaticos/<int:id>/', DadoClimaticoDetailView.as_view()),
+    path('dados_climaticos/lotes/<str:lote_id>/', DadoClimaticoLoteView.as_view()),
     path('dados_climaticos/dispositivo/<str:identificador>/', DadoClimaticoDispositivoView.as_view()),
     path('dados_climaticos/dispositivo/<str:identificador>/media/', QueryMediaUnicaView.as_view()),
     path('dados_climaticos/dispositivos/<str:identificador>/ultimo-dado/', UltimoDadoView.as_view()), 
+    path('dados_climaticos/dispositivos/ultimos-dados/', UltimosDadosView.as_view()),
     path('dados_climaticos/dispositivos/por_periodo/', DadoClimaticoPorPeriodoView.as_view()),
     path('dados_climaticos/dispositivos/histograma/', HistogramaPorDispositivosView.as_view()),
+    path('dados_climaticos/dispositivos/agregacao/', AgregacaoView.as_view()),
+    path('dados_climaticos/interpolacao/', InterpolacaoView.as_view()),
+
+    # Versões assíncronas (servidas via ASGI)
+    path('async/dados_climaticos/dispositivos/<str:identificador>/ultimo-dado/', async_views.ultimo_dado_view),
+    path('async/dados_climaticos/dispositivo/<str:identificador>/media/', async_views.media_unica_view),
+    path('async/dados_climaticos/eventos/', async_views.eventos_view),
 ]
\ No newline at end of file
@@ -4,10 +4,16 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, serializers
 from rest_framework.exceptions import PermissionDenied
-from .models import DadoClimatico
+from rest_framework.settings import api_settings
+from .models import CAMPOS_NUMERICOS, DadoClimatico
 from .serializer import DadoClimaticoSerializer
-from Dispositivo.models import Dispositivo
-from Direcao_Vento.models import DirecaoVento
+from Dispositivo.cache import buscar_por_token
+from Direcao_Vento.cache import obter_direcao
+from .ingestao import anterior_ao_arquivo, apos_alterar, colunas_para_dados, erros_colunas, ingerir_dados
+from .arquivamento import limite_dados_brutos
+from .parsers import DadosBinariosParser, LoteColunar
+from . import fila
+from .paginacao import responder_listagem
 from utils import is_valid_uuid, get_dispositivo
 from drf_spectacular.utils import (
     extend_schema, 
@@ -17,37 +23,77 @@ from drf_spectacular.utils import (
 )
 
 
+PARAMETROS_LISTAGEM = [
+    OpenApiParameter(
+        name='limite',
+        type=int,
+        location=OpenApiParameter.QUERY,
+        description="Quantidade de dados por página (padrão: 500, máximo: 5000)"
+    ),
+    OpenApiParameter(
+        name='cursor',
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description="Cursor opaco retornado em \"proximo_cursor\" pela página anterior"
+    ),
+    OpenApiParameter(
+        name='formato',
+        type=str,
+        location=OpenApiParameter.QUERY,
+        description=(
+            "Use \"ndjson\" para transmitir todos os dados, um objeto JSON por linha, "
+            "ou \"arrow\"/\"parquet\" para exportação colunar (requer pyarrow no servidor)"
+        )
+    ),
+]
+
+
 class DadoClimaticoListView(APIView):
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, DadosBinariosParser]
+
     @extend_schema(
-        description="Lista todos os dados climáticos cadastrados",
-        responses={status.HTTP_200_OK: DadoClimaticoSerializer(many=True)},
+        description=(
+            "Lista os dados climáticos cadastrados, ordenados por data, em páginas "
+            "(paginação por cursor). Com `formato=ndjson` transmite todos os dados."
+        ),
+        parameters=PARAMETROS_LISTAGEM,
+        responses={
+            status.HTTP_200_OK: serializers.DictField,
+            status.HTTP_400_BAD_REQUEST: serializers.DictField,
+        },
         examples=[
             OpenApiExample(
                 "Exemplo de resposta",
-                value=[
-                    {
-                        "id": 1,
-                        "dispositivo": 1,
-                        "dispositivo_uuid": "550e8400-e29b-41d4-a716-446655440000",
-                        "data": "2023-10-15T14:30:00Z",
-                        "temperatura": 25.5,
-                        "umidade": 65.0,
-                        "precipitacao": 0.0,
-                        "velocidade_vento": 10.2,
-                        "direcao_vento": "NORTE"
-                    }
-                ],
+                value={
+                    "proximo_cursor": "WyIyMDIzLTEwLTE1VDE0OjMwOjAwKzAwOjAwIiwgMV0",
+                    "dados": [
+                        {
+                            "id": 1,
+                            "dispositivo": 1,
+                            "data": "2023-10-15T14:30:00Z",
+                            "temperatura": 25.5,
+                            "umidade": 65.0,
+                            "precipitacao": 0.0,
+                            "velocidade_vento": 10.2,
+                            "direcao_vento": "NORTE"
+                        }
+                    ]
+                },
                 response_only=True
+            ),
+            OpenApiExample(
+                "Cursor inválido",
+                value={"erro": "Parâmetro \"cursor\" inválido."},
+                response_only=True,
+                status_codes=['400']
             )
         ]
     )
     
-    # GET: Lista todos os dados climáticos cadastrados
+    # GET: Lista os dados climáticos cadastrados (paginado por cursor)
     def get(self, request):
-        """Recupera todos os dados climáticos do banco de dados"""
-        dados = DadoClimatico.objects.all()
-        serializer = DadoClimaticoSerializer(dados, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """Recupera uma página de dados climáticos ou transmite todos em NDJSON"""
+        return responder_listagem(request, DadoClimatico.objects.all())
     
     @extend_schema(
         description=(
@@ -57,11 +103,15 @@ class DadoClimaticoListView(APIView):
             "- `dados`: Lista de objetos contendo:\n"
             "  - `data`: Data/hora da medição\n"
             "  - Pelo menos um dos campos: `temperatura`, `umidade`, "
-            "`precipitacao`, `velocidade_vento` ou `direcao_vento`"
+            "`precipitacao`, `velocidade_vento` ou `direcao_vento`\n\n"
+            "Também aceita o formato binário compacto `application/x-estacao-dados` "
+            "(ver `Dados_Climaticos/parsers.py`), com resposta resumida "
+            "`{\"criados\": n, \"erros\": [...]}`."
         ),
         request=serializers.DictField,
         responses={
             status.HTTP_201_CREATED: DadoClimaticoSerializer(many=True),
+            status.HTTP_202_ACCEPTED: serializers.DictField,
             status.HTTP_207_MULTI_STATUS: serializers.DictField,
             status.HTTP_400_BAD_REQUEST: serializers.DictField,
             status.HTTP_404_NOT_FOUND: serializers.DictField,
@@ -102,6 +152,16 @@ class DadoClimaticoListView(APIView):
                 response_only=True,
                 status_codes=["201"]
             ),
+            OpenApiExample(
+                "Resposta 202: lote na fila (INGESTAO_ASSINCRONA)",
+                value={
+                    "lote": "3f2b9c1e8d7a4b6c9e0f1a2b3c4d5e6f",
+                    "situacao": "pendente",
+                    "quantidade": 2
+                },
+                response_only=True,
+                status_codes=["202"]
+            ),
             OpenApiExample(
                 "Resposta 207: alguns dados com erro",
                 value={
@@ -167,12 +227,15 @@ class DadoClimaticoListView(APIView):
         Cria novos dados climáticos com validações:
         1. Valida token e presença de dados
         2. Verifica existência do dispositivo
-        3. Valida cada item da lista de dados:
+        3. Valida cada item da lista de dados em memória:
            - Campo data obrigatório
            - Pelo menos uma medição presente
            - Formato de data válido
            - Direção do vento existente
-        4. Retorna respostas multi-status quando aplicável
+        4. Grava todos os itens válidos em lote (bulk insert)
+        5. Retorna respostas multi-status quando aplicável
+        Com INGESTAO_ASSINCRONA, os passos 3 e 4 ficam para o comando
+        processar_fila e a resposta é 202 com o id do lote.
         """
         token = request.data.get('token')
         dados_input = request.data.get('dados')  
@@ -185,56 +248,46 @@ class DadoClimaticoListView(APIView):
         if not is_valid_uuid(token):
             return Response({"token": ["UUID inválido"]}, status=400)
 
-        try:
-            # Busca dispositivo pelo token
-            dispositivo = Dispositivo.objects.get(token=token)
-        except Dispositivo.DoesNotExist:
+        # Busca dispositivo pelo token (cache de dispositivos)
+        dispositivo = buscar_por_token(token)
+        if not dispositivo:
             return Response({"erro": "Dispositivo não encontrado"}, status=404)
 
-        # Normaliza entrada para lista
-        dados = dados_input if isinstance(dados_input, list) else [dados_input]
-        criados = []
-        erros = []
+        # Normaliza entrada para lista (o upload binário já chega em colunas)
+        binario = isinstance(dados_input, LoteColunar)
+        dados = dados_input if binario or isinstance(dados_input, list) else [dados_input]
+
+        # Modo assíncrono: só o formato é validado aqui; o lote vai para a fila local
+        if fila.habilitada():
+            if binario:
+                erros = [{'index': idx, 'msg': msg} for idx, msg in sorted(erros_colunas(dados).items())]
+                if erros:
+                    return Response(erros, status=status.HTTP_400_BAD_REQUEST)
+                dados = colunas_para_dados(dados)
+            erros = [
+                {'index': idx, 'msg': 'Formato inválido: item deve ser um objeto'}
+                for idx, dado in enumerate(dados) if not isinstance(dado, dict)
+            ]
+            if erros:
+                return Response(erros, status=status.HTTP_400_BAD_REQUEST)
+            lote_id = fila.enfileirar(dispositivo.id, dados)
+            return Response({
+                "lote": lote_id,
+                "situacao": fila.PENDENTE,
+                "quantidade": len(dados)
+            }, status=status.HTTP_202_ACCEPTED)
 
-        # Processa cada item de dados individualmente
-        for idx, dado in enumerate(dados):
-            # Validação de campos obrigatórios
-            if not dado.get('data'):
-                erros.append({'index': idx, 'msg': 'Campo data obrigatório'})
-                continue
-            
-            campos_medicao = ['temperatura', 'umidade', 'precipitacao', 'velocidade_vento', 'direcao_vento']
-            if not any(dado.get(campo) is not None for campo in campos_medicao):
-                erros.append({'index': idx, 'msg': 'Pelo menos uma medição é obrigatória'})
-                continue
+        # Valida todo o lote em memória e grava os itens válidos com bulk insert
+        objetos_criados, erros = ingerir_dados(dispositivo, dados)
 
-            try:
-                # Valida formato ISO da data
-                datetime.fromisoformat(dado['data'])
-                
-                # Busca direção do vento se existir
-                direcao = None
-                if direcao_nome := dado.get('direcao_vento'):
-                    direcao = DirecaoVento.objects.get(nome__iexact=direcao_nome.upper())
-                
-                # Cria novo registro no banco
-                novo_dado = DadoClimatico.objects.create(
-                    dispositivo=dispositivo,
-                    time=dado['data'],
-                    temperatura=dado.get('temperatura'),
-                    umidade=dado.get('umidade'),
-                    precipitacao=dado.get('precipitacao'),
-                    velocidade_vento=dado.get('velocidade_vento'),
-                    direcao_vento_id=direcao
-                )
-                criados.append(DadoClimaticoSerializer(novo_dado).data)
-                
-            except ValueError as e:
-                erros.append({'index': idx, 'msg': f'Formato inválido: {str(e)}'})
-            except DirecaoVento.DoesNotExist:
-                erros.append({'index': idx, 'msg': f'Direção do vento inválida: {direcao_nome}'})
-            except Exception as e:
-                erros.append({'index': idx, 'msg': f'Erro interno: {str(e)}'})
+        # Upload binário (links móveis): resposta resumida, sem devolver os dados criados
+        if binario:
+            codigo = status.HTTP_201_CREATED if not erros else (
+                status.HTTP_207_MULTI_STATUS if objetos_criados else status.HTTP_400_BAD_REQUEST
+            )
+            return Response({"criados": len(objetos_criados), "erros": erros}, status=codigo)
+
+        criados = DadoClimaticoSerializer(objetos_criados, many=True).data
 
         # Define resposta apropriada baseada nos resultados
         if erros and not criados:
@@ -333,16 +386,30 @@ class DadoClimaticoDetailView(APIView):
             return Response({"erro": "Dado não encontrado"}, status=404)
 
         # Verifica se pelo menos um campo válido foi fornecido
-        campos_validos = ['data', 'temperatura', 'umidade', 'precipitacao', 'velocidade_vento', 'direcao_vento']
+        campos_validos = ['data', *CAMPOS_NUMERICOS, 'direcao_vento']
         if not any(field in request.data for field in campos_validos):
             return Response({"erro": "Pelo menos um campo deve ser fornecido"}, status=400)
 
+        # Guarda a data original: agregados e consultas em cache que a incluem também mudam
+        data_original = dado.time
+
         # Atualiza campos fornecidos
         if 'data' in request.data:
-            dado.time = request.data['data']
+            try:
+                data = datetime.fromisoformat(request.data['data'])
+            except (TypeError, ValueError):
+                return Response({"data": ["Formato de data inválido"]}, status=400)
+            # Período já arquivado: o dado deixaria de aparecer nas consultas
+            limite = limite_dados_brutos()
+            if limite is not None and anterior_ao_arquivo(data, limite):
+                return Response({"erro": "Data anterior ao limite de arquivamento"}, status=400)
+            # Mesma interpretação do POST: data sem fuso usa o fuso local
+            if timezone.is_naive(data):
+                data = timezone.make_aware(data)
+            dado.time = data
         
         # Atualiza campos numéricos com conversão
-        for campo in ['temperatura', 'umidade', 'precipitacao', 'velocidade_vento']:
+        for campo in CAMPOS_NUMERICOS:
             if campo in request.data:
                 try:
                     setattr(dado, campo, float(request.data[campo]))
@@ -351,13 +418,13 @@ class DadoClimaticoDetailView(APIView):
         
         # Atualiza direção do vento se fornecida
         if 'direcao_vento' in request.data:
-            try:
-                direcao = DirecaoVento.objects.get(nome__iexact=request.data['direcao_vento'].upper())
-                dado.direcao_vento = direcao
-            except DirecaoVento.DoesNotExist:
+            direcao = obter_direcao(request.data['direcao_vento'])
+            if direcao is None:
                 return Response({"erro": "Direção do vento inválida"}, status=400)
+            dado.direcao_vento_id = direcao
 
         dado.save()
+        apos_alterar(dado, [data_original, dado.time], 'alteracao')
         return Response(DadoClimaticoSerializer(dado).data)
 
     @extend_schema(
@@ -370,15 +437,23 @@ class DadoClimaticoDetailView(APIView):
         dado = self.get_object(id)
         if not dado:
             return Response(status=404)
+        # delete() zera o id; o evento de remoção precisa dele
+        dado_id = dado.id
         dado.delete()
+        dado.id = dado_id
+        apos_alterar(dado, [dado.time], 'remocao')
         return Response(status=204)
 
 
 class DadoClimaticoDispositivoView(APIView):
     @extend_schema(
-        parameters=[OpenApiParameter(name='identificador', type=str, location=OpenApiParameter.PATH, description="ID numérico ou token UUID do dispositivo")],
+        parameters=[
+            OpenApiParameter(name='identificador', type=str, location=OpenApiParameter.PATH, description="ID numérico ou token UUID do dispositivo"),
+            *PARAMETROS_LISTAGEM
+        ],
         responses={
-            200: DadoClimaticoSerializer(many=True),
+            200: serializers.DictField,
+            400: serializers.DictField,
             404: OpenApiExample("Erro", value={"erro": "Dispositivo não encontrado"})
         },
         examples=[
@@ -391,11 +466,58 @@ class DadoClimaticoDispositivoView(APIView):
         ]
     )
     
-    # GET: Lista dados climáticos de um dispositivo
+    # GET: Lista dados climáticos de um dispositivo (paginado por cursor)
     def get(self, request, identificador):
         """Busca dados por dispositivo (ID ou token)"""
         dispositivo = get_dispositivo(identificador)
+        if isinstance(dispositivo, Response):
+            return dispositivo
         if not dispositivo:
             return Response({"erro": "Dispositivo não encontrado"}, status=404)
         dados = DadoClimatico.objects.filter(dispositivo=dispositivo)
-        return Response(DadoClimaticoSerializer(dados, many=True).data)
\ No newline at end of file
+        return responder_listagem(request, dados)
+
+
+class DadoClimaticoLoteView(APIView):
+    @extend_schema(
+        description=(
+            "Situação de um lote recebido no modo assíncrono (INGESTAO_ASSINCRONA). "
+            "Após o processamento, `erros` tem a mesma estrutura por índice da criação síncrona."
+        ),
+        parameters=[OpenApiParameter(name='lote_id', type=str, location=OpenApiParameter.PATH, description="Id do lote retornado na criação")],
+        responses={
+            200: serializers.DictField,
+            404: serializers.DictField
+        },
+        examples=[
+            OpenApiExample(
+                "Lote processado",
+                value={
+                    "lote": "3f2b9c1e8d7a4b6c9e0f1a2b3c4d5e6f",
+                    "dispositivo": 1,
+                    "situacao": "concluido",
+                    "quantidade": 2,
+                    "recebido_em": 1697380200.12,
+                    "processado_em": 1697380201.03,
+                    "criados": 1,
+                    "erros": [{"index": 1, "msg": "Direção do vento inválida: SULESTE"}]
+                },
+                response_only=True,
+                status_codes=['200']
+            ),
+            OpenApiExample(
+                "Não encontrado",
+                value={"erro": "Lote não encontrado"},
+                response_only=True,
+                status_codes=['404']
+            )
+        ]
+    )
+
+    # GET: Situação de um lote da fila de ingestão
+    def get(self, request, lote_id):
+        """Busca o lote na fila local, retorna 404 se não existir (ou já removido)"""
+        lote = fila.obter_lote(lote_id)
+        if lote is None:
+            return Response({"erro": "Lote não encontrado"}, status=404)
+        return Response(lote)
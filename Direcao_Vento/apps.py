@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DirecaoVentoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Direcao_Vento'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,67 @@
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from .models import DirecaoVento
+
+# Chave compartilhada entre workers: cada alteração na tabela grava uma nova versão
+CHAVE_VERSAO = 'direcao_vento:versao'
+
+_lock = threading.Lock()
+_direcoes = None  # NOME_EM_MAIUSCULAS -> DirecaoVento
+_versao = None
+_verificado_em = 0.0
+
+
+def _versao_global():
+    """Lê a versão compartilhada, criando uma nova se ainda não existir"""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        cache.add(CHAVE_VERSAO, uuid.uuid4().hex, timeout=None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+def versao():
+    """Versão atual da tabela de direções (muda a cada alteração), para chaves de cache"""
+    return _versao_global()
+
+
+def obter_direcoes():
+    """
+    Retorna o dicionário NOME_EM_MAIUSCULAS -> DirecaoVento mantido em memória.
+    A tabela só é consultada na primeira chamada ou quando outra alteração
+    (neste ou em outro worker) muda a versão compartilhada. A versão é
+    verificada no máximo a cada DIRECAO_VENTO_CACHE_VERIFICACAO segundos.
+    Os objetos retornados são compartilhados e não devem ser alterados.
+    """
+    global _direcoes, _versao, _verificado_em
+
+    intervalo = getattr(settings, 'DIRECAO_VENTO_CACHE_VERIFICACAO', 5)
+    agora = time.monotonic()
+    direcoes = _direcoes
+    if direcoes is not None and agora - _verificado_em < intervalo:
+        return direcoes
+
+    versao = _versao_global()
+    with _lock:
+        if _direcoes is None or versao != _versao:
+            _direcoes = {direcao.nome.upper(): direcao for direcao in DirecaoVento.objects.all()}
+            _versao = versao
+        _verificado_em = agora
+        return _direcoes
+
+
+def obter_direcao(nome):
+    """Busca uma direção pelo nome (sem diferenciar maiúsculas), retorna None se não existir"""
+    return obter_direcoes().get(str(nome).upper())
+
+
+def invalidar():
+    """Descarta o cache local e publica uma nova versão para os demais workers"""
+    global _direcoes, _versao
+    with _lock:
+        _direcoes = None
+        _versao = None
+    cache.set(CHAVE_VERSAO, uuid.uuid4().hex, timeout=None)
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import DirecaoVento
+from . import cache
+
+
+# Invalida o cache de direções sempre que a tabela for alterada.
+# Aguarda o commit para que outros workers não recarreguem dados antigos.
+@receiver(post_save, sender=DirecaoVento)
+@receiver(post_delete, sender=DirecaoVento)
+def invalidar_cache_direcoes(sender, **kwargs):
+    transaction.on_commit(cache.invalidar)
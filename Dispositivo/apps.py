@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DispositivoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Dispositivo'
+
+    def ready(self):
+        from . import signals  # noqa: F401
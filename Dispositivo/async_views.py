@@ -0,0 +1,72 @@
+# Versões assíncronas (ASGI) das buscas por proximidade, com o ORM assíncrono
+# do Django. Mesmo formato de resposta das views DRF síncronas.
+from asgiref.sync import sync_to_async
+from utils import resposta_json, somente_get
+from . import indice_espacial
+from .queryviews import (
+    corpo_mais_proximo,
+    corpo_mais_proximos,
+    corpo_raio,
+    dispositivos_mais_proximos,
+    dispositivos_no_raio,
+    dispositivos_por_distancia,
+    ler_coordenadas,
+    ler_parametros_knn,
+)
+
+
+@somente_get
+async def mais_proximo_view(request):
+    """Mesmo que DispositivoMaisProximoView"""
+    coordenadas = ler_coordenadas(request.GET, 'latitude', 'longitude')
+    if coordenadas is None:
+        return resposta_json({
+            'status': 400,
+            'msg': 'Parâmetros "latitude" e "longitude" são obrigatórios e devem ser válidos.'
+        }, 400)
+    latitude, longitude = coordenadas
+
+    if indice_espacial.habilitado():
+        # Em thread: a primeira busca (ou após alteração) reconstrói o índice a partir do banco
+        estacao = await sync_to_async(indice_espacial.indice.mais_proximo)(latitude, longitude)
+    else:
+        estacao = await dispositivos_por_distancia(latitude, longitude).afirst()
+    return resposta_json(corpo_mais_proximo(estacao))
+
+
+@somente_get
+async def proximos_raio_view(request):
+    """Mesmo que DispositivosProximosRaioView"""
+    coordenadas = ler_coordenadas(request.GET, 'latitude', 'longitude', 'raio')
+    if coordenadas is None:
+        return resposta_json({
+            'status': 400,
+            'msg': 'Parâmetros "latitude", "longitude" e "raio" são obrigatórios e devem ser válidos.'
+        }, 400)
+    latitude, longitude, raio_km = coordenadas
+
+    if indice_espacial.habilitado():
+        dispositivos = await sync_to_async(indice_espacial.indice.raio)(latitude, longitude, raio_km)
+    else:
+        dispositivos = [dispositivo async for dispositivo in dispositivos_no_raio(latitude, longitude, raio_km)]
+    return resposta_json(corpo_raio(dispositivos, raio_km))
+
+
+@somente_get
+async def mais_proximos_view(request):
+    """Mesmo que DispositivosMaisProximosView"""
+    coordenadas = ler_coordenadas(request.GET, 'latitude', 'longitude')
+    if coordenadas is None:
+        return resposta_json({
+            'status': 400,
+            'msg': 'Parâmetros "latitude" e "longitude" são obrigatórios e devem ser válidos.'
+        }, 400)
+    latitude, longitude = coordenadas
+
+    k, distancia_maxima, recentes, erro = ler_parametros_knn(request.GET)
+    if erro:
+        return resposta_json({'status': 400, 'msg': erro}, 400)
+
+    consulta = dispositivos_mais_proximos(latitude, longitude, k, distancia_maxima, recentes)
+    dispositivos = [dispositivo async for dispositivo in consulta]
+    return resposta_json(corpo_mais_proximos(dispositivos))
@@ -0,0 +1,166 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from .models import Dispositivo
+
+# Marca de "dispositivo inexistente" (cache negativo)
+_AUSENTE = object()
+
+# Chave compartilhada entre workers: cada alteração de dispositivo grava uma nova
+# versão e os demais workers descartam o cache local ao perceber a mudança
+CHAVE_VERSAO = 'dispositivo:versao'
+
+
+def _versao_global():
+    """Lê a versão compartilhada, criando uma nova se ainda não existir"""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        cache.add(CHAVE_VERSAO, uuid.uuid4().hex, timeout=None)
+        versao = cache.get(CHAVE_VERSAO)
+    return versao
+
+
+class CacheDispositivos:
+    """
+    Cache LRU com expiração (TTL) de dispositivos por id e por token.
+    Guarda os valores das colunas e devolve uma nova instância a cada acerto,
+    para que as views possam alterar o objeto sem afetar o cache.
+    Tokens/ids inexistentes também são guardados (com TTL próprio) para que
+    uma estação mal configurada não gere uma consulta por requisição.
+    """
+
+    def __init__(self, tamanho_maximo, ttl, ttl_negativo, verificacao):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self.ttl_negativo = ttl_negativo
+        self.verificacao = verificacao
+        self._itens = OrderedDict()  # chave -> (expira_em, valores ou _AUSENTE)
+        self._lock = threading.Lock()
+        self._versao = None
+        self._verificado_em = 0.0
+        self._campos = [campo.attname for campo in Dispositivo._meta.concrete_fields]
+        self.acertos = 0
+        self.acertos_negativos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def _instanciar(self, valores):
+        valores = list(valores)
+        indice = self._campos.index('localizacao')
+        if valores[indice] is not None:
+            valores[indice] = valores[indice].clone()
+        return Dispositivo.from_db(DEFAULT_DB_ALIAS, self._campos, valores)
+
+    def _guardar(self, chave, valor, ttl):
+        self._itens[chave] = (time.monotonic() + ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.tamanho_maximo:
+            self._itens.popitem(last=False)
+
+    def _verificar_versao(self):
+        """Descarta o cache local se outro worker alterou algum dispositivo"""
+        agora = time.monotonic()
+        if agora - self._verificado_em < self.verificacao:
+            return
+        versao = _versao_global()
+        with self._lock:
+            if versao != self._versao:
+                self._itens.clear()
+                self._versao = versao
+            self._verificado_em = agora
+
+    def obter(self, chave, **filtro):
+        """Busca no cache pela chave; em caso de falha consulta o banco com o filtro"""
+        self._verificar_versao()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] > time.monotonic():
+                self._itens.move_to_end(chave)
+                if item[1] is _AUSENTE:
+                    self.acertos_negativos += 1
+                    return None
+                self.acertos += 1
+                return self._instanciar(item[1])
+            self.falhas += 1
+
+        try:
+            dispositivo = Dispositivo.objects.get(**filtro)
+        except Dispositivo.DoesNotExist:
+            with self._lock:
+                self._guardar(chave, _AUSENTE, self.ttl_negativo)
+            return None
+
+        valores = tuple(getattr(dispositivo, campo) for campo in self._campos)
+        with self._lock:
+            self._guardar(('id', dispositivo.id), valores, self.ttl)
+            self._guardar(('token', str(dispositivo.token)), valores, self.ttl)
+        return self._instanciar(valores)
+
+    def remover(self, dispositivo):
+        """
+        Remove as entradas (positivas ou negativas) de um dispositivo e avisa os
+        demais workers. As positivas são localizadas também pelo id guardado, o
+        que remove a entrada do token anterior quando o token foi alterado.
+        """
+        indice_id = self._campos.index('id')
+        with self._lock:
+            chaves = {('id', dispositivo.id), ('token', str(dispositivo.token))}
+            chaves.update(
+                chave for chave, (_, valores) in self._itens.items()
+                if valores is not _AUSENTE and valores[indice_id] == dispositivo.id
+            )
+            for chave in chaves:
+                if self._itens.pop(chave, None) is not None:
+                    self.remocoes += 1
+        versao = uuid.uuid4().hex
+        cache.set(CHAVE_VERSAO, versao, timeout=None)
+        with self._lock:
+            # Este worker já removeu as entradas: não precisa descartar o restante
+            self._versao = versao
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.acertos_negativos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'tamanho_maximo': self.tamanho_maximo,
+                'acertos': self.acertos,
+                'acertos_negativos': self.acertos_negativos,
+                'falhas': self.falhas,
+                'remocoes': self.remocoes,
+                'taxa_acerto': round((self.acertos + self.acertos_negativos) / consultas, 4) if consultas else None,
+            }
+
+
+cache_dispositivos = CacheDispositivos(
+    tamanho_maximo=getattr(settings, 'DISPOSITIVO_CACHE_TAMANHO', 10000),
+    ttl=getattr(settings, 'DISPOSITIVO_CACHE_TTL', 60),
+    ttl_negativo=getattr(settings, 'DISPOSITIVO_CACHE_TTL_NEGATIVO', 30),
+    verificacao=getattr(settings, 'DISPOSITIVO_CACHE_VERIFICACAO', 5),
+)
+
+
+def buscar_por_id(id):
+    """Retorna o dispositivo pelo ID numérico ou None se não existir"""
+    try:
+        id = int(id)
+    except (TypeError, ValueError):
+        return None
+    return cache_dispositivos.obter(('id', id), id=id)
+
+
+def buscar_por_token(token):
+    """Retorna o dispositivo pelo token UUID ou None se não existir/for inválido"""
+    try:
+        token = str(uuid.UUID(str(token)))
+    except ValueError:
+        return None
+    return cache_dispositivos.obter(('token', token), token=token)
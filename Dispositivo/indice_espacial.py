@@ -0,0 +1,217 @@
+import threading
+import time
+import uuid
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import Distance as D
+from django.core.cache import cache
+from .models import Dispositivo
+
+RAIO_TERRA_KM = 6371.0088
+
+# Chave, no cache compartilhado, da versão dos dispositivos: alterada a cada
+# criação/edição/exclusão para que os outros processos reconstruam o índice
+CHAVE_VERSAO = 'indice_espacial:versao'
+
+
+def habilitado():
+    return getattr(settings, 'INDICE_ESPACIAL_HABILITADO', False)
+
+
+def vetores_unitarios(latitudes, longitudes):
+    """Coordenadas em graus -> vetores 3D na esfera unitária"""
+    lat = np.radians(latitudes)
+    lon = np.radians(longitudes)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def corda_para_km(corda):
+    """Distância em linha reta entre vetores unitários -> distância sobre a esfera (km)"""
+    return 2 * RAIO_TERRA_KM * np.arcsin(np.minimum(corda / 2, 1.0))
+
+
+def km_para_corda(km):
+    return 2 * np.sin(min(km / RAIO_TERRA_KM, np.pi) / 2)
+
+
+class Snapshot:
+    """
+    Índice imutável: os vetores dos dispositivos são agrupados numa grade 3D
+    uniforme (células de INDICE_ESPACIAL_CELULA_KM) e ordenados pela célula,
+    de modo que cada célula ocupa uma faixa contígua dos arrays.
+    """
+
+    def __init__(self, ids, latitudes, longitudes, tokens, descricoes, celula_km):
+        self.celula = km_para_corda(celula_km)
+        self.divisoes = int(np.ceil(2 / self.celula)) + 1
+
+        vetores = vetores_unitarios(latitudes, longitudes)
+        chaves = self._chaves(self._celulas(vetores))
+        ordem = np.argsort(chaves, kind='stable')
+
+        self.ids = np.asarray(ids, dtype=np.int64)[ordem]
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)[ordem]
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)[ordem]
+        self.vetores = vetores[ordem]
+        self.tokens = [tokens[i] for i in ordem]
+        self.descricoes = [descricoes[i] for i in ordem]
+        self.chaves, self.inicios, self.contagens = np.unique(chaves[ordem], return_index=True, return_counts=True)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _celulas(self, vetores):
+        return np.floor((vetores + 1) / self.celula).astype(np.int64)
+
+    def _chaves(self, celulas):
+        n = self.divisoes
+        return (celulas[..., 0] * n + celulas[..., 1]) * n + celulas[..., 2]
+
+    def _candidatos(self, vetor, corda):
+        """Posições dos dispositivos nas células do cubo de meia-aresta `corda` em torno do vetor"""
+        minimo = np.clip(self._celulas(vetor - corda), 0, self.divisoes - 1)
+        maximo = np.clip(self._celulas(vetor + corda), 0, self.divisoes - 1)
+        faixas = [np.arange(minimo[eixo], maximo[eixo] + 1) for eixo in range(3)]
+        if np.prod([len(faixa) for faixa in faixas]) >= len(self.chaves):
+            return np.arange(len(self))
+        grade = np.stack(np.meshgrid(*faixas, indexing='ij'), axis=-1).reshape(-1, 3)
+        chaves = self._chaves(grade)
+        posicoes = np.searchsorted(self.chaves, chaves)
+        validas = posicoes < len(self.chaves)
+        posicoes = posicoes[validas]
+        posicoes = posicoes[self.chaves[posicoes] == chaves[validas]]
+        if not len(posicoes):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([
+            np.arange(inicio, inicio + contagem)
+            for inicio, contagem in zip(self.inicios[posicoes], self.contagens[posicoes])
+        ])
+
+    def raio(self, latitude, longitude, raio_km):
+        """(posições, distâncias em km) dos dispositivos no raio, do mais próximo ao mais distante"""
+        vetor = vetores_unitarios(latitude, longitude)[0]
+        corda = km_para_corda(raio_km)
+        candidatos = self._candidatos(vetor, corda)
+        cordas = np.linalg.norm(self.vetores[candidatos] - vetor, axis=1)
+        dentro = cordas <= corda
+        candidatos, cordas = candidatos[dentro], cordas[dentro]
+        ordem = np.argsort(cordas, kind='stable')
+        return candidatos[ordem], corda_para_km(cordas[ordem])
+
+    def mais_proximos(self, latitude, longitude, k):
+        """(posições, distâncias em km) dos k dispositivos mais próximos"""
+        if not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        k = min(k, len(self))
+        vetor = vetores_unitarios(latitude, longitude)[0]
+        corda = self.celula
+        while True:
+            candidatos = self._candidatos(vetor, corda)
+            if len(candidatos) >= k:
+                cordas = np.linalg.norm(self.vetores[candidatos] - vetor, axis=1)
+                selecao = np.argpartition(cordas, k - 1)[:k] if k < len(cordas) else np.arange(len(cordas))
+                # Completo se a esfera até o k-ésimo cabe no cubo pesquisado
+                if cordas[selecao].max() <= corda or len(candidatos) == len(self):
+                    ordem = selecao[np.argsort(cordas[selecao], kind='stable')]
+                    return candidatos[ordem], corda_para_km(cordas[ordem])
+                corda = cordas[selecao].max()
+            else:
+                corda *= 2
+
+    def dispositivo(self, posicao, distancia_km):
+        """Instância (sem consulta ao banco) com a distância anotada, como nas consultas PostGIS"""
+        dispositivo = Dispositivo(
+            id=int(self.ids[posicao]),
+            token=self.tokens[posicao],
+            descricao=self.descricoes[posicao],
+            localizacao=Point(float(self.longitudes[posicao]), float(self.latitudes[posicao]), srid=4326),
+        )
+        dispositivo.distancia = D(km=float(distancia_km))
+        return dispositivo
+
+
+def construir(dispositivos=None):
+    """Monta um Snapshot a partir dos dispositivos do banco (ou das tuplas (id, lat, lon, token, descricao))"""
+    if dispositivos is None:
+        dispositivos = [
+            (id, localizacao.y, localizacao.x, token, descricao)
+            for id, localizacao, token, descricao in Dispositivo.objects.filter(
+                localizacao__isnull=False
+            ).values_list('id', 'localizacao', 'token', 'descricao').iterator(chunk_size=10000)
+        ]
+    ids, latitudes, longitudes, tokens, descricoes = zip(*dispositivos) if dispositivos else ([], [], [], [], [])
+    return Snapshot(
+        ids, latitudes, longitudes, list(tokens), list(descricoes),
+        getattr(settings, 'INDICE_ESPACIAL_CELULA_KM', 50),
+    )
+
+
+class IndiceEspacial:
+    """
+    Índice dos dispositivos em memória, por processo. É construído na primeira
+    consulta e reconstruído quando este processo altera um dispositivo (sinais)
+    ou quando a versão no cache compartilhado muda (alteração feita por outro processo).
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._versao = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+        self.reconstrucoes = 0
+
+    def _versao_atual(self):
+        versao = cache.get(CHAVE_VERSAO)
+        if versao is None:
+            versao = uuid.uuid4().hex
+            cache.add(CHAVE_VERSAO, versao, None)
+            versao = cache.get(CHAVE_VERSAO, versao)
+        return versao
+
+    def obter(self):
+        agora = time.monotonic()
+        intervalo = getattr(settings, 'INDICE_ESPACIAL_VERIFICACAO', 5)
+        snapshot = self._snapshot
+        if snapshot is not None and agora - self._verificado_em < intervalo:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and agora - self._verificado_em < intervalo:
+                return self._snapshot
+            versao = self._versao_atual()
+            if self._snapshot is None or versao != self._versao:
+                self._snapshot = construir()
+                self._versao = versao
+                self.reconstrucoes += 1
+            self._verificado_em = agora
+            return self._snapshot
+
+    def invalidar(self):
+        """Força a reconstrução na próxima consulta, neste e nos demais processos"""
+        cache.set(CHAVE_VERSAO, uuid.uuid4().hex, None)
+        with self._lock:
+            self._snapshot = None
+
+    def raio(self, latitude, longitude, raio_km):
+        snapshot = self.obter()
+        posicoes, distancias = snapshot.raio(latitude, longitude, raio_km)
+        return [snapshot.dispositivo(p, d) for p, d in zip(posicoes, distancias)]
+
+    def mais_proximo(self, latitude, longitude):
+        snapshot = self.obter()
+        posicoes, distancias = snapshot.mais_proximos(latitude, longitude, 1)
+        return snapshot.dispositivo(posicoes[0], distancias[0]) if len(posicoes) else None
+
+    def estatisticas(self):
+        snapshot = self._snapshot
+        return {
+            'habilitado': habilitado(),
+            'dispositivos': len(snapshot) if snapshot is not None else None,
+            'celulas': len(snapshot.chaves) if snapshot is not None else None,
+            'reconstrucoes': self.reconstrucoes,
+        }
+
+
+indice = IndiceEspacial()
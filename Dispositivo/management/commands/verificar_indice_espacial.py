@@ -0,0 +1,101 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from Dispositivo.indice_espacial import construir
+from Dispositivo.queryviews import dispositivos_no_raio, dispositivos_por_distancia
+
+# Diferença relativa aceita entre a distância na esfera (índice) e no elipsoide (PostGIS)
+TOLERANCIA = 0.005
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara as buscas do índice espacial em memória com as consultas PostGIS '
+        '(mais próximos e raio) e mede o tempo das buscas com estações sintéticas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pontos', type=int, default=100, help='Pontos aleatórios comparados com o PostGIS')
+        parser.add_argument('--k', type=int, default=5, help='Quantidade de vizinhos comparados')
+        parser.add_argument('--raio', type=float, default=50, help='Raio da busca, em km')
+        parser.add_argument(
+            '--sinteticos',
+            type=int,
+            default=100000,
+            help='Estações sintéticas do benchmark (0 para pular)'
+        )
+        parser.add_argument('--consultas', type=int, default=1000, help='Consultas por tipo no benchmark')
+
+    def handle(self, *args, **options):
+        self.comparar(options['pontos'], options['k'], options['raio'])
+        if options['sinteticos']:
+            self.benchmark(options['sinteticos'], options['consultas'], options['k'], options['raio'])
+
+    def comparar(self, pontos, k, raio_km):
+        snapshot = construir()
+        if not len(snapshot):
+            self.stdout.write('Nenhum dispositivo com localização: comparação com o PostGIS ignorada.')
+            return
+
+        # Pontos perto das estações existentes, onde as buscas realmente acontecem
+        rng = np.random.default_rng()
+        escolhidos = rng.integers(0, len(snapshot), pontos)
+        latitudes = np.clip(snapshot.latitudes[escolhidos] + rng.normal(0, 0.5, pontos), -90, 90)
+        longitudes = (snapshot.longitudes[escolhidos] + rng.normal(0, 0.5, pontos) + 180) % 360 - 180
+
+        divergencias = 0
+        for latitude, longitude in zip(latitudes, longitudes):
+            latitude, longitude = float(latitude), float(longitude)
+
+            posicoes, distancias = snapshot.mais_proximos(latitude, longitude, k)
+            postgis = dispositivos_por_distancia(latitude, longitude).filter(localizacao__isnull=False)[:k]
+            esperadas = np.array([dispositivo.distancia.km for dispositivo in postgis])
+            # Empates próximos podem trocar de ordem: compara as distâncias, não os ids
+            if len(esperadas) != len(distancias) or not np.allclose(distancias, esperadas, rtol=TOLERANCIA, atol=0.01):
+                divergencias += 1
+                self.stdout.write(f'  mais próximos divergem em ({latitude:.5f}, {longitude:.5f})')
+
+            posicoes, distancias = snapshot.raio(latitude, longitude, raio_km)
+            memoria = dict(zip(snapshot.ids[posicoes].tolist(), distancias.tolist()))
+            banco = {
+                dispositivo.id: dispositivo.distancia.km
+                for dispositivo in dispositivos_no_raio(latitude, longitude, raio_km)
+            }
+            # Estações na borda do raio podem ficar de fora em um dos dois cálculos
+            so_em_um = [
+                distancia for id, distancia in [*memoria.items(), *banco.items()]
+                if (id in memoria) != (id in banco)
+            ]
+            if any(abs(distancia - raio_km) > raio_km * TOLERANCIA for distancia in so_em_um):
+                divergencias += 1
+                self.stdout.write(f'  raio diverge em ({latitude:.5f}, {longitude:.5f})')
+
+        if divergencias:
+            raise CommandError(f'{divergencias} de {pontos} pontos divergem do PostGIS.')
+        self.stdout.write(self.style.SUCCESS(f'{pontos} pontos: índice em memória igual ao PostGIS.'))
+
+    def benchmark(self, quantidade, consultas, k, raio_km):
+        rng = np.random.default_rng(0)
+        # Distribuição uniforme na esfera
+        latitudes = np.degrees(np.arcsin(rng.uniform(-1, 1, quantidade)))
+        longitudes = rng.uniform(-180, 180, quantidade)
+        dispositivos = list(zip(range(quantidade), latitudes, longitudes, [None] * quantidade, [None] * quantidade))
+
+        inicio = time.perf_counter()
+        snapshot = construir(dispositivos)
+        self.stdout.write(f'{quantidade} estações sintéticas: índice construído em {time.perf_counter() - inicio:.3f}s')
+
+        pontos = list(zip(
+            np.degrees(np.arcsin(rng.uniform(-1, 1, consultas))).tolist(),
+            rng.uniform(-180, 180, consultas).tolist(),
+        ))
+        for nome, busca in (
+            ('mais próximo', lambda latitude, longitude: snapshot.mais_proximos(latitude, longitude, 1)),
+            (f'{k} mais próximos', lambda latitude, longitude: snapshot.mais_proximos(latitude, longitude, k)),
+            (f'raio de {raio_km} km', lambda latitude, longitude: snapshot.raio(latitude, longitude, raio_km)),
+        ):
+            inicio = time.perf_counter()
+            for latitude, longitude in pontos:
+                busca(latitude, longitude)
+            media = (time.perf_counter() - inicio) / consultas * 1000
+            self.stdout.write(f'  {nome}: {media:.3f} ms por consulta')
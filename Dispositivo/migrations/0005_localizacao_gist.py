@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# O PointField já cria um índice GiST ao ser adicionado (spatial_index=True), mas
+# com o nome da tabela antiga. Só cria um novo se nenhum índice GiST cobrir a coluna.
+CRIAR_INDICE = """
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_am am ON am.oid = c.relam
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = 'dispositivo'::regclass
+          AND a.attname = 'localizacao'
+          AND am.amname = 'gist'
+    ) THEN
+        CREATE INDEX dispositivo_localizacao_gist ON dispositivo USING GIST (localizacao);
+    END IF;
+END
+$$;
+"""
+
+REMOVER_INDICE = "DROP INDEX IF EXISTS dispositivo_localizacao_gist;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispositivo', '0004_alter_dispositivo_table'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CRIAR_INDICE, REMOVER_INDICE),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+# Índice de expressão para os filtros em geometry (tiles do mapa: localizacao::geometry && envelope).
+# O índice GiST da coluna geography não é usado quando a coluna é convertida para geometry.
+CRIAR_INDICE = (
+    "CREATE INDEX IF NOT EXISTS dispositivo_localizacao_geometria_gist "
+    "ON dispositivo USING GIST ((localizacao::geometry));"
+)
+
+REMOVER_INDICE = "DROP INDEX IF EXISTS dispositivo_localizacao_geometria_gist;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Dispositivo', '0005_localizacao_gist'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CRIAR_INDICE, REMOVER_INDICE),
+    ]
@@ -1,13 +1,169 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Value
+from django.http import HttpResponse
+from django.utils import timezone
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.db.models.functions import Distance, GeometryDistance
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from Dispositivo.models import Dispositivo
+from Dispositivo import indice_espacial, tiles
 from Dispositivo.serializer import DispositivoSerializer, DispositivoSimplesSerializer
 from django.contrib.gis.measure import Distance as D
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes, OpenApiExample, inline_serializer
 from rest_framework import serializers
+from rest_framework.negotiation import BaseContentNegotiation
+from Dados_Climaticos.serializer import UltimoDadoSerializer
+
+
+def ler_coordenadas(parametros, *nomes):
+    """Lê os parâmetros numéricos pedidos; retorna None se algum faltar ou for inválido"""
+    try:
+        return [float(parametros.get(nome)) for nome in nomes]
+    except (TypeError, ValueError):
+        return None
+
+
+def dispositivos_no_raio(latitude, longitude, raio_km):
+    """
+    Dispositivos dentro do raio, com a distância anotada, do mais próximo ao mais distante.
+    ST_DWithin usa o índice GiST de localizacao; a distância só é calculada para
+    os dispositivos que passaram no filtro, na mesma consulta.
+    """
+    ponto_referencia = Point(longitude, latitude, srid=4326)
+    return Dispositivo.objects.filter(
+        localizacao__dwithin=(ponto_referencia, D(km=raio_km))
+    ).annotate(
+        distancia=Distance('localizacao', ponto_referencia)
+    ).order_by('distancia')
+
+
+def corpo_raio(dispositivos, raio_km):
+    """Resposta da busca por raio a partir da lista de dispositivos já consultada"""
+    if not dispositivos:
+        return {
+            'status': 200,
+            'msg': f'Nenhum dispositivo encontrado num raio de {raio_km} km.',
+            'dispositivos': []
+        }
+
+    # Serializa os dispositivos e adiciona a distância individual (em km) ao resultado
+    dispositivos_data = []
+    for dispositivo in dispositivos:
+        dispositivo_serializado = DispositivoSerializer(dispositivo).data
+        dispositivo_serializado['distancia_km'] = round(dispositivo.distancia.km, 3)
+        dispositivos_data.append(dispositivo_serializado)
+
+    return {
+        'status': 200,
+        'msg': f'Dispositivos encontrados num raio de {raio_km} km.',
+        'dispositivos': dispositivos_data
+    }
+
+
+def ordem_knn(ponto_referencia):
+    """
+    Ordenação pelo operador KNN (<->) entre geographies: com LIMIT, o PostgreSQL
+    percorre o índice GiST de localizacao em ordem de distância, sem ordenar a tabela.
+    """
+    return GeometryDistance('localizacao', Value(ponto_referencia, output_field=PointField(srid=4326, geography=True)))
+
+
+def dispositivos_por_distancia(latitude, longitude):
+    """Todos os dispositivos ordenados pela distância até o ponto (use com fatiamento)"""
+    ponto_referencia = Point(longitude, latitude, srid=4326)
+    return Dispositivo.objects.annotate(
+        distancia=Distance('localizacao', ponto_referencia)
+    ).order_by(ordem_knn(ponto_referencia))
+
+
+def dispositivos_mais_proximos(latitude, longitude, k, distancia_maxima_km=None, recentes_minutos=None):
+    """
+    Os k dispositivos mais próximos, com o último dado de cada um na mesma consulta.
+    Opcionalmente limitados a uma distância máxima (ST_DWithin) e aos que enviaram
+    dados nos últimos recentes_minutos.
+    """
+    ponto_referencia = Point(longitude, latitude, srid=4326)
+    dispositivos = Dispositivo.objects.select_related('ultimo_dado__direcao_vento')
+    if distancia_maxima_km is not None:
+        dispositivos = dispositivos.filter(localizacao__dwithin=(ponto_referencia, D(km=distancia_maxima_km)))
+    if recentes_minutos is not None:
+        dispositivos = dispositivos.filter(ultimo_dado__time__gte=timezone.now() - timedelta(minutes=recentes_minutos))
+    return dispositivos.annotate(
+        distancia=Distance('localizacao', ponto_referencia)
+    ).order_by(ordem_knn(ponto_referencia))[:k]
+
+
+def ler_parametros_knn(parametros):
+    """Valida k, distancia_maxima e recentes; retorna (k, distancia_maxima_km, recentes_minutos, erro)"""
+    maximo = getattr(settings, 'DISPOSITIVOS_KNN_MAXIMO', 50)
+    try:
+        k = int(parametros.get('k', 5))
+        distancia_maxima = parametros.get('distancia_maxima')
+        distancia_maxima = float(distancia_maxima) if distancia_maxima not in (None, '') else None
+        recentes = parametros.get('recentes')
+        recentes = int(recentes) if recentes not in (None, '') else None
+    except ValueError:
+        return None, None, None, 'Parâmetros "k", "distancia_maxima" e "recentes" devem ser numéricos.'
+    if not 1 <= k <= maximo:
+        return None, None, None, f'Parâmetro "k" deve estar entre 1 e {maximo}.'
+    if (distancia_maxima is not None and distancia_maxima <= 0) or (recentes is not None and recentes <= 0):
+        return None, None, None, 'Parâmetros "distancia_maxima" e "recentes" devem ser positivos.'
+    return k, distancia_maxima, recentes, None
+
+
+def _ultimo_dado(dispositivo):
+    try:
+        return UltimoDadoSerializer(dispositivo.ultimo_dado).data
+    except ObjectDoesNotExist:
+        return None
+
+
+def corpo_mais_proximos(dispositivos):
+    """Resposta da busca pelos k mais próximos a partir da lista já consultada"""
+    if not dispositivos:
+        return {
+            'status': 200,
+            'msg': 'Nenhuma estação encontrada.',
+            'estacoes': []
+        }
+
+    estacoes = []
+    for dispositivo, serializado in zip(dispositivos, DispositivoSimplesSerializer(dispositivos, many=True).data):
+        estacoes.append({
+            'estacao': serializado,
+            'distancia_km': round(dispositivo.distancia.km, 3),
+            'ultimo_dado': _ultimo_dado(dispositivo),
+        })
+    return {
+        'status': 200,
+        'msg': f'{len(estacoes)} estações mais próximas encontradas.',
+        'estacoes': estacoes
+    }
+
+
+def corpo_mais_proximo(estacao):
+    """Resposta da busca pela estação mais próxima (estacao pode ser None)"""
+    if estacao:
+        serializer = DispositivoSimplesSerializer(instance=estacao)
+        distancia_km = estacao.distancia.km
+        return {
+            'status': 200,
+            'msg': 'Estação mais próxima encontrada.',
+            'estacao': serializer.data,
+            'distancia_km': round(distancia_km, 3)
+        }
+    return {
+        'status': 200,
+        'msg': 'Nenhuma estação encontrada.',
+        'estacao': None,
+        'distancia_km': None
+    }
+
 
 @extend_schema(
     description=(
@@ -97,46 +253,20 @@ from rest_framework import serializers
 class DispositivosProximosRaioView(APIView):
     def get(self, request):
         # Captura e valida os parâmetros de latitude, longitude e raio
-        try:
-            latitude = float(request.GET.get('latitude'))
-            longitude = float(request.GET.get('longitude'))
-            raio_km = float(request.GET.get('raio'))
-        except (TypeError, ValueError):
+        coordenadas = ler_coordenadas(request.GET, 'latitude', 'longitude', 'raio')
+        if coordenadas is None:
             return Response({
                 'status': 400,
                 'msg': 'Parâmetros "latitude", "longitude" e "raio" são obrigatórios e devem ser válidos.'
             }, status=400)
+        latitude, longitude, raio_km = coordenadas
 
-        # Cria o ponto de referência geográfica
-        ponto_referencia = Point(longitude, latitude, srid=4326)
-
-        # Filtra os dispositivos dentro do raio especificado e anota a distância até o ponto
-        dispositivos = Dispositivo.objects.annotate(
-            distancia=Distance('localizacao', ponto_referencia)
-        ).filter(
-            localizacao__distance_lte=(ponto_referencia, raio_km * 1000)  # raio em metros
-        ).order_by('distancia')
-
-        if not dispositivos.exists():
-            return Response({
-                'status': 200,
-                'msg': f'Nenhum dispositivo encontrado num raio de {raio_km} km.',
-                'dispositivos': []
-            })
-
-        # Serializa os dispositivos e adiciona a distância individual (em km) ao resultado
-        dispositivos_data = []
-        for dispositivo in dispositivos:
-            dispositivo_serializado = DispositivoSerializer(dispositivo).data
-            dispositivo_serializado['distancia_km'] = round(dispositivo.distancia.km, 3)
-            dispositivos_data.append(dispositivo_serializado)
-
-        # Retorna a resposta com status, mensagem e lista de dispositivos
-        return Response({
-            'status': 200,
-            'msg': f'Dispositivos encontrados num raio de {raio_km} km.',
-            'dispositivos': dispositivos_data
-        })
+        # Filtra os dispositivos dentro do raio (índice em memória ou uma única consulta) e monta a resposta
+        if indice_espacial.habilitado():
+            dispositivos = indice_espacial.indice.raio(latitude, longitude, raio_km)
+        else:
+            dispositivos = list(dispositivos_no_raio(latitude, longitude, raio_km))
+        return Response(corpo_raio(dispositivos, raio_km))
 
     
 @extend_schema(
@@ -205,34 +335,211 @@ class DispositivosProximosRaioView(APIView):
 )
 class DispositivoMaisProximoView(APIView):
     def get(self, request):
-        try:
-            latitude = float(request.GET.get('latitude'))
-            longitude = float(request.GET.get('longitude'))
-        except (TypeError, ValueError):
+        coordenadas = ler_coordenadas(request.GET, 'latitude', 'longitude')
+        if coordenadas is None:
+            return Response({
+                'status': 400,
+                'msg': 'Parâmetros "latitude" e "longitude" são obrigatórios e devem ser válidos.'
+            }, status=400)
+        latitude, longitude = coordenadas
+
+        if indice_espacial.habilitado():
+            estacao = indice_espacial.indice.mais_proximo(latitude, longitude)
+        else:
+            estacao = dispositivos_por_distancia(latitude, longitude).first()
+        return Response(corpo_mais_proximo(estacao))
+
+
+@extend_schema(
+    description=(
+        "Retorna as k estações mais próximas de uma coordenada geográfica, em ordem de distância, "
+        "com o último dado de cada uma. A ordenação usa o índice espacial (operador KNN do PostGIS)."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='latitude',
+            type=OpenApiTypes.FLOAT,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Latitude do ponto de referência (ex: -12.3456)'
+        ),
+        OpenApiParameter(
+            name='longitude',
+            type=OpenApiTypes.FLOAT,
+            location=OpenApiParameter.QUERY,
+            required=True,
+            description='Longitude do ponto de referência (ex: -45.6789)'
+        ),
+        OpenApiParameter(
+            name='k',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Quantidade de estações (padrão 5, máximo DISPOSITIVOS_KNN_MAXIMO)'
+        ),
+        OpenApiParameter(
+            name='distancia_maxima',
+            type=OpenApiTypes.FLOAT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Distância máxima em quilômetros (ex: 50)'
+        ),
+        OpenApiParameter(
+            name='recentes',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Só estações com dados nos últimos N minutos (ex: 30)'
+        ),
+    ],
+    responses={
+        200: OpenApiTypes.OBJECT,
+        400: OpenApiTypes.OBJECT,
+    },
+    examples=[
+        OpenApiExample(
+            name='Estações encontradas',
+            value={
+                "status": 200,
+                "msg": "1 estações mais próximas encontradas.",
+                "estacoes": [
+                    {
+                        "estacao": {
+                            "id": 2,
+                            "type": "Feature",
+                            "geometry": "SRID=4326;POINT (-8.6789 -8.303)",
+                            "properties": {
+                                "descricao": "Estação ceplac"
+                            }
+                        },
+                        "distancia_km": 253.298,
+                        "ultimo_dado": {
+                            "id": 1500,
+                            "dispositivo": 2,
+                            "data": "2025-05-10T14:30:00-03:00",
+                            "temperatura": 27.4,
+                            "umidade": 71.0,
+                            "precipitacao": 0.0,
+                            "velocidade_vento": 3.2,
+                            "direcao_vento": "Norte"
+                        }
+                    }
+                ]
+            },
+            response_only=True,
+            status_codes=["200"]
+        ),
+        OpenApiExample(
+            name='Parâmetros inválidos',
+            value={
+                "status": 400,
+                "msg": 'Parâmetro "k" deve estar entre 1 e 50.'
+            },
+            response_only=True,
+            status_codes=["400"]
+        ),
+    ]
+)
+class DispositivosMaisProximosView(APIView):
+    def get(self, request):
+        coordenadas = ler_coordenadas(request.GET, 'latitude', 'longitude')
+        if coordenadas is None:
             return Response({
                 'status': 400,
                 'msg': 'Parâmetros "latitude" e "longitude" são obrigatórios e devem ser válidos.'
             }, status=400)
+        latitude, longitude = coordenadas
+
+        k, distancia_maxima, recentes, erro = ler_parametros_knn(request.GET)
+        if erro:
+            return Response({'status': 400, 'msg': erro}, status=400)
 
-        ponto_referencia = Point(longitude, latitude, srid=4326)
+        dispositivos = list(dispositivos_mais_proximos(latitude, longitude, k, distancia_maxima, recentes))
+        return Response(corpo_mais_proximos(dispositivos))
 
-        estacao = Dispositivo.objects.annotate(
-            distancia=Distance('localizacao', ponto_referencia)
-        ).order_by('distancia').first()
 
-        if estacao:
-            serializer = DispositivoSimplesSerializer(instance=estacao)
-            distancia_km = estacao.distancia.km
+class IgnorarAccept(BaseContentNegotiation):
+    """Tiles são binários/GeoJSON: o Accept dos clientes de mapa (ex: application/x-protobuf) não é negociado"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+@extend_schema(
+    description=(
+        "Tile z/x/y (esquema XYZ, Web Mercator) com as estações para mapas: Mapbox Vector Tile (.mvt, camada "
+        "\"estacoes\") ou GeoJSON (.geojson). Com dados=true, cada estação traz o último dado (data em segundos "
+        "desde 1970, UTC). Respostas com ETag: envie If-None-Match para receber 304 se o tile não mudou."
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='dados',
+            type=OpenApiTypes.BOOL,
+            location=OpenApiParameter.QUERY,
+            required=False,
+            description='Inclui o último dado de cada estação (padrão false)'
+        ),
+    ],
+    responses={
+        (200, 'application/vnd.mapbox-vector-tile'): OpenApiTypes.BINARY,
+        (200, 'application/geo+json'): OpenApiTypes.OBJECT,
+        304: None,
+        400: OpenApiTypes.OBJECT,
+    },
+    examples=[
+        OpenApiExample(
+            name='GeoJSON',
+            value={
+                "type": "FeatureCollection",
+                "features": [
+                    {
+                        "type": "Feature",
+                        "id": 2,
+                        "geometry": {"type": "Point", "coordinates": [-38.5267, -3.7319]},
+                        "properties": {"descricao": "Estação ceplac"}
+                    }
+                ]
+            },
+            response_only=True,
+            status_codes=["200"]
+        ),
+        OpenApiExample(
+            name='Tile inválido',
+            value={
+                "status": 400,
+                "msg": 'Tile inválido: z entre 0 e 22, x e y entre 0 e 2^z - 1.'
+            },
+            response_only=True,
+            status_codes=["400"]
+        ),
+    ]
+)
+class DispositivoTilesView(APIView):
+    content_negotiation_class = IgnorarAccept
+
+    def get(self, request, z, x, y, formato):
+        zoom_maximo = getattr(settings, 'TILES_ZOOM_MAXIMO', 22)
+        if formato not in tiles.FORMATOS:
             return Response({
-                'status': 200,
-                'msg': 'Estação mais próxima encontrada.',
-                'estacao': serializer.data,
-                'distancia_km': round(distancia_km, 3)
-            })
-        else:
+                'status': 400,
+                'msg': 'Formato inválido. Use ".mvt" ou ".geojson".'
+            }, status=400)
+        if not (0 <= z <= zoom_maximo and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
             return Response({
-                'status': 200,
-                'msg': 'Nenhuma estação encontrada.',
-                'estacao': None,
-                'distancia_km': None
-            })
\ No newline at end of file
+                'status': 400,
+                'msg': f'Tile inválido: z entre 0 e {zoom_maximo}, x e y entre 0 e 2^z - 1.'
+            }, status=400)
+        com_dados = request.GET.get('dados', '').lower() in ('1', 'true', 'sim')
+
+        conteudo, etag, validade = tiles.obter_tile(z, x, y, formato, com_dados)
+
+        if etag in [valor.strip().removeprefix('W/') for valor in request.headers.get('If-None-Match', '').split(',')]:
+            resposta = HttpResponse(status=304)
+        else:
+            resposta = HttpResponse(conteudo, content_type=tiles.FORMATOS[formato])
+        resposta['ETag'] = etag
+        resposta['Cache-Control'] = f'public, max-age={validade}'
+        return resposta
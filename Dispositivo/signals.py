@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Dispositivo
+from .cache import cache_dispositivos
+from . import indice_espacial, tiles
+
+
+# Remove o dispositivo do cache ao ser criado, alterado ou excluído.
+# Remove novamente após o commit para descartar leituras concorrentes antigas.
+@receiver(post_save, sender=Dispositivo)
+@receiver(post_delete, sender=Dispositivo)
+def remover_dispositivo_cache(sender, instance, **kwargs):
+    cache_dispositivos.remover(instance)
+    transaction.on_commit(lambda: cache_dispositivos.remover(instance))
+
+
+# Localizações mudaram: o índice espacial em memória é reconstruído na próxima busca
+@receiver(post_save, sender=Dispositivo)
+@receiver(post_delete, sender=Dispositivo)
+def invalidar_indice_espacial(sender, instance, **kwargs):
+    if indice_espacial.habilitado():
+        transaction.on_commit(indice_espacial.indice.invalidar)
+
+
+# Tiles do mapa com localizações antigas deixam de ser usados (nova versão na chave)
+@receiver(post_save, sender=Dispositivo)
+@receiver(post_delete, sender=Dispositivo)
+def invalidar_tiles(sender, instance, **kwargs):
+    transaction.on_commit(tiles.invalidar)
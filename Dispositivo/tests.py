@@ -1,3 +1,105 @@
-from django.test import TestCase
+import uuid
+from django.contrib.gis.geos import Point
+from django.test import TestCase, override_settings
+from .cache import buscar_por_id, buscar_por_token, cache_dispositivos
+from .indice_espacial import construir
+from .models import Dispositivo
+from .queryviews import dispositivos_no_raio, dispositivos_por_distancia
 
-# Create your tests here.
+
+class CacheDispositivosTest(TestCase):
+    """Alterar ou excluir um dispositivo remove todas as entradas dele do cache"""
+
+    def setUp(self):
+        cache_dispositivos.limpar()
+        self.dispositivo = Dispositivo.objects.create(descricao='Estação')
+
+    def test_token_alterado_deixa_de_autenticar(self):
+        token_anterior = str(self.dispositivo.token)
+        self.assertEqual(buscar_por_token(token_anterior).id, self.dispositivo.id)
+
+        self.dispositivo.token = uuid.uuid4()
+        self.dispositivo.save()
+
+        self.assertIsNone(buscar_por_token(token_anterior))
+        self.assertEqual(buscar_por_token(self.dispositivo.token).id, self.dispositivo.id)
+
+    def test_exclusao(self):
+        self.assertIsNotNone(buscar_por_id(self.dispositivo.id))
+        id = self.dispositivo.id
+        self.dispositivo.delete()
+        self.assertIsNone(buscar_por_id(id))
+
+
+
+class IndiceEspacialTest(TestCase):
+    """O índice em memória retorna os mesmos dispositivos, na mesma ordem, que as consultas PostGIS"""
+
+    # (latitude, longitude): antimeridiano, polos e estações próximas entre si
+    LOCALIZACOES = [
+        (0.0, 179.9), (0.0, -179.9), (0.0, 179.0), (0.0, -178.5),
+        (89.9, 0.0), (89.8, 180.0), (89.5, 90.0),
+        (-89.9, 45.0), (-89.0, -120.0),
+        (-5.79, -35.21), (-8.05, -34.88), (-3.73, -38.52), (-7.12, -34.86),
+    ]
+    # (latitude, longitude, raio em km); nenhum dispositivo a menos de 10% da borda do raio
+    CONSULTAS = [
+        (0.0, 179.95, 120), (0.0, -179.95, 140), (0.0, 179.98, 10),
+        (90.0, 0.0, 50), (-90.0, 0.0, 100),
+        (-5.8, -35.2, 300), (40.0, 10.0, 500),
+    ]
+    # O índice usa a esfera; a distância do PostGIS, o elipsoide (diferença de até ~0,6%)
+    TOLERANCIA = 0.007
+
+    @classmethod
+    def setUpTestData(cls):
+        Dispositivo.objects.bulk_create(
+            Dispositivo(descricao=f'Estação {i}', localizacao=Point(longitude, latitude, srid=4326))
+            for i, (latitude, longitude) in enumerate(cls.LOCALIZACOES)
+        )
+
+    def assertMesmosDispositivos(self, posicoes, distancias, snapshot, dispositivos):
+        """Mesmos ids e distâncias posição a posição (dispositivos equidistantes podem trocar de lugar)"""
+        self.assertEqual(sorted(snapshot.ids[posicoes].tolist()), sorted(d.id for d in dispositivos))
+        for distancia, dispositivo in zip(distancias.tolist(), dispositivos):
+            self.assertAlmostEqual(distancia, dispositivo.distancia.km, delta=self.TOLERANCIA * distancia + 0.01)
+
+    def snapshots(self):
+        # Células pequenas, padrão e maiores que os raios consultados
+        for celula_km in (1, 50, 5000):
+            with self.subTest(celula_km=celula_km), override_settings(INDICE_ESPACIAL_CELULA_KM=celula_km):
+                yield construir()
+
+    def test_raio(self):
+        for snapshot in self.snapshots():
+            for latitude, longitude, raio_km in self.CONSULTAS:
+                with self.subTest(latitude=latitude, longitude=longitude, raio_km=raio_km):
+                    posicoes, distancias = snapshot.raio(latitude, longitude, raio_km)
+                    self.assertMesmosDispositivos(
+                        posicoes, distancias, snapshot, list(dispositivos_no_raio(latitude, longitude, raio_km))
+                    )
+
+    def test_mais_proximos(self):
+        n = len(self.LOCALIZACOES)
+        for snapshot in self.snapshots():
+            for latitude, longitude, _ in self.CONSULTAS:
+                for k in (1, 3, n, n + 5):
+                    with self.subTest(latitude=latitude, longitude=longitude, k=k):
+                        posicoes, distancias = snapshot.mais_proximos(latitude, longitude, k)
+                        self.assertEqual(len(posicoes), min(k, n))
+                        self.assertMesmosDispositivos(
+                            posicoes, distancias, snapshot, list(dispositivos_por_distancia(latitude, longitude)[:k])
+                        )
+
+    def test_indice_vazio(self):
+        Dispositivo.objects.all().delete()
+        snapshot = construir()
+        self.assertEqual(len(snapshot), 0)
+        for latitude, longitude, raio_km in self.CONSULTAS:
+            with self.subTest(latitude=latitude, longitude=longitude):
+                posicoes, distancias = snapshot.raio(latitude, longitude, raio_km)
+                self.assertEqual((len(posicoes), len(distancias)), (0, 0))
+                self.assertFalse(dispositivos_no_raio(latitude, longitude, raio_km).exists())
+                posicoes, distancias = snapshot.mais_proximos(latitude, longitude, 3)
+                self.assertEqual((len(posicoes), len(distancias)), (0, 0))
+                self.assertEqual(list(dispositivos_por_distancia(latitude, longitude)[:3]), [])
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from rest_framework.utils.encoders import JSONEncoder
+
+FORMATOS = {
+    'mvt': 'application/vnd.mapbox-vector-tile',
+    'geojson': 'application/geo+json',
+}
+
+CAMADA = 'estacoes'
+
+# Extensão e borda dos tiles vetoriais (unidades internas do MVT)
+EXTENSAO = 4096
+BORDA = 64
+
+# Versão das localizações: alterada quando um dispositivo é criado, editado ou excluído,
+# o que invalida todos os tiles em cache (a chave de cada tile inclui a versão)
+CHAVE_VERSAO = 'tiles:versao'
+
+# Estações do tile, pelo índice GiST de localizacao::geometry (migração 0006).
+# O envelope em Web Mercator é convertido para 4326 e ampliado pela borda do tile.
+SQL_ESTACOES = """
+WITH limites AS (
+    SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS envelope,
+           ST_Transform(ST_TileEnvelope(%(z)s, %(x)s, %(y)s, margin => %(margem)s), 4326) AS area
+)
+SELECT d.id, d.descricao, {geometria}{colunas_dados}
+FROM dispositivo d
+CROSS JOIN limites
+{juncao_dados}
+WHERE d.localizacao::geometry && limites.area
+"""
+
+GEOMETRIA_MVT = (
+    "ST_AsMVTGeom(ST_Transform(d.localizacao::geometry, 3857), limites.envelope, "
+    f"{EXTENSAO}, {BORDA}, true) AS geom"
+)
+GEOMETRIA_GEOJSON = "ST_X(d.localizacao::geometry) AS longitude, ST_Y(d.localizacao::geometry) AS latitude"
+
+# Data do último dado em segundos desde 1970 (UTC): atributos de MVT só aceitam tipos simples
+COLUNAS_DADOS = (
+    ", extract(epoch FROM u.time)::bigint AS data, u.temperatura, u.umidade, u.precipitacao, "
+    "u.velocidade_vento, dv.nome AS direcao_vento"
+)
+JUNCAO_DADOS = (
+    "LEFT JOIN ultimo_dado u ON u.dispositivo_id = d.id "
+    "LEFT JOIN direcao_vento dv ON dv.id = u.direcao_vento_id"
+)
+
+
+def _cache():
+    return caches[getattr(settings, 'CONSULTAS_CACHE_BACKEND', 'default')]
+
+
+def versao():
+    cache = _cache()
+    atual = cache.get(CHAVE_VERSAO)
+    if atual is None:
+        cache.add(CHAVE_VERSAO, uuid.uuid4().hex, None)
+        atual = cache.get(CHAVE_VERSAO)
+    return atual
+
+
+def invalidar():
+    _cache().set(CHAVE_VERSAO, uuid.uuid4().hex, None)
+
+
+def _sql(formato, com_dados):
+    return SQL_ESTACOES.format(
+        geometria=GEOMETRIA_MVT if formato == 'mvt' else GEOMETRIA_GEOJSON,
+        colunas_dados=COLUNAS_DADOS if com_dados else '',
+        juncao_dados=JUNCAO_DADOS if com_dados else '',
+    )
+
+
+def gerar_mvt(z, x, y, com_dados):
+    """Tile vetorial (Mapbox Vector Tile) com a camada de estações, gerado pelo ST_AsMVT"""
+    sql = (
+        f"SELECT ST_AsMVT(tile, '{CAMADA}', {EXTENSAO}, 'geom', 'id') "
+        f"FROM ({_sql('mvt', com_dados)}) AS tile WHERE geom IS NOT NULL"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'z': z, 'x': x, 'y': y, 'margem': BORDA / EXTENSAO})
+        conteudo = cursor.fetchone()[0]
+    return bytes(conteudo) if conteudo else b''
+
+
+def gerar_geojson(z, x, y, com_dados):
+    """FeatureCollection com as estações dentro do tile (e da borda)"""
+    with connection.cursor() as cursor:
+        cursor.execute(_sql('geojson', com_dados), {'z': z, 'x': x, 'y': y, 'margem': BORDA / EXTENSAO})
+        colunas = [coluna[0] for coluna in cursor.description]
+        linhas = cursor.fetchall()
+
+    features = []
+    for linha in linhas:
+        propriedades = dict(zip(colunas, linha))
+        id = propriedades.pop('id')
+        longitude = propriedades.pop('longitude')
+        latitude = propriedades.pop('latitude')
+        features.append({
+            'type': 'Feature',
+            'id': id,
+            'geometry': {'type': 'Point', 'coordinates': [round(longitude, 6), round(latitude, 6)]},
+            'properties': propriedades,
+        })
+    colecao = {'type': 'FeatureCollection', 'features': features}
+    return json.dumps(colecao, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def obter_tile(z, x, y, formato, com_dados):
+    """
+    Retorna (conteúdo, etag, validade em segundos) do tile, do cache ou gerado.
+    Tiles só com localizações ficam em cache até um dispositivo mudar; com o
+    último dado, pelo tempo de CONSULTAS_CACHE_TTL_RECENTE.
+    """
+    if com_dados:
+        validade = getattr(settings, 'CONSULTAS_CACHE_TTL_RECENTE', 30)
+    else:
+        validade = getattr(settings, 'TILES_CACHE_TTL', 3600)
+
+    chave = f'tile:{versao()}:{formato}:{int(com_dados)}:{z}:{x}:{y}'
+    cache = _cache()
+    item = cache.get(chave)
+    if item is None:
+        gerar = gerar_mvt if formato == 'mvt' else gerar_geojson
+        conteudo = gerar(z, x, y, com_dados)
+        item = (conteudo, '"' + hashlib.sha1(conteudo).hexdigest() + '"')
+        cache.set(chave, item, validade)
+    return item[0], item[1], validade
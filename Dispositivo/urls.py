@@ -1,10 +1,19 @@
 from django.urls import path
-from .views import DispositivoListView, DispositivoDetailView
-from .queryviews import DispositivoMaisProximoView,DispositivosProximosRaioView
+from .views import DispositivoListView, DispositivoDetailView, DispositivoCacheView
+from .queryviews import DispositivoMaisProximoView,DispositivosProximosRaioView,DispositivosMaisProximosView,DispositivoTilesView
+from . import async_views
 
 urlpatterns = [
   path('dispositivo/', DispositivoListView.as_view()),
   path('dispositivo/<str:id>/', DispositivoDetailView.as_view()),
   path('dispositivos/proximo/', DispositivoMaisProximoView.as_view()),
   path('dispositivos/raio/', DispositivosProximosRaioView.as_view()),
+  path('dispositivos/proximos/', DispositivosMaisProximosView.as_view()),
+  path('dispositivos/cache/', DispositivoCacheView.as_view()),
+  path('dispositivos/tiles/<int:z>/<int:x>/<int:y>.<str:formato>', DispositivoTilesView.as_view()),
+
+  # Versões assíncronas (servidas via ASGI)
+  path('async/dispositivos/proximo/', async_views.mais_proximo_view),
+  path('async/dispositivos/raio/', async_views.proximos_raio_view),
+  path('async/dispositivos/proximos/', async_views.mais_proximos_view),
 ]
\ No newline at end of file
@@ -3,6 +3,8 @@ from rest_framework.response import Response
 from rest_framework import status, serializers
 from .models import Dispositivo
 from .serializer import DispositivoSerializer
+from .cache import buscar_por_id, buscar_por_token, cache_dispositivos
+from .indice_espacial import indice
 from utils import is_valid_uuid
 from django.contrib.gis.geos import Point
 from drf_spectacular.utils import (
@@ -126,15 +128,12 @@ class DispositivoDetailView(APIView):
 
     # Função auxiliar: Busca dispositivo por ID ou token
     def get_dispositivo(self, id):
-        """Busca dispositivo por ID ou token com tratamento de erros"""
-        try:
-            if is_valid_uuid(id):
-                return Dispositivo.objects.get(token=id)
-            elif id.isdigit():
-                return Dispositivo.objects.get(id=int(id))
-            return None
-        except (Dispositivo.DoesNotExist, ValueError):
-            return None
+        """Busca dispositivo por ID ou token usando o cache de dispositivos"""
+        if is_valid_uuid(id):
+            return buscar_por_token(id)
+        elif id.isdecimal():
+            return buscar_por_id(id)
+        return None
 
 
     @extend_schema(
@@ -308,4 +307,45 @@ class DispositivoDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         dispositivo.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DispositivoCacheView(APIView):
+
+    @extend_schema(
+        description="Estatísticas do cache de dispositivos e do índice espacial do processo atual (acertos, falhas e ocupação)",
+        responses={status.HTTP_200_OK: serializers.DictField},
+        examples=[
+            OpenApiExample(
+                "Exemplo de resposta",
+                value={
+                    "status": 200,
+                    "cache": {
+                        "itens": 120,
+                        "tamanho_maximo": 10000,
+                        "acertos": 5230,
+                        "acertos_negativos": 310,
+                        "falhas": 64,
+                        "remocoes": 2,
+                        "taxa_acerto": 0.9886
+                    },
+                    "indice_espacial": {
+                        "habilitado": True,
+                        "dispositivos": 120,
+                        "celulas": 95,
+                        "reconstrucoes": 3
+                    }
+                },
+                response_only=True
+            )
+        ]
+    )
+
+    # GET: Retorna contadores do cache de dispositivos
+    def get(self, request):
+        """Retorna as estatísticas do cache de dispositivos deste worker"""
+        return Response({
+            'status': 200,
+            'cache': cache_dispositivos.estatisticas(),
+            'indice_espacial': indice.estatisticas()
+        })
@@ -0,0 +1,202 @@
+import io
+import zlib
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import zstandard
+except ImportError:  # Dependência opcional: sem zstd, só gzip
+    zstandard = None
+
+# Bytes comprimidos entregues por vez ao descompressor zstd: limita quanto um bloco
+# muito comprimido (zip bomb) expande antes da verificação de HTTP_REQUISICAO_MAXIMO
+BLOCO_ENTRADA_ZSTD = 1024
+
+# Respostas que não são comprimidas (eventos precisam sair na hora; formatos já comprimidos)
+TIPOS_SEM_COMPRESSAO = (
+    'text/event-stream',
+    'application/vnd.apache.parquet',
+    'image/',
+)
+
+
+def _descomprimir_gzip(corpo, maximo):
+    """Descomprime todos os membros do corpo (a RFC 1952 permite vários concatenados)"""
+    resultado = bytearray()
+    pendente = bytes(corpo)
+    while pendente:
+        descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        resultado += descompressor.decompress(pendente, maximo + 1 - len(resultado))
+        if len(resultado) > maximo:
+            return bytes(resultado)
+        if not descompressor.eof:
+            raise ValueError('Corpo gzip incompleto.')
+        # Bytes após o fim do membro: início do próximo (zeros de preenchimento são ignorados, como no gzip)
+        pendente = descompressor.unused_data.lstrip(b'\0')
+    return bytes(resultado)
+
+
+def _descomprimir_zstd(corpo, maximo):
+    """Descomprime todos os frames do corpo (clientes podem enviar vários concatenados)"""
+    resultado = bytearray()
+    pendente = bytes(corpo)
+    while pendente:
+        descompressor = zstandard.ZstdDecompressor().decompressobj()
+        posicao = 0
+        while not descompressor.eof and posicao < len(pendente):
+            resultado += descompressor.decompress(pendente[posicao:posicao + BLOCO_ENTRADA_ZSTD])
+            posicao += BLOCO_ENTRADA_ZSTD
+            if len(resultado) > maximo:
+                return bytes(resultado)
+        if not descompressor.eof:
+            raise ValueError('Corpo zstd incompleto.')
+        # Bytes após o fim do frame: início do próximo
+        pendente = descompressor.unused_data + pendente[posicao:]
+    return bytes(resultado)
+
+
+class _Compressor:
+    """Interface comum para gzip/zstd em modo streaming"""
+
+    def __init__(self, codificacao):
+        self.codificacao = codificacao
+        if codificacao == 'zstd':
+            nivel = getattr(settings, 'HTTP_COMPRESSAO_ZSTD_NIVEL', 3)
+            self._objeto = zstandard.ZstdCompressor(level=nivel).compressobj()
+        else:
+            nivel = getattr(settings, 'HTTP_COMPRESSAO_GZIP_NIVEL', 6)
+            self._objeto = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, parte):
+        return self._objeto.compress(parte)
+
+    def finalizar(self):
+        return self._objeto.flush()
+
+
+class CompressaoMiddleware:
+    """
+    - Requisições com Content-Encoding gzip ou zstd são descomprimidas antes da
+      view, limitadas a HTTP_REQUISICAO_MAXIMO bytes descomprimidos (413 acima).
+    - Respostas são comprimidas com a codificação negociada pelo Accept-Encoding
+      (zstd, se instalado, ou gzip), inclusive as transmitidas em streaming.
+      Respostas normais menores que HTTP_COMPRESSAO_MINIMO não são comprimidas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        erro = self.processar_requisicao(request)
+        if erro is not None:
+            return erro
+        return self.processar_resposta(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        erro = self.processar_requisicao(request)
+        if erro is not None:
+            return erro
+        return self.processar_resposta(request, await self.get_response(request))
+
+    # Requisição
+
+    def processar_requisicao(self, request):
+        codificacao = request.META.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if not codificacao or codificacao == 'identity':
+            return None
+        if codificacao not in ('gzip', 'zstd') or (codificacao == 'zstd' and zstandard is None):
+            return HttpResponse(f'Content-Encoding não suportado: {codificacao}', status=415)
+
+        maximo = getattr(settings, 'HTTP_REQUISICAO_MAXIMO', 50 * 1024 * 1024)
+        try:
+            if codificacao == 'gzip':
+                corpo = _descomprimir_gzip(request.body, maximo)
+            else:
+                corpo = _descomprimir_zstd(request.body, maximo)
+        except (ValueError, zlib.error) as e:
+            return HttpResponse(f'Corpo comprimido inválido: {e}', status=400)
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                return HttpResponse(f'Corpo comprimido inválido: {e}', status=400)
+            raise
+        if len(corpo) > maximo:
+            return HttpResponse('Corpo descomprimido excede o tamanho máximo.', status=413)
+
+        # A view passa a ler o corpo descomprimido
+        request._body = corpo
+        request._stream = io.BytesIO(corpo)
+        request.META['CONTENT_LENGTH'] = str(len(corpo))
+        del request.META['HTTP_CONTENT_ENCODING']
+        return None
+
+    # Resposta
+
+    def _negociar(self, request):
+        aceitas = {
+            parte.split(';')[0].strip().lower()
+            for parte in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')
+        }
+        if 'zstd' in aceitas and zstandard is not None:
+            return 'zstd'
+        if 'gzip' in aceitas:
+            return 'gzip'
+        return None
+
+    def processar_resposta(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        tipo = response.get('Content-Type', '')
+        if any(tipo.startswith(sem) for sem in TIPOS_SEM_COMPRESSAO):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codificacao = self._negociar(request)
+        if codificacao is None:
+            return response
+
+        compressor = _Compressor(codificacao)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self._comprimir_async(response.streaming_content, compressor)
+            else:
+                response.streaming_content = self._comprimir(response.streaming_content, compressor)
+            del response['Content-Length']
+        else:
+            if len(response.content) < getattr(settings, 'HTTP_COMPRESSAO_MINIMO', 1024):
+                return response
+            comprimido = compressor.comprimir(response.content) + compressor.finalizar()
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response['Content-Length'] = str(len(comprimido))
+
+        # O corpo comprimido não é byte a byte igual ao original: ETag passa a ser fraco
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = codificacao
+        return response
+
+    @staticmethod
+    def _comprimir(partes, compressor):
+        for parte in partes:
+            saida = compressor.comprimir(parte)
+            if saida:
+                yield saida
+        yield compressor.finalizar()
+
+    @staticmethod
+    async def _comprimir_async(partes, compressor):
+        async for parte in partes:
+            saida = compressor.comprimir(parte)
+            if saida:
+                yield saida
+        yield compressor.finalizar()
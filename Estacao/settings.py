@@ -91,6 +91,7 @@ SPECTACULAR_SETTINGS = {
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', # Para permitir acesso a API de outros links
+    'Estacao.middleware.CompressaoMiddleware', # gzip/zstd nos corpos de requisição e resposta
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -136,6 +137,140 @@ DATABASES = {
 
 TIMESCALE_MIGRATE_HYPERTABLE_WITH_FRESH_TABLE = False
 
+# Cache compartilhado entre os workers do mesmo servidor (versões dos caches em memória)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+    },
+    # Resultados das consultas por período (Dados_Climaticos/cache_consultas.py)
+    'consultas': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'consultas',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Ingestão de dados climáticos: quantidade de linhas por INSERT multi-linha
+INGESTAO_BATCH_SIZE = 1000
+
+# Upload binário (application/x-estacao-dados): máximo de leituras por requisição
+INGESTAO_BINARIO_MAXIMO = 100000
+
+# Intervalo (segundos) entre verificações da versão do cache de direções do vento
+DIRECAO_VENTO_CACHE_VERIFICACAO = 5
+
+# Cache de dispositivos por id/token (por processo): tamanho máximo e validade em segundos
+DISPOSITIVO_CACHE_TAMANHO = 10000
+DISPOSITIVO_CACHE_TTL = 60
+DISPOSITIVO_CACHE_TTL_NEGATIVO = 30
+# Intervalo (segundos) para conferir a versão compartilhada: alterações feitas em outro
+# worker descartam o cache local em até esse tempo
+DISPOSITIVO_CACHE_VERIFICACAO = 5
+
+# Busca das k estações mais próximas (/dispositivos/proximos/): valor máximo de k
+DISPOSITIVOS_KNN_MAXIMO = 50
+
+# Índice espacial em memória (por processo) para as buscas por estação mais próxima e por raio,
+# sem consultar o PostgreSQL. Reconstruído quando um dispositivo é alterado; os outros processos
+# percebem a alteração pela versão no cache padrão, verificada a cada INDICE_ESPACIAL_VERIFICACAO segundos.
+# Distâncias calculadas na esfera (haversine): diferem em até ~0,5% das do PostGIS (elipsoide).
+INDICE_ESPACIAL_HABILITADO = False
+INDICE_ESPACIAL_CELULA_KM = 50
+INDICE_ESPACIAL_VERIFICACAO = 5
+
+# Interpolação espacial (/dados_climaticos/interpolacao/): estações usadas por ponto, distância
+# máxima delas (km), alcance do variograma da krigagem (km) e tamanho máximo da grade (células).
+# Os tiles da grade ficam no cache de consultas (CONSULTAS_CACHE_*). A krigagem resolve um
+# sistema por célula e tem limites próprios: vizinhos e células calculadas (tiles inteiros de 64x64).
+INTERPOLACAO_VIZINHOS = 12
+INTERPOLACAO_VIZINHOS_MAXIMO = 64
+INTERPOLACAO_RAIO_KM = 100
+INTERPOLACAO_RAIO_MAXIMO_KM = 1000
+INTERPOLACAO_ALCANCE_KM = 100
+INTERPOLACAO_GRADE_MAXIMA = 250000
+INTERPOLACAO_KRIGING_VIZINHOS_MAXIMO = 32
+INTERPOLACAO_KRIGING_GRADE_MAXIMA = 36864
+
+# Tiles de estações para mapas (/dispositivos/tiles/z/x/y.mvt|.geojson): zoom máximo e validade,
+# em segundos, dos tiles só com localizações (invalidados ao alterar um dispositivo). Tiles com
+# o último dado (?dados=true) usam CONSULTAS_CACHE_TTL_RECENTE.
+TILES_ZOOM_MAXIMO = 22
+TILES_CACHE_TTL = 3600
+
+# Listagens de dados climáticos: tamanho de página (paginação por cursor) e
+# quantidade de linhas lidas por vez do cursor do servidor no modo streaming
+DADOS_PAGINA_PADRAO = 500
+DADOS_PAGINA_MAXIMO = 5000
+DADOS_STREAMING_CHUNK = 2000
+
+# Exportação colunar (Arrow/Parquet, requer pyarrow): linhas por RecordBatch/row group
+DADOS_ARROW_LOTE = 65536
+
+# Histograma (/dados_climaticos/dispositivos/histograma/): máximo de divisões ("bins" ou "bordas")
+HISTOGRAMA_BINS_MAXIMO = 1000
+
+# Agregados contínuos (horário/diário) usados pelas consultas de média.
+AGREGADOS_HABILITADOS = True
+
+# Cache das consultas por período. Consultas cujo fim é anterior a
+# agora - MARGEM_HISTORICO usam o TTL histórico; as demais, o TTL recente.
+# A ingestão troca a geração do dispositivo (parte da chave de cada consulta); a
+# geração histórica só muda quando chegam dados anteriores a agora - MARGEM_HISTORICO.
+CONSULTAS_CACHE_HABILITADO = True
+CONSULTAS_CACHE_BACKEND = 'consultas'
+CONSULTAS_CACHE_TTL_RECENTE = 30
+CONSULTAS_CACHE_TTL_HISTORICO = 86400
+CONSULTAS_CACHE_MARGEM_HISTORICO = 3600
+# Consulta por período (JSON): resultados com mais linhas que isso não são guardados
+CONSULTAS_CACHE_LINHAS_MAXIMO = 50000
+
+# Hypertable dado_climatico: intervalo dos chunks e campos com índice parcial
+# (dispositivo_id, time) WHERE <campo> IS NOT NULL, usado pelo histograma.
+# A migração 0005 aplica os valores abaixo; após alterar, rode "python manage.py ajustar_hypertable".
+DADOS_CHUNK_INTERVALO = '1 day'
+DADOS_INDICES_PARCIAIS = ['temperatura', 'umidade']
+
+# Compressão nativa do TimescaleDB: chunks mais antigos que isso são comprimidos
+# pela política (a migração 0006 usa 30 dias). Após alterar: "python manage.py comprimir_dados --politica".
+COMPRESSAO_APOS = '30 days'
+
+# Retenção: dados brutos mais antigos que isso são resumidos por hora em
+# dado_climatico_arquivo e removidos ("python manage.py arquivar_dados", ou
+# "--agendar '1 day'" para um job do TimescaleDB). As consultas de média e de
+# agregação leem o arquivo nesses períodos e a ingestão recusa dados anteriores
+# ao limite arquivado, reconsultado a cada DADOS_RETENCAO_VERIFICACAO segundos.
+DADOS_RETENCAO_DIAS = 365
+DADOS_RETENCAO_VERIFICACAO = 60
+
+# Ingestão assíncrona: o POST grava o lote em uma fila local (SQLite) e responde
+# 202; o comando "python manage.py processar_fila --continuo" grava no banco até
+# INGESTAO_FILA_LOTE itens por bulk insert. Lotes concluídos ficam consultáveis
+# por INGESTAO_FILA_RETENCAO segundos.
+INGESTAO_ASSINCRONA = False
+INGESTAO_FILA_ARQUIVO = BASE_DIR / 'fila_ingestao.sqlite3'
+INGESTAO_FILA_LOTE = 20000
+INGESTAO_FILA_INTERVALO = 1
+INGESTAO_FILA_RETENCAO = 7 * 86400
+
+# Canal de eventos (SSE em /async/dados_climaticos/eventos/, servido via ASGI).
+# 'postgres': LISTEN/NOTIFY, entrega entre processos/servidores (WSGI + ASGI, vários workers);
+# 'local': entrega só aos clientes do mesmo processo que gravou os dados (apenas com um único
+# processo, ex: runserver ou uvicorn sem --workers); None: desligado.
+# Clientes lentos perdem os dados mais antigos além de EVENTOS_FILA_MAXIMA.
+EVENTOS_BACKEND = 'postgres'
+EVENTOS_HEARTBEAT = 15
+EVENTOS_DURACAO_MAXIMA = 300
+EVENTOS_FILA_MAXIMA = 1000
+
+# Compressão HTTP (Estacao.middleware.CompressaoMiddleware). zstd exige o pacote zstandard.
+# Tamanho máximo, em bytes, de um corpo de requisição depois de descomprimido (413 acima)
+HTTP_REQUISICAO_MAXIMO = 50 * 1024 * 1024
+# Respostas menores que isso (em bytes) não são comprimidas; streaming é sempre comprimido
+HTTP_COMPRESSAO_MINIMO = 1024
+HTTP_COMPRESSAO_GZIP_NIVEL = 6
+HTTP_COMPRESSAO_ZSTD_NIVEL = 3
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
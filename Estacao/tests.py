@@ -0,0 +1,98 @@
+import gzip
+from unittest import skipIf
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from .middleware import CompressaoMiddleware, zstandard
+
+
+def _eco(request):
+    """View de teste: devolve o corpo recebido (já descomprimido pelo middleware)"""
+    return HttpResponse(request.body, content_type='application/json')
+
+
+@override_settings(HTTP_REQUISICAO_MAXIMO=1000, HTTP_COMPRESSAO_MINIMO=100)
+class CompressaoMiddlewareTest(SimpleTestCase):
+    """Corpos gzip/zstd na requisição e compressão negociada na resposta"""
+
+    def setUp(self):
+        self.fabrica = RequestFactory()
+
+    def enviar(self, corpo, codificacao, view=_eco):
+        request = self.fabrica.post('/', corpo, content_type='application/json', HTTP_CONTENT_ENCODING=codificacao)
+        return CompressaoMiddleware(view)(request)
+
+    def responder(self, resposta, aceitas='gzip, zstd'):
+        request = self.fabrica.get('/', HTTP_ACCEPT_ENCODING=aceitas)
+        return CompressaoMiddleware(lambda request: resposta)(request)
+
+    # Requisição
+
+    def test_gzip_com_varios_membros(self):
+        corpo = gzip.compress(b'{"dados": [') + gzip.compress(b'1, 2') + gzip.compress(b']}')
+        resposta = self.enviar(corpo, 'gzip')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.content, b'{"dados": [1, 2]}')
+
+    def test_gzip_incompleto(self):
+        corpo = gzip.compress(b'{"dados": []}') + gzip.compress(b'{}')
+        self.assertEqual(self.enviar(corpo[:-4], 'gzip').status_code, 400)
+        self.assertEqual(self.enviar(b'nao-e-gzip', 'gzip').status_code, 400)
+
+    @skipIf(zstandard is None, 'zstandard não instalado')
+    def test_zstd_com_varios_frames(self):
+        compressor = zstandard.ZstdCompressor()
+        corpo = compressor.compress(b'{"dados": [') + compressor.compress(b'1]}')
+        resposta = self.enviar(corpo, 'zstd')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.content, b'{"dados": [1]}')
+        self.assertEqual(self.enviar(corpo[:-2], 'zstd').status_code, 400)
+
+    def test_corpo_acima_do_maximo(self):
+        # Cada membro cabe no limite, mas o total não
+        self.assertEqual(self.enviar(gzip.compress(b'a' * 1001), 'gzip').status_code, 413)
+        self.assertEqual(self.enviar(gzip.compress(b'a' * 600) * 2, 'gzip').status_code, 413)
+        self.assertEqual(self.enviar(gzip.compress(b'a' * 1000), 'gzip').status_code, 200)
+        if zstandard is not None:
+            corpo = zstandard.ZstdCompressor().compress(b'a' * 600) * 2
+            self.assertEqual(self.enviar(corpo, 'zstd').status_code, 413)
+
+    def test_codificacao_desconhecida(self):
+        self.assertEqual(self.enviar(b'{}', 'br').status_code, 415)
+        self.assertEqual(self.enviar(b'{}', 'identity').status_code, 200)
+
+    # Resposta
+
+    def test_resposta_gzip(self):
+        conteudo = b'{"valor": 1}' * 50
+        resposta = self.responder(HttpResponse(conteudo, content_type='application/json'), 'gzip')
+        self.assertEqual(resposta['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', resposta['Vary'])
+        self.assertEqual(gzip.decompress(resposta.content), conteudo)
+
+        # Abaixo de HTTP_COMPRESSAO_MINIMO a resposta sai como está
+        resposta = self.responder(HttpResponse(b'{}', content_type='application/json'), 'gzip')
+        self.assertFalse(resposta.has_header('Content-Encoding'))
+
+    @skipIf(zstandard is None, 'zstandard não instalado')
+    def test_resposta_zstd(self):
+        conteudo = b'{"valor": 1}' * 50
+        resposta = self.responder(HttpResponse(conteudo, content_type='application/json'))
+        self.assertEqual(resposta['Content-Encoding'], 'zstd')
+        self.assertEqual(zstandard.ZstdDecompressor().decompressobj().decompress(resposta.content), conteudo)
+
+    def test_resposta_streaming(self):
+        partes = [b'{"valor": %d}\n' % i for i in range(100)]
+        resposta = self.responder(StreamingHttpResponse(iter(partes), content_type='application/x-ndjson'), 'gzip')
+        self.assertEqual(resposta['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(resposta.streaming_content)), b''.join(partes))
+
+    def test_tipos_sem_compressao(self):
+        eventos = StreamingHttpResponse(iter([b'data: {}\n\n'] * 200), content_type='text/event-stream')
+        resposta = self.responder(eventos)
+        self.assertFalse(resposta.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(resposta.streaming_content), b'data: {}\n\n' * 200)
+
+        parquet = HttpResponse(b'PAR1' * 500, content_type='application/vnd.apache.parquet')
+        resposta = self.responder(parquet)
+        self.assertFalse(resposta.has_header('Content-Encoding'))
+        self.assertEqual(resposta.content, b'PAR1' * 500)
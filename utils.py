@@ -1,6 +1,9 @@
 import uuid
-from Dispositivo.models import Dispositivo
+from functools import wraps
+from Dispositivo.cache import buscar_por_id, buscar_por_token
+from django.http import HttpResponseNotAllowed, JsonResponse
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
 
 def is_valid_uuid(value):
@@ -11,14 +14,26 @@ def is_valid_uuid(value):
         return False
     
 def get_dispositivo(identificador):
-        try:
-            if identificador.isdigit():
-                return Dispositivo.objects.get(id=int(identificador))
-            else:
-                if not is_valid_uuid(identificador):
-                    return Response({'status': 404,
-                                     'msg': 'UUID inválido'
-                                     }, status=400)
-                return Dispositivo.objects.get(token=identificador)
-        except Dispositivo.DoesNotExist:
-            return None
\ No newline at end of file
+        if identificador.isdecimal():
+            return buscar_por_id(identificador)
+        else:
+            if not is_valid_uuid(identificador):
+                return Response({'status': 404,
+                                 'msg': 'UUID inválido'
+                                 }, status=400)
+            return buscar_por_token(identificador)
+
+
+def resposta_json(corpo, status=200):
+    """JsonResponse com o mesmo encoder do DRF, para as views assíncronas"""
+    return JsonResponse(corpo, status=status, safe=False, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+def somente_get(view):
+    """Restringe uma view assíncrona a GET/HEAD (require_GET só aceita views assíncronas a partir do Django 5)"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    return wrapper